@@ -55,6 +55,32 @@ const RealTimeFeedback = ({ policyholderId }) => {
     }
   ];
 
+  // Live feedback pushed by the backend over server-sent events
+  useEffect(() => {
+    if (!policyholderId || typeof EventSource === 'undefined') return undefined;
+
+    const source = new EventSource(`/api/feedback/stream/${policyholderId}`);
+    source.addEventListener('feedback', (event) => {
+      const data = JSON.parse(event.data);
+      const impact = -Math.max(1, Math.round((data.risk_impact || 0) * 500));
+
+      setFeedbackHistory(prev => [{
+        id: event.lastEventId || Date.now(),
+        type: data.event_type,
+        severity: data.severity,
+        location: data.location?.address || '',
+        message: data.feedback_message,
+        suggestions: data.suggestions || [],
+        impact,
+        timestamp: new Date(data.timestamp).toLocaleTimeString(),
+        read: false
+      }, ...prev.slice(0, 9)]);
+      setCurrentScore(prev => Math.max(0, Math.min(100, prev + impact)));
+    });
+
+    return () => source.close();
+  }, [policyholderId]);
+
   const simulateRealTimeEvent = () => {
     const randomEvent = mockEvents[Math.floor(Math.random() * mockEvents.length)];
     const timestamp = new Date().toLocaleTimeString();
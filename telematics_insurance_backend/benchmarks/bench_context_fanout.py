@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the pooled provider clients, concurrent fan-out and coalescing
+
+Starts the fake context gateway in-process with a delay per source and
+compares fetching several sources one after another against fanning them
+out, checks that concurrent identical lookups reach the gateway once, and
+compares pooled keep-alive requests against a new connection per request.
+
+    python benchmarks/bench_context_fanout.py --rounds 20 --latency 0.1
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_context_server import start_fake_server
+from src.services.context_clients import FanOut, HttpProvider, ProviderClient
+from src.services.context_providers import StubProvider
+
+SOURCES = ('weather', 'traffic', 'crime', 'accidents')
+
+def lookups(provider, lat, lon):
+    return {
+        'weather': lambda: provider.weather(lat, lon),
+        'traffic': lambda: provider.traffic(lat, lon, lat, lon),
+        'crime': lambda: provider.crime(lat, lon),
+        'accidents': lambda: provider.accidents(lat, lon)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.1, help='Base delay per source; sources get 1x..Nx of it')
+    parser.add_argument('--callers', type=int, default=50, help='Concurrent identical lookups for the coalescing check')
+    parser.add_argument('--requests', type=int, default=300, help='Requests for the keep-alive comparison')
+    args = parser.parse_args()
+
+    latencies = {source: args.latency * (i + 1) for i, source in enumerate(SOURCES)}
+    server, url = start_fake_server(latencies)
+    clients = {source: ProviderClient(source, url, timeout=10.0) for source in SOURCES}
+    provider = HttpProvider(clients, fallback=StubProvider())
+    fanout = FanOut(max_workers=16, timeout_seconds=10.0)
+    print(f"Fake gateway at {url}; per-source latency: "
+          + ', '.join(f"{source}={seconds:.2f}s" for source, seconds in latencies.items()))
+
+    # Distinct coordinates each round so coalescing never kicks in here
+    started = time.perf_counter()
+    for i in range(args.rounds):
+        for call in lookups(provider, 40.0 + i * 0.01, -87.0).values():
+            call()
+    sequential = (time.perf_counter() - started) / args.rounds
+
+    started = time.perf_counter()
+    for i in range(args.rounds):
+        _, errors = fanout.run(lookups(provider, 41.0 + i * 0.01, -87.0))
+        assert not errors, errors
+    concurrent = (time.perf_counter() - started) / args.rounds
+    print(f"Sequential: {sequential * 1e3:.1f}ms per request (sum {sum(latencies.values()) * 1e3:.0f}ms); "
+          f"fan-out: {concurrent * 1e3:.1f}ms per request (slowest {max(latencies.values()) * 1e3:.0f}ms)")
+
+    before = server.requests.get('weather', 0)
+    barrier = threading.Barrier(args.callers)
+
+    def caller():
+        barrier.wait()
+        provider.weather(45.0, -93.0)
+
+    threads = [threading.Thread(target=caller) for _ in range(args.callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"Coalescing: {args.callers} concurrent identical lookups -> "
+          f"{server.requests['weather'] - before} gateway request(s)")
+
+    server.latencies = {}
+    pooled = ProviderClient('weather', url)
+    started = time.perf_counter()
+    for i in range(args.requests):
+        pooled.get_json('weather', lat=i, lon=0)
+    pooled_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(args.requests):
+        requests.get(f"{url}/weather", params={'lat': i, 'lon': 0}, timeout=10.0).json()
+    fresh_seconds = time.perf_counter() - started
+    print(f"Keep-alive: {args.requests} requests in {pooled_seconds * 1e3:.0f}ms pooled vs "
+          f"{fresh_seconds * 1e3:.0f}ms with a new connection each")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark for batch contextual-risk scoring of trip traces
+
+Scores a synthetic GPS trace (one sample every few seconds along a winding
+route) with the vectorized scorer and with the per-point scalar functions
+behind /api/contextual-risk, with crime and accident indexes built over
+synthetic incidents around the route.
+
+    python benchmarks/bench_contextual_risk_batch.py --points 5000 --incidents 500000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.routes.external_data import (
+    DAYS_OF_WEEK, calculate_location_risk, calculate_time_risk, calculate_traffic_risk, calculate_weather_risk
+)
+from src.services.contextual_risk import FACTOR_WEIGHTS, score_trace
+from src.services.spatial_index import IncidentIndex, incident_indexes
+
+def make_trace(points, seed):
+    """A trace heading out of Chicago, sampled every 2-5 seconds, a week ago"""
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0, 0.05, points))
+    lat = 41.88 + np.cumsum(np.cos(heading)) * 0.0003
+    lon = -87.63 + np.cumsum(np.sin(heading)) * 0.0004
+    timestamps = time.time() - 7 * 86400 + np.cumsum(rng.uniform(2, 5, points))
+    return lat, lon, timestamps
+
+def scalar_scores(lat, lon, timestamps):
+    """Score point by point, the way a client looping over /api/contextual-risk would"""
+    scores = []
+    for point_lat, point_lon, timestamp in zip(lat, lon, timestamps):
+        moment = datetime.fromtimestamp(timestamp, timezone.utc)
+        time_of_day, day_of_week = moment.strftime('%H:%M'), DAYS_OF_WEEK[moment.weekday()]
+        factors = {
+            'weather_risk': calculate_weather_risk('cloudy'),
+            'time_risk': calculate_time_risk(time_of_day, day_of_week),
+            'location_risk': calculate_location_risk(point_lat, point_lon),
+            'traffic_risk': calculate_traffic_risk(point_lat, point_lon, time_of_day)
+        }
+        scores.append(sum(factors[factor] * FACTOR_WEIGHTS[factor] for factor in factors))
+    return np.array(scores)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=5000)
+    parser.add_argument('--incidents', type=int, default=500000)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    lat, lon, timestamps = make_trace(args.points, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    for dataset in ('crime', 'accidents'):
+        incident_lat = rng.normal(41.88, 0.1, args.incidents)
+        incident_lon = rng.normal(-87.63, 0.12, args.incidents)
+        incident_indexes[dataset] = IncidentIndex.build(
+            incident_lat, incident_lon, np.full(args.incidents, 5.0), np.zeros(args.incidents, dtype=np.uint8), ['other']
+        )
+    score_trace(lat, lon, timestamps, weather_conditions='cloudy')  # Warm up the density scales
+
+    timings = np.empty(args.rounds)
+    for i in range(args.rounds):
+        started = time.perf_counter()
+        result = score_trace(lat, lon, timestamps, weather_conditions='cloudy')
+        timings[i] = time.perf_counter() - started
+    p50, p99 = np.percentile(timings, [50, 99]) * 1e3
+    print(f"Batch: {args.points} points in p50 {p50:.2f}ms, p99 {p99:.2f}ms "
+          f"({p50 * 1e3 / args.points:.2f}us per point, with per-point lists and summary)")
+
+    started = time.perf_counter()
+    scalar = scalar_scores(lat, lon, timestamps)
+    scalar_seconds = time.perf_counter() - started
+    difference = np.abs(np.array(result['points']['contextual_risk_score']) - scalar).max()
+    print(f"Per point: {scalar_seconds * 1e3:.0f}ms ({scalar_seconds / (p50 / 1e3):.0f}x slower); "
+          f"max score difference {difference:.4f}")
+    print(f"Summary: {result['summary']}")
+
+if __name__ == "__main__":
+    main()
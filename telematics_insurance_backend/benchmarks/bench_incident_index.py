@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the memory-mapped incident spatial index
+
+Builds an IncidentIndex over synthetic incidents clustered around a few
+hundred city centers, saves it, memory-maps it back and times radius
+queries (count, severity aggregates, types and nearest hotspots).
+
+    python benchmarks/bench_incident_index.py --incidents 2000000 --queries 5000 --radius 2
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.spatial_index import IncidentIndex
+
+KINDS = ['vehicle_theft', 'vandalism', 'break_in', 'assault', 'other']
+
+def make_incidents(count, cities, seed):
+    """Incidents scattered around random continental-US city centers"""
+    rng = np.random.default_rng(seed)
+    centers = np.column_stack([rng.uniform(26, 48, cities), rng.uniform(-123, -70, cities)])
+    city = rng.integers(0, cities, count)
+    lat = centers[city, 0] + rng.normal(0, 0.05, count)
+    lon = centers[city, 1] + rng.normal(0, 0.07, count)
+    severity = rng.integers(1, 11, count).astype(np.float32)
+    kinds = rng.integers(0, len(KINDS), count).astype(np.uint8)
+    return centers, lat, lon, severity, kinds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--incidents', type=int, default=2000000)
+    parser.add_argument('--cities', type=int, default=300)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--radius', type=float, default=2.0, help='Query radius in km')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    centers, lat, lon, severity, kinds = make_incidents(args.incidents, args.cities, args.seed)
+
+    started = time.perf_counter()
+    index = IncidentIndex.build(lat, lon, severity, kinds, KINDS)
+    build_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        size_mb = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 1e6
+        started = time.perf_counter()
+        mapped = IncidentIndex.load(directory)
+        load_seconds = time.perf_counter() - started
+        print(f"Built {args.incidents} incidents ({index.meta['hotspots']} hotspots) in {build_seconds:.2f}s; "
+              f"{size_mb:.1f} MB on disk, mapped in {load_seconds * 1e3:.1f}ms")
+
+        # Query near city centers, where the data is densest
+        rng = np.random.default_rng(args.seed + 1)
+        picks = centers[rng.integers(0, args.cities, args.queries)] + rng.normal(0, 0.03, (args.queries, 2))
+        timings = np.empty(args.queries)
+        found = 0
+        for i, (query_lat, query_lon) in enumerate(picks):
+            started = time.perf_counter()
+            result = mapped.query(float(query_lat), float(query_lon), args.radius)
+            timings[i] = time.perf_counter() - started
+            found += result['count']
+
+        p50, p99 = np.percentile(timings, [50, 99]) * 1e3
+        print(f"{args.queries} queries at {args.radius}km: p50 {p50:.3f}ms, p99 {p99:.3f}ms, "
+              f"mean {timings.mean() * 1e3:.3f}ms ({found / args.queries:.0f} incidents per query)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the overhead of per-route request metrics
+
+Builds the app on a scratch SQLite database, seeds policyholders and trips
+through the API, then replays a mix of read endpoints through the Flask
+test client with metrics recording on and off, in interleaved rounds so
+drift affects both alike. Reports the median per-request CPU time of each and
+the median relative overhead between paired on/off passes, the cost of the recording hooks alone, and the
+query counts /metrics saw per endpoint.
+
+    python benchmarks/bench_metrics_overhead.py --policyholders 50 --rounds 40
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.models.telematics import db
+from src.services.metrics import RouteMetrics, route_metrics
+
+def seed(client, policyholders, trips):
+    """Create policyholders with `trips` trips each through the API; returns their ids"""
+    ids = []
+    for i in range(policyholders):
+        response = client.post('/api/policyholders', json={
+            'first_name': f"Bench{i}", 'last_name': 'Mark', 'date_of_birth': '1985-06-15',
+            'vehicle_make': 'Toyota', 'vehicle_model': 'Camry', 'vehicle_year': 2018,
+            'address': '1 Main St, Springfield, IL 62701'
+        })
+        ids.append(response.json['id'])
+        for j in range(trips):
+            start = datetime.utcnow() - timedelta(days=j, hours=i % 24)
+            client.post('/api/trips', json={
+                'policyholder_id': ids[-1], 'start_timestamp': start.isoformat(),
+                'end_timestamp': (start + timedelta(minutes=30)).isoformat(), 'duration_seconds': 1800,
+                'distance_km': 20.0 + j, 'avg_speed_kph': 40, 'max_speed_kph': 80, 'harsh_braking_count': j % 3
+            })
+    return ids
+
+def workload(ids):
+    """Read endpoints a dashboard session hits, for every policyholder"""
+    urls = ['/api/leaderboard', '/api/leaderboard/segments']
+    for policyholder_id in ids:
+        urls += [f"/api/policyholders/{policyholder_id}", f"/api/trips?policyholder_id={policyholder_id}",
+                 f"/api/achievements/{policyholder_id}", f"/api/points/{policyholder_id}",
+                 f"/api/risk-history/{policyholder_id}"]
+    return urls
+
+def replay(client, urls):
+    """CPU seconds per request over one pass of `urls`"""
+    started = time.thread_time()
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+    return (time.thread_time() - started) / len(urls)
+
+def hook_cost(iterations):
+    """CPU microseconds spent in start_request + finish_request with no SQL, on a scratch registry"""
+    metrics = RouteMetrics()
+    started = time.thread_time()
+    for _ in range(iterations):
+        metrics.start_request()
+        metrics.finish_request('bench.endpoint', 'GET', 200, 0, '512')
+    return (time.thread_time() - started) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--policyholders', type=int, default=50)
+    parser.add_argument('--trips', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=40)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    urls = workload(seed(client, args.policyholders, args.trips))
+    replay(client, urls)  # Warm caches and code paths
+
+    timings = {True: [], False: []}
+    for i in range(args.rounds):
+        for enabled in ((True, False) if i % 2 else (False, True)):
+            route_metrics.enabled = enabled
+            timings[enabled].append(replay(client, urls))
+    route_metrics.enabled = True
+
+    on, off = statistics.median(timings[True]), statistics.median(timings[False])
+    # Each round's on and off passes run back to back, so their ratio cancels slower drift on a shared machine
+    paired = statistics.median(on_round / off_round - 1 for on_round, off_round in zip(timings[True], timings[False]))
+    print(f"{len(urls)} requests x {args.rounds} rounds: metrics on {on * 1e6:.0f}us, off {off * 1e6:.0f}us "
+          f"per request median; overhead {paired * 100:+.2f}% (median of paired rounds)")
+    hooks = hook_cost(100000)
+    print(f"Recording hooks alone: {hooks:.2f}us per request ({hooks / off / 1e4:.2f}% of a request)")
+
+    metrics = client.get('/metrics').data.decode()
+    print("SQL statements per request (from /metrics):")
+    for line in metrics.splitlines():
+        if line.startswith(('http_request_sql_statements_sum', 'http_request_sql_statements_count')) and 'GET' in line:
+            print(f"  {line}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark /api/contextual-risk latency while a provider hangs
+
+Starts the fake context gateway in-process with a healthy weather source
+and a traffic source that stalls far past any timeout, then fires
+concurrent contextual-risk requests through the Flask test client in three
+setups: only the fan-out timeout bounding waits, a per-request latency
+budget, and the budget plus circuit breakers. Reports latency percentiles,
+how many responses fell back to default factors, and the traffic client's
+circuit state, error counts and latency histogram.
+
+    python benchmarks/bench_provider_breakers.py --requests 200 --threads 8 --hang 30
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from fake_context_server import start_fake_server
+from src.models.telematics import db
+from src.routes.external_data import external_data_bp
+from src.services.external_context import configure_context_cache, context_cache
+
+SETUPS = {
+    'fan-out timeout only': {'EXTERNAL_CONTEXT_LATENCY_BUDGET_SECONDS': 3600, 'EXTERNAL_CONTEXT_BREAKER_FAILURES': 10 ** 9},
+    'latency budget': {'EXTERNAL_CONTEXT_BREAKER_FAILURES': 10 ** 9},
+    'budget + breakers': {}
+}
+
+def create_app(url, budget, overrides):
+    """External data routes against the fake gateway, on a scratch database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config.update({
+        'EXTERNAL_CONTEXT_URLS': {'weather': url, 'traffic': url},
+        'EXTERNAL_CONTEXT_TIMEOUTS': {'weather': 5.0, 'traffic': 5.0},
+        'EXTERNAL_CONTEXT_LATENCY_BUDGET_SECONDS': budget,
+        'EXTERNAL_CONTEXT_BREAKER_FAILURES': 5,
+        'EXTERNAL_CONTEXT_BREAKER_RESET_SECONDS': 30.0
+    })
+    app.config.update(overrides)
+    db.init_app(app)
+    app.register_blueprint(external_data_bp, url_prefix='/api')
+    configure_context_cache(app)
+    context_cache.clear()
+    return app
+
+def run(app, requests_count, threads):
+    """Fire requests from `threads` concurrent clients; returns (latencies, fallback count)"""
+    latencies = np.empty(requests_count)
+    fallbacks = [0]
+    counter = iter(range(requests_count))
+    lock = threading.Lock()
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            # Distinct coordinates, so nothing is answered from the cache
+            started = time.perf_counter()
+            response = client.post('/api/contextual-risk', json={'lat': 30.0 + i * 0.05, 'lon': -97.0, 'time_of_day': '08:00'})
+            latencies[i] = time.perf_counter() - started
+            assert response.status_code == 200, response.data
+            with lock:
+                fallbacks[0] += bool(response.json['fallbacks'])
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, fallbacks[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--budget', type=float, default=0.3, help='Per-request latency budget in seconds')
+    parser.add_argument('--hang', type=float, default=30.0, help='Seconds the traffic source stalls for')
+    parser.add_argument('--weather-latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    server, url = start_fake_server({'weather': args.weather_latency, 'traffic': args.hang})
+    print(f"Fake gateway at {url}: weather {args.weather_latency * 1e3:.0f}ms, traffic stalls {args.hang:.0f}s")
+
+    for name, overrides in SETUPS.items():
+        app = create_app(url, args.budget, overrides)
+        # Without a budget every request waits out the fan-out timeout; keep that run short
+        unbounded = 'EXTERNAL_CONTEXT_LATENCY_BUDGET_SECONDS' in overrides
+        count = min(args.requests, args.threads * 3) if unbounded else args.requests
+        started = time.perf_counter()
+        latencies, fallbacks = run(app, count, args.threads)
+        elapsed = time.perf_counter() - started
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+        print(f"{name}: {count} requests in {elapsed:.1f}s, p50 {p50:.0f}ms, p99 {p99:.0f}ms, "
+              f"max {latencies.max() * 1e3:.0f}ms; {fallbacks} fell back to default factors")
+
+        traffic = context_cache.provider.clients['traffic'].stats()
+        latency = traffic['latency_seconds']
+        print(f"  traffic client: circuit {traffic['circuit']} (opened {traffic['circuit_opened']}x), "
+              f"{traffic['calls']} calls, errors {traffic['errors']}, latency p50 <= {latency['p50']}s")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the streaming per-driver risk estimator
+
+Feeds synthetic driving events for many drivers straight into RiskStream
+(no HTTP) from one or more threads and reports sustained events/sec, then
+times a SQLite snapshot and restore of the resulting state.
+
+    python benchmarks/bench_risk_stream.py --events 1000000 --drivers 100000 --threads 4
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.risk_stream import RiskStream, EVENT_IMPACTS
+
+SEVERITIES = ('low', 'medium', 'high')
+
+def make_events(count, drivers, seed):
+    """Pre-generate (policyholder_id, event_type, severity, at) tuples over one simulated hour"""
+    rng = random.Random(seed)
+    ids = [f"PH-{i:010d}" for i in range(drivers)]
+    types = list(EVENT_IMPACTS)
+    start = time.time()
+    return [
+        (rng.choice(ids), rng.choice(types), rng.choice(SEVERITIES), start + i * 3600.0 / count)
+        for i in range(count)
+    ]
+
+def run(stream, events, threads):
+    """Replay events split across threads; returns elapsed seconds"""
+    chunks = [events[i::threads] for i in range(threads)]
+
+    def worker(chunk):
+        observe = stream.observe
+        for policyholder_id, event_type, severity, at in chunk:
+            observe(policyholder_id, event_type, severity, at)
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--drivers', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--shards', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"Generating {args.events} events for {args.drivers} drivers...")
+    events = make_events(args.events, args.drivers, args.seed)
+
+    stream = RiskStream(shards=args.shards)
+    elapsed = run(stream, events, args.threads)
+    print(f"Observed {args.events} events on {args.threads} thread(s) in {elapsed:.2f}s "
+          f"({args.events / elapsed:,.0f} events/sec, {elapsed / args.events * 1e6:.2f} us/event)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'risk_stream.sqlite3')
+        started = time.perf_counter()
+        rows = stream.snapshot(path)
+        snapshot_seconds = time.perf_counter() - started
+        size_mb = os.path.getsize(path) / 1e6
+
+        restored_stream = RiskStream(shards=args.shards)
+        started = time.perf_counter()
+        restored = restored_stream.restore(path)
+        restore_seconds = time.perf_counter() - started
+
+    print(f"Snapshot: {rows} drivers in {snapshot_seconds:.2f}s ({size_mb:.1f} MB); "
+          f"restore: {restored} drivers in {restore_seconds:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark application startup
+
+Measures, in fresh interpreters, how long it takes to import the app and
+build it with create_app(), against the old startup path that also ran
+db.create_all() on every boot, and how long a worker forked from a
+preloaded master (as gunicorn does with preload_app) takes to answer its
+first request.
+
+    python benchmarks/bench_startup.py --runs 7
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {backend!r})
+from src.main import create_app
+app = create_app('production', SQLALCHEMY_DATABASE_URI={database!r})
+if {create_all!r}:
+    from src.models.telematics import db
+    with app.app_context():
+        db.create_all()
+print(time.perf_counter() - started)
+"""
+
+PRELOADED_FORK = """
+import os, sys, time
+sys.path.insert(0, {backend!r})
+from src.main import create_app
+from src.models.telematics import db
+app = create_app('production', SQLALCHEMY_DATABASE_URI={database!r})
+with app.app_context():
+    db.create_all()
+read, write = os.pipe()
+started = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    with app.app_context():
+        db.engine.dispose(close=False)
+    status = app.test_client().get('/api/policyholders').status_code
+    os.write(write, f"{{time.perf_counter() - started}} {{status}}".encode())
+    os._exit(0)
+os.waitpid(pid, 0)
+elapsed, status = os.read(read, 64).decode().split()
+assert status == '200', status
+print(elapsed)
+"""
+
+def timed(script, runs):
+    """Median and min seconds reported by `script` over `runs` fresh interpreters"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout.split()[-1]))
+    return statistics.median(samples), min(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        database = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+        cases = {
+            'create_app()': COLD_START.format(backend=BACKEND_DIR, database=database, create_all=False),
+            'create_app() + create_all()': COLD_START.format(backend=BACKEND_DIR, database=database, create_all=True),
+            'preloaded fork to first response': PRELOADED_FORK.format(backend=BACKEND_DIR, database=database)
+        }
+        for name, script in cases.items():
+            median, best = timed(script, args.runs)
+            print(f"{name}: median {median * 1e3:.0f}ms, min {best * 1e3:.0f}ms over {args.runs} runs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark /api/trips serialization at 10k rows
+
+Compares the previous ORM hydration + to_dict() + jsonify path with the
+column-only serializers, for the full fieldset and a sparse ?fields= request.
+Runs against a throwaway SQLite database; no server needs to be running.
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from src.models.telematics import Policyholder, Trip, db
+from src.models import serializers
+from src.routes.telematics import telematics_bp
+
+TRIP_COUNT = 10000
+REPEATS = 5
+SPARSE_FIELDS = 'id,start_timestamp,distance_km,harsh_braking_count'
+
+def create_app(database_path):
+    """Minimal app with the telematics routes on a scratch database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database_path}"
+    app.config['MAX_PAGE_SIZE'] = TRIP_COUNT  # Serialize the whole table in one page
+    db.init_app(app)
+    app.register_blueprint(telematics_bp, url_prefix='/api')
+
+    # Previous implementation, kept here as the baseline
+    @app.route('/legacy/trips')
+    def legacy_trips():
+        return jsonify([trip.to_dict() for trip in Trip.query.all()])
+
+    with app.app_context():
+        db.create_all()
+    return app
+
+def seed_trips(app, count):
+    """Insert one policyholder and `count` trips with route geometry"""
+    with app.app_context():
+        policyholder = Policyholder(first_name='Bench', last_name='Mark', date_of_birth=datetime(1985, 6, 15).date())
+        db.session.add(policyholder)
+        db.session.flush()
+
+        start = datetime.utcnow() - timedelta(days=365)
+        geometry = json.dumps({
+            'type': 'LineString',
+            'coordinates': [[-122.4 + i * 0.001, 37.7 + i * 0.001] for i in range(150)]
+        })
+        rows = []
+        for i in range(count):
+            trip_start = start + timedelta(minutes=37 * i)
+            rows.append({
+                'id': f"trip-{i:08d}",
+                'policyholder_id': policyholder.id,
+                'start_timestamp': trip_start,
+                'end_timestamp': trip_start + timedelta(minutes=25),
+                'duration_seconds': 1500,
+                'distance_km': random.uniform(2, 40),
+                'avg_speed_kph': random.uniform(20, 90),
+                'max_speed_kph': random.randint(50, 130),
+                'harsh_braking_count': random.randint(0, 3),
+                'route_geometry': geometry,
+                'created_at': trip_start
+            })
+        db.session.execute(db.insert(Trip), rows)
+        db.session.commit()
+
+def measure(client, url):
+    """Best-of-N wall time and payload size for a GET"""
+    best = float('inf')
+    size = 0
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.status_code
+        best = min(best, elapsed)
+        size = len(response.data)
+    return best, size
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app(os.path.join(workdir, 'bench.db'))
+        seed_trips(app, TRIP_COUNT)
+        client = app.test_client()
+
+        print(f"/api/trips with {TRIP_COUNT} rows (best of {REPEATS}), "
+              f"encoder: {'orjson' if serializers.orjson else 'json'}")
+        print(f"{'variant':<72} {'ms':>10} {'bytes':>12}")
+
+        cases = [
+            ('legacy ORM + to_dict + jsonify', '/legacy/trips'),
+            ('column-only, all fields', f'/api/trips?limit={TRIP_COUNT}'),
+            (f'column-only, fields={SPARSE_FIELDS}', f'/api/trips?limit={TRIP_COUNT}&fields={SPARSE_FIELDS}')
+        ]
+        for label, url in cases:
+            elapsed, size = measure(client, url)
+            print(f"{label:<72} {elapsed * 1000:>10.1f} {size:>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Cold-start regression check for the backend
+
+Times `import src.main; create_app()` in fresh interpreters and fails
+(exit 1) if it takes longer than the budget, or if building the app
+executes any of the deferred heavy dependencies (NumPy, requests), which
+should only load on the first request that needs them. Prints the slowest
+of the app's own imports on failure. Suitable for CI:
+
+    python benchmarks/check_import_time.py --budget-ms 100
+
+The budget covers what the app adds to a cold start: Flask, Flask-CORS and
+SQLAlchemy are imported first and timed separately. That floor (~370 ms on
+one vCPU) is paid by any process serving the app and no lazy registration
+removes it, so it is reported but not budgeted.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies kept off the startup path with src.lazy.lazy_import
+DEFERRED = ('numpy', 'requests')
+
+# create_app() on top of the framework imports, checked against the fastest run
+BUDGET_MS = 100.0
+
+# Imported by any serving process before the app's own code
+FRAMEWORKS = "import flask, flask_cors, flask_sqlalchemy, sqlalchemy.dialects.sqlite"
+BUILD_APP = "import src.main; src.main.create_app('testing')"
+
+COLD_START = f"""
+import json, time
+start = time.perf_counter()
+{FRAMEWORKS}
+loaded = time.perf_counter()
+{BUILD_APP}
+print(json.dumps([(loaded - start) * 1e3, (time.perf_counter() - loaded) * 1e3]))
+"""
+
+def cold_start():
+    """(framework import ms, create_app ms on top of it) in a fresh interpreter"""
+    output = subprocess.run([sys.executable, '-c', COLD_START], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.splitlines()[-1])
+
+def import_times(code):
+    """{module: (cumulative microseconds, nesting depth)} for the imports `code` runs in a fresh interpreter"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.setdefault(name.strip(), (int(cumulative), depth))
+    return times
+
+def deferred_loaded(times):
+    """Deferred dependencies among the imports; a lazily imported package shows up only once it really executes"""
+    return sorted(name for name in times if name.split('.')[0] in DEFERRED)
+
+def slowest(times, count=10):
+    """The app's own slowest imports; framework internals are under the unbudgeted floor"""
+    return sorted(((name, cumulative) for name, (cumulative, _) in times.items() if name.startswith('src.')),
+                  key=lambda item: item[1], reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS,
+                        help='Budget for create_app() on top of the framework imports')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time; the fastest is checked')
+    args = parser.parse_args()
+    failed = False
+
+    runs = [cold_start() for _ in range(args.runs)]
+    samples = [app_ms for _, app_ms in runs]
+    best = min(samples)
+    floor = min(framework_ms for framework_ms, _ in runs)
+    print(f"create_app(): min {best:.1f}ms, median {statistics.median(samples):.1f}ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f}ms)")
+    print(f"  on top of {floor:.0f}ms importing Flask and SQLAlchemy: cold start {floor + best:.0f}ms")
+
+    times = import_times(FRAMEWORKS + '; ' + BUILD_APP)
+    if best > args.budget_ms:
+        failed = True
+        print("  over budget; the app's slowest imports (cumulative):")
+        for name, microseconds in slowest(times):
+            print(f"    {microseconds / 1e3:8.1f}ms  {name}")
+
+    loaded = deferred_loaded(times)
+    if loaded:
+        failed = True
+        print(f"  deferred dependencies loaded at startup: {', '.join(loaded[:10])}")
+
+    print('FAIL' if failed else 'OK')
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Local fake HTTP gateway for the external context providers
+
+Serves StubProvider payloads at /weather, /forecast, /traffic, /crime,
+/accidents and /road_conditions with a configurable delay per source, so the
+HTTP provider clients can be exercised offline. Point the app at it with
+
+    EXTERNAL_CONTEXT_URLS = {'weather': 'http://127.0.0.1:8765', 'traffic': 'http://127.0.0.1:8765', ...}
+
+    python benchmarks/fake_context_server.py --port 8765 --latency weather=0.2 --latency traffic=0.3
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.context_providers import StubProvider
+
+SOURCES = ('weather', 'forecast', 'traffic', 'crime', 'accidents', 'road_conditions')
+
+class FakeContextHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like real providers
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        source = url.path.strip('/')
+        if source not in SOURCES:
+            self.send_error(404)
+            return
+
+        params = {name: float(value) for name, value in parse_qsl(url.query)}
+        if 'days' in params:
+            params['days'] = int(params['days'])
+        self.server.requests[source] = self.server.requests.get(source, 0) + 1
+        time.sleep(self.server.latencies.get(source, 0.0))
+
+        body = json.dumps(getattr(self.server.stub, source)(**params)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped waiting
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fake_server(latencies=None, port=0):
+    """Serve on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeContextHandler)
+    server.daemon_threads = True
+    server.stub = StubProvider()
+    server.latencies = latencies or {}
+    server.requests = {}
+    threading.Thread(target=server.serve_forever, name='fake-context-server', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', action='append', default=[], metavar='SOURCE=SECONDS')
+    args = parser.parse_args()
+
+    latencies = {source: float(seconds) for source, seconds in (item.split('=') for item in args.latency)}
+    server, url = start_fake_server(latencies, args.port)
+    print(f"Serving fake context providers at {url} (latencies: {latencies or 'none'})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Load test for the real-time feedback SSE channel
+
+Opens many idle /api/feedback/stream/<policyholder_id> connections against a
+running server, holds them, then posts feedback events for a sample of the
+channels and measures how long each takes to reach its stream. Idle streams
+need a cooperative worker to be cheap; point it at the stream server, e.g.:
+
+    STREAM_SERVER_BIND=0.0.0.0:5000 gunicorn -c gunicorn.stream.conf.py src.wsgi:app
+    python benchmarks/sse_load_test.py --connections 10000 --server-pid <gunicorn worker pid>
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import time
+from urllib.parse import urlparse
+
+def raise_fd_limit(needed):
+    """Make sure this client can hold `needed` sockets"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(hard, max(soft, needed + 256))
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return target
+
+def server_rss_mb(pid):
+    """Resident memory of the server process, from /proc"""
+    if not pid:
+        return None
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+class StreamClient:
+    """One SSE connection that records when each event id arrives"""
+
+    def __init__(self, host, port, policyholder_id):
+        self.host = host
+        self.port = port
+        self.policyholder_id = policyholder_id
+        self.connected = asyncio.Event()
+        self.received = {}
+        self.writer = None
+
+    async def run(self):
+        reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f"GET /api/feedback/stream/{self.policyholder_id} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b'retry:'):
+                self.connected.set()
+            elif line.startswith(b'data:'):
+                payload = json.loads(line[5:])
+                marker = payload.get('location', {}).get('load_test_id')
+                if marker is not None:
+                    self.received[marker] = time.perf_counter()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+async def post_feedback(host, port, policyholder_id, marker):
+    """POST one feedback event tagged with a marker; returns the send time"""
+    body = json.dumps({
+        'event_type': 'harsh_braking',
+        'severity': 'medium',
+        'policyholder_id': policyholder_id,
+        'location': {'load_test_id': marker}
+    }).encode()
+    reader, writer = await asyncio.open_connection(host, port)
+    sent_at = time.perf_counter()
+    writer.write(
+        f"POST /api/real-time-feedback HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    return sent_at
+
+async def run_load_test(args):
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    raise_fd_limit(args.connections + args.events)
+
+    clients = [StreamClient(host, port, f"PH-load-{i:06d}") for i in range(args.connections)]
+    rss_before = server_rss_mb(args.server_pid)
+
+    started = time.perf_counter()
+    tasks = []
+    for start in range(0, len(clients), args.ramp_batch):
+        batch = clients[start:start + args.ramp_batch]
+        tasks.extend(asyncio.create_task(client.run()) for client in batch)
+        await asyncio.sleep(0)
+    try:
+        await asyncio.wait_for(asyncio.gather(*(client.connected.wait() for client in clients)), args.connect_timeout)
+    except asyncio.TimeoutError:
+        pass
+    connected = sum(1 for client in clients if client.connected.is_set())
+    connect_seconds = time.perf_counter() - started
+
+    print(f"Connected {connected}/{args.connections} streams in {connect_seconds:.1f}s")
+    await asyncio.sleep(args.idle_seconds)
+    rss_idle = server_rss_mb(args.server_pid)
+
+    # Fan a sample of events out to random streams and time delivery
+    step = max(1, len(clients) // args.events)
+    targets = clients[::step][:args.events]
+    sent = {}
+    for marker, client in enumerate(targets):
+        sent[marker] = (client, await post_feedback(host, port, client.policyholder_id, marker))
+    await asyncio.sleep(args.drain_seconds)
+
+    latencies = sorted(
+        (client.received[marker] - sent_at) * 1000
+        for marker, (client, sent_at) in sent.items() if marker in client.received
+    )
+    print(f"Delivered {len(latencies)}/{len(sent)} events")
+    if latencies:
+        print(f"Delivery latency ms: p50={latencies[len(latencies) // 2]:.1f} "
+              f"p99={latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.1f} max={latencies[-1]:.1f}")
+    if rss_before is not None and rss_idle is not None:
+        per_connection = (rss_idle - rss_before) * 1024 / max(connected, 1)
+        print(f"Server RSS: {rss_before:.1f} MB -> {rss_idle:.1f} MB ({per_connection:.1f} KB per idle stream)")
+
+    for client in clients:
+        client.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--connections', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--ramp-batch', type=int, default=500, help='Connections opened per event loop turn')
+    parser.add_argument('--connect-timeout', type=float, default=60)
+    parser.add_argument('--idle-seconds', type=float, default=5, help='Hold idle before publishing')
+    parser.add_argument('--drain-seconds', type=float, default=5, help='Wait for deliveries after publishing')
+    parser.add_argument('--server-pid', type=int, help='Worker pid to sample RSS from /proc')
+    asyncio.run(run_load_test(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
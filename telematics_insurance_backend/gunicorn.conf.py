@@ -0,0 +1,68 @@
+"""
+Gunicorn settings for the production server
+
+    APP_ENV=production gunicorn -c gunicorn.conf.py src.wsgi:app
+
+Worker and thread counts, bind address, timeout and worker recycling come
+from the SERVER_* settings in src/config.py. The app is imported once in the
+master and forked into the workers; each worker then drops the database
+connections it inherited so no two processes share a socket.
+
+Feedback streams (SSE) are served by gunicorn.stream.conf.py; with more
+than one worker here, set FEEDBACK_BUS_PATH so the events these workers
+publish reach it, and METRICS_DIR so /metrics reports every worker.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import get_config
+
+_config = get_config(os.environ.get('APP_ENV', 'production'))
+
+bind = _config.SERVER_BIND
+workers = _config.SERVER_WORKERS
+threads = _config.SERVER_THREADS
+worker_class = _config.SERVER_WORKER_CLASS
+timeout = _config.SERVER_TIMEOUT_SECONDS
+max_requests = _config.SERVER_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+preload_app = True
+
+def post_fork(server, worker):
+    """Discard pooled connections inherited from the master, then load the worker's rank index"""
+    from src.models.telematics import db
+    from src.services.ranking import rank_index
+
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # Driver score lookups never wait on the full score reload
+    rank_index.start_refreshing(app)
+
+def on_starting(server):
+    """Start from empty shared metrics, restore live risk state, and warn about per-worker state"""
+    from src.services.risk_stream import risk_stream
+
+    if risk_stream.snapshot_path and not risk_stream.socket_path:
+        # Restored once, before the fork, so every worker starts from it
+        restored = risk_stream.restore_all()
+        server.log.info("Restored live risk state for %d drivers from %s", restored, risk_stream.snapshot_path)
+    elif workers > 1 and not risk_stream.socket_path:
+        server.log.warning(
+            "%d workers and no RISK_STREAM_SOCKET_PATH: each worker keeps its own live risk estimate per driver", workers
+        )
+
+    if _config.METRICS_DIR:
+        from src.services.metrics import reset_metrics_dir
+
+        reset_metrics_dir(_config.METRICS_DIR)
+    elif workers > 1:
+        server.log.warning("%d workers and no METRICS_DIR: /metrics only reports the worker that answers it", workers)
+    if workers > 1 and not _config.FEEDBACK_BUS_PATH:
+        server.log.warning(
+            "%d workers share no feedback bus: a stream only receives events published by its own worker. "
+            "Set FEEDBACK_BUS_PATH and serve /api/feedback/stream/ with gunicorn.stream.conf.py", workers
+        )
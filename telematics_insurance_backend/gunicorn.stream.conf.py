@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for the feedback stream server
+
+    APP_ENV=production FEEDBACK_BUS_PATH=/tmp/feedback-bus.sock gunicorn -c gunicorn.stream.conf.py src.wsgi:app
+
+Runs next to the main server (gunicorn.conf.py) and serves
+/api/feedback/stream/ from one cooperative gevent worker, so an idle stream
+costs a greenlet and a socket instead of a thread; route that path here
+from the reverse proxy. The main server's workers relay the feedback they
+publish over the FEEDBACK_BUS_PATH socket, and this worker listens on it.
+With RISK_STREAM_SOCKET_PATH set, this worker also owns every driver's live
+risk estimate and answers the events the main server's workers forward.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.config import get_config
+
+_config = get_config(os.environ.get('APP_ENV', 'production'))
+
+bind = _config.STREAM_SERVER_BIND
+workers = 1  # Every stream must see every relayed event
+worker_class = 'gevent'
+worker_connections = _config.STREAM_SERVER_WORKER_CONNECTIONS
+timeout = _config.SERVER_TIMEOUT_SECONDS
+# Load the app in the worker, after gevent has patched threading and sockets
+preload_app = False
+# Its own control socket (gunicornc), apart from the main server's
+control_socket = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or os.path.expanduser(os.path.join('~', '.gunicorn')),
+                              'gunicorn-stream.ctl')
+
+def post_worker_init(worker):
+    """Start receiving the events relayed by the main server, and serve the live risk state it forwards to"""
+    from src.services.pubsub import feedback_broker
+    from src.services.risk_stream import risk_stream
+
+    if feedback_broker.bus_path:
+        feedback_broker.listen()
+    else:
+        worker.log.warning("FEEDBACK_BUS_PATH is not set; streams only get events posted to this server")
+
+    if risk_stream.socket_path:
+        restored = risk_stream.serve()
+        worker.log.info("Serving live risk state for %d drivers on %s", restored, risk_stream.socket_path)
@@ -0,0 +1,229 @@
+import click
+import os
+import time
+from flask.cli import with_appcontext
+
+@click.command('simulate-premiums')
+@click.option('--snapshot', 'snapshot_path', type=click.Path(exists=True, dir_okay=False),
+              help='Run offline against a saved .npz book snapshot instead of the database.')
+@click.option('--save-snapshot', 'save_path', type=click.Path(dir_okay=False),
+              help='Write the database snapshot to this .npz path before simulating.')
+@click.option('--weight', 'weights', multiple=True, metavar='FEATURE=WEIGHT',
+              help='Candidate scoring weight; repeat for several features.')
+@click.option('--intercept', default=0.0, show_default=True, help='Candidate scoring intercept.')
+@click.option('--base-adjustment', default=-20.0, show_default=True, help='Candidate premium adjustment at risk 0 (%).')
+@click.option('--risk-penalty', default=50.0, show_default=True, help='Candidate premium penalty at risk 1 (%).')
+@click.option('--floor', type=float, help='Lowest allowed premium adjustment (%).')
+@click.option('--cap', type=float, help='Highest allowed premium adjustment (%).')
+@click.option('--base-premium', default=1000.0, show_default=True, help='Annual base premium per policy.')
+@with_appcontext
+def simulate_premiums_command(snapshot_path, save_path, weights, intercept, base_adjustment,
+                              risk_penalty, floor, cap, base_premium):
+    """Run a book-wide what-if simulation of scoring and premium changes."""
+    from src.services.premium_simulation import (
+        snapshot_book, save_snapshot, load_snapshot, linear_scorer,
+        linear_premium_curve, run_simulation, format_report
+    )
+
+    if snapshot_path:
+        snapshot = load_snapshot(snapshot_path)
+    else:
+        snapshot = snapshot_book()
+        if save_path:
+            save_snapshot(snapshot, save_path)
+
+    score_fn = None
+    if weights:
+        parsed = {}
+        for weight in weights:
+            feature, _, value = weight.partition('=')
+            try:
+                parsed[feature.strip()] = float(value)
+            except ValueError:
+                raise click.BadParameter(f"Expected FEATURE=WEIGHT, got '{weight}'", param_hint='--weight')
+        score_fn = linear_scorer(parsed, intercept)
+
+    premium_fn = linear_premium_curve(base_adjustment, risk_penalty, floor, cap)
+    report = run_simulation(snapshot, score_fn=score_fn, premium_fn=premium_fn, base_premium=base_premium)
+    click.echo(format_report(report))
+
+@click.command('export')
+@click.argument('dataset', type=click.Choice(['trips', 'raw-data', 'risk-history']))
+@click.option('--start', help='Inclusive ISO start of the time range.')
+@click.option('--end', help='Exclusive ISO end of the time range.')
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'ndjson', 'parquet']), default='csv', show_default=True)
+@click.option('--output', required=True, type=click.Path(dir_okay=False), help='File to write.')
+@click.option('--policyholder-id', help='Only export one policyholder.')
+@click.option('--fields', help='Comma-separated columns to export (default: all).')
+@click.option('--chunk-size', default=5000, show_default=True, type=click.IntRange(min=1), help='Rows fetched per server-side cursor batch.')
+@click.option('--resume', is_flag=True, help='Continue an interrupted csv/ndjson export from OUTPUT.cursor.')
+@with_appcontext
+def export_command(dataset, start, end, export_format, output, policyholder_id, fields, chunk_size, resume):
+    """Stream a dataset for a time range to a local CSV, NDJSON or Parquet file."""
+    from src.services.export import ExportJob, EXPORT_DATASETS, parse_export_time
+
+    cursor_path = f"{output}.cursor"
+    cursor = None
+    if resume:
+        if export_format == 'parquet':
+            raise click.UsageError('Parquet exports cannot be resumed; rerun without --resume.')
+        if os.path.exists(cursor_path):
+            with open(cursor_path) as cursor_file:
+                cursor = cursor_file.read().strip() or None
+
+    field_names = None
+    if fields:
+        field_names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in field_names if name not in EXPORT_DATASETS[dataset][1].field_names]
+        if unknown:
+            raise click.BadParameter(f"Unknown fields: {', '.join(unknown)}", param_hint='--fields')
+
+    try:
+        start, end = parse_export_time(start), parse_export_time(end)
+    except ValueError:
+        raise click.BadParameter('--start and --end must be ISO 8601 dates or datetimes')
+
+    job = ExportJob(dataset, start=start, end=end, cursor=cursor,
+                    fields=field_names, policyholder_id=policyholder_id, chunk_size=chunk_size)
+    started = time.perf_counter()
+
+    if export_format == 'parquet':
+        try:
+            job.write_columnar(output)
+        except RuntimeError as error:
+            raise click.ClickException(str(error))
+        size = os.path.getsize(output)
+    else:
+        with open(output, 'ab' if cursor else 'wb') as out:
+            for chunk in job.iter_format(export_format):
+                out.write(chunk)
+                out.flush()
+                # Checkpoint only after the chunk is safely written
+                with open(cursor_path, 'w') as cursor_file:
+                    cursor_file.write(job.cursor or '')
+            size = out.tell()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    click.echo(f"Exported {job.rows_exported} {dataset} rows to {output} "
+               f"({size / 1e6:.1f} MB, {size / 1e6 / elapsed:.1f} MB/s)")
+
+@click.command('award-achievements')
+@click.option('--snapshot', 'snapshot_path', type=click.Path(exists=True, dir_okay=False),
+              help='Evaluate a saved .npz book snapshot instead of reading the database.')
+@click.option('--dry-run', is_flag=True, help='Report who would be awarded without writing.')
+@with_appcontext
+def award_achievements_command(snapshot_path, dry_run):
+    """Evaluate every achievement for the whole book and persist new awards."""
+    from src.services.premium_simulation import snapshot_book, load_snapshot
+    from src.services.achievements import ACHIEVEMENT_RULES, award_achievements, evaluate_book
+
+    started = time.perf_counter()
+    snapshot = load_snapshot(snapshot_path) if snapshot_path else snapshot_book()
+
+    if dry_run:
+        counts = {achievement_id: int(mask.sum()) for achievement_id, mask in evaluate_book(ACHIEVEMENT_RULES, snapshot).items()}
+        label = 'meeting criteria'
+    else:
+        counts = award_achievements(ACHIEVEMENT_RULES, snapshot)
+        label = 'newly awarded'
+
+    for achievement_id, count in counts.items():
+        click.echo(f"{achievement_id}: {count} {label}")
+    click.echo(f"Evaluated {len(ACHIEVEMENT_RULES)} achievements for {len(snapshot['ids'])} policyholders "
+               f"in {time.perf_counter() - started:.2f}s")
+
+@click.command('rebuild-challenges')
+@with_appcontext
+def rebuild_challenges_command():
+    """Recompute all challenge progress by replaying every trip."""
+    from src.services.challenges import challenge_tracker, rebuild_progress
+
+    started = time.perf_counter()
+    trips = rebuild_progress(challenge_tracker)
+    click.echo(f"Replayed {trips} trips into challenge progress in {time.perf_counter() - started:.2f}s")
+
+@click.command('award-behavior-bonus')
+@click.option('--period', help='Bonus period label, e.g. 2025-09 (default: the current month).')
+@with_appcontext
+def award_behavior_bonus_command(period):
+    """Post a period's safe driving bonus to every driver's points ledger (once per period)."""
+    from src.services.points import award_behavior_bonus
+    from datetime import datetime
+
+    period = period or datetime.utcnow().strftime('%Y-%m')
+    posted = award_behavior_bonus(period)
+    click.echo(f"Posted {posted} behavior bonus entries for {period}")
+
+@click.command('replay-points')
+@click.option('--policyholder-id', help='Only rebuild one policyholder.')
+@with_appcontext
+def replay_points_command(policyholder_id):
+    """Rebuild points balances from the append-only ledger."""
+    from src.services.points import replay_balances
+
+    started = time.perf_counter()
+    rebuilt = replay_balances(policyholder_id)
+    click.echo(f"Rebuilt {rebuilt} points balances in {time.perf_counter() - started:.2f}s")
+
+@click.command('build-incident-index')
+@click.argument('dataset', type=click.Choice(['crime', 'accidents']))
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', 'output_dir', type=click.Path(file_okay=False),
+              help='Index root directory (default: INCIDENT_INDEX_DIR).')
+@click.option('--cell-degrees', default=0.01, show_default=True, help='Grid cell size in degrees.')
+@click.option('--hotspot-degrees', default=0.002, show_default=True, help='Hotspot cell size in degrees.')
+@click.option('--hotspot-min-count', default=3, show_default=True, help='Incidents needed for a hotspot.')
+@with_appcontext
+def build_incident_index_command(dataset, csv_path, output_dir, cell_degrees, hotspot_degrees, hotspot_min_count):
+    """Build the memory-mapped spatial index for a geocoded incident CSV."""
+    from flask import current_app
+    from src.services.spatial_index import IncidentIndex, read_incidents
+
+    output_dir = output_dir or current_app.config.get('INCIDENT_INDEX_DIR')
+    if not output_dir:
+        raise click.UsageError('Pass --output or set INCIDENT_INDEX_DIR')
+
+    started = time.perf_counter()
+    lat, lon, severity, kinds, kind_names = read_incidents(csv_path)
+    index = IncidentIndex.build(lat, lon, severity, kinds, kind_names, cell_degrees, hotspot_degrees, hotspot_min_count)
+    index.save(os.path.join(output_dir, dataset))
+    click.echo(f"Indexed {index.meta['incidents']} {dataset} incidents ({index.meta['hotspots']} hotspots) "
+               f"into {os.path.join(output_dir, dataset)} in {time.perf_counter() - started:.2f}s")
+
+@click.command('import-weather')
+@click.argument('csv_paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def import_weather_command(csv_paths):
+    """Load hourly historical weather CSVs into the weather store."""
+    from src.services.weather_history import import_weather
+
+    for csv_path in csv_paths:
+        started = time.perf_counter()
+        records, skipped = import_weather(csv_path)
+        click.echo(f"Imported {records} cell-hours from {csv_path} ({skipped} rows skipped) "
+                   f"in {time.perf_counter() - started:.2f}s")
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """Create any missing tables and their indexes (existing tables are left as they are)."""
+    from src.models.telematics import db
+
+    before = set(db.inspect(db.engine).get_table_names())
+    started = time.perf_counter()
+    db.create_all()
+    created = sorted(set(db.inspect(db.engine).get_table_names()) - before)
+    click.echo(f"Created {len(created)} tables in {time.perf_counter() - started:.2f}s"
+               + (f": {', '.join(created)}" if created else ''))
+
+def register_commands(app):
+    """Attach the maintenance and analysis commands to the Flask CLI"""
+    app.cli.add_command(simulate_premiums_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(award_achievements_command)
+    app.cli.add_command(rebuild_challenges_command)
+    app.cli.add_command(award_behavior_bonus_command)
+    app.cli.add_command(replay_points_command)
+    app.cli.add_command(build_incident_index_command)
+    app.cli.add_command(import_weather_command)
+    app.cli.add_command(migrate_command)
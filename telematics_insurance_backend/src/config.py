@@ -0,0 +1,57 @@
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class Config:
+    """Settings shared by every environment
+
+    Deployment-specific values come from environment variables; any other
+    setting can be overridden with a FLASK_-prefixed variable, e.g.
+    FLASK_EXTERNAL_CONTEXT_LATENCY_BUDGET_SECONDS=1.5 (values are parsed as JSON).
+    """
+
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', f"sqlite:///{os.path.join(BASE_DIR, 'database', 'app.db')}")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Production server (gunicorn.conf.py): preforked worker processes, each with a thread pool
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:5000')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+    SERVER_WORKER_CLASS = os.environ.get('SERVER_WORKER_CLASS', 'gthread')
+    SERVER_TIMEOUT_SECONDS = int(os.environ.get('SERVER_TIMEOUT_SECONDS', 30))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 0))  # Recycle workers after this many; 0 never
+    # Workers write their /metrics counters here so any worker can answer a scrape for all of them
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+
+    # Feedback stream server (gunicorn.stream.conf.py): one gevent worker holding the SSE connections.
+    # The main server's workers relay the feedback they publish to it over the FEEDBACK_BUS_PATH socket.
+    STREAM_SERVER_BIND = os.environ.get('STREAM_SERVER_BIND', '0.0.0.0:5001')
+    STREAM_SERVER_WORKER_CONNECTIONS = int(os.environ.get('STREAM_SERVER_WORKER_CONNECTIONS', 12000))
+    FEEDBACK_BUS_PATH = os.environ.get('FEEDBACK_BUS_PATH')
+    # The stream server's worker also owns the live risk state; the main server's workers forward events
+    # to it over this socket, so each driver has one estimate however many workers take the requests
+    RISK_STREAM_SOCKET_PATH = os.environ.get('RISK_STREAM_SOCKET_PATH')
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+class ProductionConfig(Config):
+    DEBUG = False
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig
+}
+
+def get_config(name=None):
+    """Config class for an environment name, default APP_ENV (or development)"""
+    name = name or os.environ.get('APP_ENV', 'development')
+    if name not in CONFIGS:
+        raise ValueError(f"Unknown APP_ENV {name!r}; expected one of {', '.join(CONFIGS)}")
+    return CONFIGS[name]
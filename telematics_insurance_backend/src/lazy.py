@@ -0,0 +1,27 @@
+import importlib
+import sys
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access
+
+    Keeps heavy dependencies such as NumPy and requests off the startup path;
+    the cost moves to the first request that actually uses them. Loading goes
+    through importlib.import_module, whose per-module lock makes a first use
+    from several threads at once safe. Attributes are cached on the proxy, so
+    later lookups cost the same as on the module itself.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        value = getattr(importlib.import_module(self._name), attribute)
+        setattr(self, attribute, value)
+        return value
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+def lazy_import(name):
+    """Module `name` if it is already loaded, otherwise a LazyModule for it"""
+    return sys.modules.get(name) or LazyModule(name)
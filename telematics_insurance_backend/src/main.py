@@ -1,47 +1,94 @@
+import importlib
 import os
 import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.telematics import telematics_bp
-from src.routes.data_processing import data_processing_bp
-from src.routes.gamification import gamification_bp
-from src.routes.external_data import external_data_bp
+from src.config import get_config
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+# Blueprints as (module, attribute, URL prefix). Their modules, and the
+# models and services behind them, are imported when an app is built rather
+# than when this module is, so `import src.main` stays cheap.
+BLUEPRINTS = (
+    ('src.routes.metrics', 'metrics_bp', None),
+    ('src.routes.user', 'user_bp', '/api'),
+    ('src.routes.telematics', 'telematics_bp', '/api'),
+    ('src.routes.data_processing', 'data_processing_bp', '/api'),
+    ('src.routes.gamification', 'gamification_bp', '/api'),
+    ('src.routes.external_data', 'external_data_bp', '/api'),
+    ('src.routes.export', 'export_bp', '/api'),
+    ('src.routes.profiling', 'profiling_bp', '/api')
+)
 
-# Enable CORS for all routes
-CORS(app)
+def create_app(config_name=None, **overrides):
+    """Build the application for an environment: development, production or testing (default APP_ENV)
 
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(telematics_bp, url_prefix='/api')
-app.register_blueprint(data_processing_bp, url_prefix='/api')
-app.register_blueprint(gamification_bp, url_prefix='/api')
-app.register_blueprint(external_data_bp, url_prefix='/api')
+    Nothing touches the database here; create or update the schema with
+    `flask --app src/main.py migrate`.
+    """
+    from flask import Flask, send_from_directory
+    from flask_cors import CORS
+    from src.models.telematics import db
+    from src.cli import register_commands
+    from src.services.dashboard import configure_dashboard_cache
+    from src.services.pubsub import configure_feedback_broker
+    from src.services.leaderboard import configure_leaderboard
+    from src.services.cohorts import configure_cohort_leaderboards
+    from src.services.ranking import configure_rank_index
+    from src.services.profiles import configure_profile_cache
+    from src.services.risk_stream import configure_risk_stream
+    from src.services.external_context import configure_context_cache
+    from src.services.spatial_index import configure_incident_indexes
+    from src.services.weather_history import configure_weather_history
+    from src.services.metrics import configure_route_metrics
+    from src.services.query_budget import configure_query_checks
+    from src.services.profiling import configure_request_profiler
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config.from_object(get_config(config_name))
+    app.config.from_prefixed_env()
+    app.config.update(overrides)
 
-# Initialize database
-db.init_app(app)
+    # Enable CORS for all routes; expose the paging and caching headers to browsers
+    CORS(app, expose_headers=['X-Next-Cursor', 'Link', 'ETag', 'Last-Modified'])
 
-# Create database tables
-with app.app_context():
-    db.create_all()
+    for module_name, attribute, url_prefix in BLUEPRINTS:
+        app.register_blueprint(getattr(importlib.import_module(module_name), attribute), url_prefix=url_prefix)
 
-@app.route('/')
-def index():
-    return send_from_directory(app.static_folder, 'index.html')
+    # Initialize database and services
+    db.init_app(app)
+    configure_dashboard_cache(app)
+    configure_feedback_broker(app)
+    configure_leaderboard(app)
+    configure_cohort_leaderboards(app)
+    configure_rank_index(app)
+    configure_profile_cache(app)
+    configure_risk_stream(app)
+    configure_context_cache(app)
+    configure_incident_indexes(app)
+    configure_weather_history(app)
+    configure_route_metrics(app)
+    configure_query_checks(app)
+    configure_request_profiler(app)
 
-@app.route('/<path:path>')
-def static_files(path):
-    return send_from_directory(app.static_folder, path)
+    # Register CLI commands (flask --app src/main.py <command>)
+    register_commands(app)
+
+    @app.route('/')
+    def index():
+        return send_from_directory(app.static_folder, 'index.html')
+
+    @app.route('/<path:path>')
+    def static_files(path):
+        return send_from_directory(app.static_folder, path)
+
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Local development server; production runs under gunicorn (see gunicorn.conf.py)
+    from src.services.risk_stream import risk_stream
+
+    app = create_app()
+    if risk_stream.snapshot_path and not risk_stream.socket_path:
+        risk_stream.restore_all()
+    app.run(debug=app.config['DEBUG'], host='0.0.0.0', port=5000)
@@ -0,0 +1,96 @@
+from flask import abort, current_app, request
+from sqlalchemy import tuple_
+from datetime import date, datetime
+from urllib.parse import urlencode
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class KeysetPage:
+    """Cursor-based keyset pagination over a stable, indexed sort key
+
+    The key columns must be unique together (end with the primary key) and be
+    covered by an index so every page is a range scan, whatever its depth.
+    Cursors are opaque to clients: base64 of the last row's key values.
+    """
+
+    def __init__(self, keys, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+        self.keys = tuple(keys)
+        self.limit = limit
+        self.descending = descending
+        self.after = decode_cursor(cursor, self.keys) if cursor else None
+        self.next_cursor = None
+
+    @classmethod
+    def from_request(cls, keys, descending=False):
+        """Read ?cursor= and ?limit= with safe defaults and a hard cap"""
+        max_size = current_app.config.get('MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+        default_size = min(current_app.config.get('DEFAULT_PAGE_SIZE', DEFAULT_PAGE_SIZE), max_size)
+        limit = request.args.get('limit', default_size, type=int)
+
+        return cls(keys, request.args.get('cursor'), max(1, min(limit, max_size)), descending)
+
+    def apply(self, query):
+        """Add the key columns, the seek predicate, ordering and LIMIT to a select"""
+        query = query.add_columns(*self.keys)
+
+        if self.after is not None:
+            if self.descending:
+                query = query.where(tuple_(*self.keys) < tuple_(*self.after))
+            else:
+                query = query.where(tuple_(*self.keys) > tuple_(*self.after))
+
+        order = [key.desc() if self.descending else key.asc() for key in self.keys]
+        # Fetch one extra row to learn whether another page exists
+        return query.order_by(*order).limit(self.limit + 1)
+
+    def finish(self, rows):
+        """Trim the look-ahead row and remember the cursor for the next page"""
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            self.next_cursor = encode_cursor(rows[-1][-len(self.keys):])
+        return rows
+
+    def headers(self):
+        """X-Next-Cursor and Link headers for the response"""
+        if not self.next_cursor:
+            return {}
+
+        args = request.args.to_dict()
+        args.update(cursor=self.next_cursor, limit=self.limit)
+        return {
+            'X-Next-Cursor': self.next_cursor,
+            'Link': f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+        }
+
+def encode_cursor(values):
+    """Encode key values as an opaque URL-safe cursor"""
+    serializable = [value.isoformat() if isinstance(value, (datetime, date)) else value for value in values]
+    raw = json.dumps(serializable, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+def decode_cursor(cursor, keys):
+    """Decode a cursor back to typed key values, or abort with 400"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError('cursor does not match this listing')
+        return [_coerce(value, key) for value, key in zip(values, keys)]
+    except (ValueError, TypeError, UnicodeError):
+        abort(400, description='Invalid pagination cursor')
+
+# Helper functions
+def _coerce(value, key):
+    """Turn a JSON cursor value back into the key column's Python type"""
+    if value is None:
+        raise ValueError('cursor keys cannot be null')
+
+    python_type = key.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
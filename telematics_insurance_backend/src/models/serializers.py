@@ -0,0 +1,70 @@
+from flask import Response, abort
+from src.models.telematics import Policyholder, Trip, RawTelematicsData, RiskScoreHistory, PointsLedgerEntry
+from src.models.user import User
+from datetime import date, datetime
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional fast encoder; fall back to the standard library
+    orjson = None
+
+class ModelSerializer:
+    """Column-level serializer for a model and a requested fieldset
+
+    Read paths select only the requested columns and serialize the raw rows,
+    so ORM objects are never hydrated and unrequested text columns are never
+    loaded. Datetimes are left to the JSON encoder.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.field_names = tuple(column.key for column in model.__table__.columns)
+        self._attributes = {name: getattr(model, name) for name in self.field_names}
+
+    def parse_fields(self, raw_fields):
+        """Validate a comma-separated ?fields= value; None means every field"""
+        if not raw_fields:
+            return self.field_names
+
+        fields = tuple(dict.fromkeys(name.strip() for name in raw_fields.split(',') if name.strip()))
+        unknown = [name for name in fields if name not in self._attributes]
+        if unknown:
+            abort(400, description=f"Unknown fields: {', '.join(unknown)}")
+
+        return fields or self.field_names
+
+    def columns(self, fields):
+        """Column expressions for a column-only select"""
+        return [self._attributes[name] for name in fields]
+
+    def serialize_rows(self, rows, fields):
+        """Serialize column-only rows selected with columns(fields)"""
+        # Nothing is cached per fieldset: clients choose the fields, and their order
+        names = tuple(fields)
+        return [dict(zip(names, row)) for row in rows]
+
+def dumps(payload):
+    """Encode a payload to JSON bytes with the fastest available encoder"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+def json_response(payload, status=200, headers=None):
+    """Build a JSON response encoded with dumps()"""
+    return Response(dumps(payload), status=status, headers=headers, mimetype='application/json')
+
+# Helper functions
+def _json_default(value):
+    """isoformat datetimes and dates like Model.to_dict does"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# Per-model serializers shared by the read endpoints
+policyholder_serializer = ModelSerializer(Policyholder)
+trip_serializer = ModelSerializer(Trip)
+raw_data_serializer = ModelSerializer(RawTelematicsData)
+risk_history_serializer = ModelSerializer(RiskScoreHistory)
+points_ledger_serializer = ModelSerializer(PointsLedgerEntry)
+user_serializer = ModelSerializer(User)
@@ -0,0 +1,92 @@
+from blinker import Namespace
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.models.telematics import Policyholder, Trip, RiskScoreHistory
+
+# Change notifications for read models and caches. Signals fire only after the
+# owning transaction commits, with the policyholder id as the sender.
+_signals = Namespace()
+
+policyholder_changed = _signals.signal('policyholder-changed')  # kwargs: fields (frozenset), created, deleted, risk_score
+trip_recorded = _signals.signal('trip-recorded')  # kwargs: trip_ids (list)
+risk_score_recorded = _signals.signal('risk-score-recorded')  # kwargs: history_ids (list)
+points_posted = _signals.signal('points-posted')  # no kwargs
+
+PENDING_KEY = 'pending_model_changes'
+
+@event.listens_for(Session, 'after_flush')
+def collect_model_changes(session, flush_context):
+    """Record which policyholders were touched by this flush"""
+    pending = session.info.setdefault(PENDING_KEY, {})
+
+    for obj in session.new:
+        if isinstance(obj, Policyholder):
+            entry = _change_for(pending, obj.id)
+            entry['created'] = True
+            entry['fields'].update(attr.key for attr in inspect(obj).mapper.column_attrs)
+            entry['risk_score'] = obj.risk_score_current
+        elif isinstance(obj, Trip):
+            _change_for(pending, obj.policyholder_id)['trip_ids'].append(obj.id)
+        elif isinstance(obj, RiskScoreHistory):
+            _change_for(pending, obj.policyholder_id)['history_ids'].append(obj.id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Policyholder):
+            state = inspect(obj)
+            changed = [attr.key for attr in state.mapper.column_attrs if state.attrs[attr.key].history.has_changes()]
+            if changed:
+                entry = _change_for(pending, obj.id)
+                entry['fields'].update(changed)
+                # The committed value, so indexes can update without a read
+                entry['risk_score'] = obj.risk_score_current
+
+    for obj in session.deleted:
+        if isinstance(obj, Policyholder):
+            _change_for(pending, obj.id)['deleted'] = True
+        elif isinstance(obj, (Trip, RiskScoreHistory)):
+            # Deleting history still changes what the read models show
+            _change_for(pending, obj.policyholder_id)['fields'].add(obj.__tablename__)
+
+@event.listens_for(Session, 'after_commit')
+def dispatch_model_changes(session):
+    """Fan out committed changes to subscribers"""
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+
+    for policyholder_id, change in pending.items():
+        if change['fields'] or change['created'] or change['deleted']:
+            policyholder_changed.send(
+                policyholder_id,
+                fields=frozenset(change['fields']),
+                created=change['created'],
+                deleted=change['deleted'],
+                risk_score=change['risk_score']
+            )
+        if change['trip_ids']:
+            trip_recorded.send(policyholder_id, trip_ids=change['trip_ids'])
+        if change['history_ids']:
+            risk_score_recorded.send(policyholder_id, history_ids=change['history_ids'])
+        if change['points_posted']:
+            points_posted.send(policyholder_id)
+
+def note_points_posted(session, policyholder_ids):
+    """Record ledger posts made with Core statements, which flush events don't see"""
+    pending = session.info.setdefault(PENDING_KEY, {})
+    for policyholder_id in policyholder_ids:
+        _change_for(pending, policyholder_id)['points_posted'] = True
+
+@event.listens_for(Session, 'after_rollback')
+def discard_model_changes(session):
+    """Drop notifications for work that never committed"""
+    session.info.pop(PENDING_KEY, None)
+
+# Helper functions
+def _change_for(pending, policyholder_id):
+    """Pending change record for a policyholder, created on first use"""
+    if policyholder_id not in pending:
+        pending[policyholder_id] = {
+            'fields': set(), 'created': False, 'deleted': False, 'risk_score': None, 'trip_ids': [], 'history_ids': [],
+            'points_posted': False
+        }
+    return pending[policyholder_id]
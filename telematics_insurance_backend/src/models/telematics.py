@@ -6,6 +6,10 @@ db = SQLAlchemy()
 
 class Policyholder(db.Model):
     __tablename__ = 'policyholders'
+    __table_args__ = (
+        # Leaderboard ordering
+        db.Index('ix_policyholders_risk_score_current_id', 'risk_score_current', 'id'),
+    )
 
     id = db.Column(db.String(50), primary_key=True, default=lambda: f"PH-{uuid.uuid4().hex[:10]}")
     first_name = db.Column(db.String(100), nullable=False)
@@ -30,6 +34,10 @@ class Policyholder(db.Model):
     # Relationships
     trips = db.relationship('Trip', backref='policyholder', lazy=True, cascade='all, delete-orphan')
     risk_history = db.relationship('RiskScoreHistory', backref='policyholder', lazy=True, cascade='all, delete-orphan')
+    achievements = db.relationship('PolicyholderAchievement', backref='policyholder', lazy=True, cascade='all, delete-orphan')
+    challenge_progress = db.relationship('ChallengeProgress', backref='policyholder', lazy=True, cascade='all, delete-orphan')
+    points_ledger = db.relationship('PointsLedgerEntry', backref='policyholder', lazy=True, cascade='all, delete-orphan')
+    points_balance = db.relationship('PointsBalance', backref='policyholder', lazy=True, uselist=False, cascade='all, delete-orphan')
 
     def to_dict(self):
         return {
@@ -56,6 +64,11 @@ class Policyholder(db.Model):
 
 class Trip(db.Model):
     __tablename__ = 'trips'
+    __table_args__ = (
+        # Keyset pagination keys, globally and per policyholder
+        db.Index('ix_trips_start_timestamp_id', 'start_timestamp', 'id'),
+        db.Index('ix_trips_policyholder_start_timestamp_id', 'policyholder_id', 'start_timestamp', 'id'),
+    )
 
     id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
     policyholder_id = db.Column(db.String(50), db.ForeignKey('policyholders.id'), nullable=False)
@@ -104,6 +117,10 @@ class Trip(db.Model):
 
 class RawTelematicsData(db.Model):
     __tablename__ = 'raw_telematics_data'
+    __table_args__ = (
+        db.Index('ix_raw_telematics_data_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_raw_telematics_data_policyholder_timestamp_id', 'policyholder_id', 'timestamp', 'id'),
+    )
 
     id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
     device_id = db.Column(db.String(100), nullable=False)
@@ -142,6 +159,9 @@ class RawTelematicsData(db.Model):
 
 class RiskScoreHistory(db.Model):
     __tablename__ = 'risk_score_history'
+    __table_args__ = (
+        db.Index('ix_risk_score_history_policyholder_score_date_id', 'policyholder_id', 'score_date', 'id'),
+    )
 
     id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
     policyholder_id = db.Column(db.String(50), db.ForeignKey('policyholders.id'), nullable=False)
@@ -161,3 +181,124 @@ class RiskScoreHistory(db.Model):
             'factors_contributing': self.factors_contributing,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+class PolicyholderAchievement(db.Model):
+    __tablename__ = 'policyholder_achievements'
+    __table_args__ = (
+        # One award per achievement; also serves per-policyholder lookups
+        db.UniqueConstraint('policyholder_id', 'achievement_id', name='uq_policyholder_achievements_policyholder_achievement'),
+    )
+
+    id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
+    policyholder_id = db.Column(db.String(50), db.ForeignKey('policyholders.id'), nullable=False)
+    achievement_id = db.Column(db.String(50), nullable=False)
+    earned_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'policyholder_id': self.policyholder_id,
+            'achievement_id': self.achievement_id,
+            'earned_date': self.earned_date.isoformat() if self.earned_date else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class ChallengeProgress(db.Model):
+    __tablename__ = 'challenge_progress'
+    __table_args__ = (
+        db.UniqueConstraint('policyholder_id', 'challenge_id', name='uq_challenge_progress_policyholder_challenge'),
+    )
+
+    id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
+    policyholder_id = db.Column(db.String(50), db.ForeignKey('policyholders.id'), nullable=False)
+    challenge_id = db.Column(db.String(50), nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)
+    trip_count = db.Column(db.Integer, default=0)
+    distance_km = db.Column(db.Float, default=0.0)
+    driving_minutes = db.Column(db.Float, default=0.0)
+    night_minutes = db.Column(db.Float, default=0.0)
+    harsh_events = db.Column(db.Integer, default=0)
+    harsh_event_days = db.Column(db.Text, nullable=True)  # JSON list of recent ISO dates with harsh events
+    completed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'policyholder_id': self.policyholder_id,
+            'challenge_id': self.challenge_id,
+            'window_start': self.window_start.isoformat() if self.window_start else None,
+            'trip_count': self.trip_count,
+            'distance_km': self.distance_km,
+            'driving_minutes': self.driving_minutes,
+            'night_minutes': self.night_minutes,
+            'harsh_events': self.harsh_events,
+            'harsh_event_days': self.harsh_event_days,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class PointsLedgerEntry(db.Model):
+    __tablename__ = 'points_ledger'
+    __table_args__ = (
+        # A reward source pays out once; history reads page newest first
+        db.UniqueConstraint('policyholder_id', 'entry_type', 'reference', name='uq_points_ledger_policyholder_type_reference'),
+        db.Index('ix_points_ledger_policyholder_created_at_id', 'policyholder_id', 'created_at', 'id'),
+    )
+
+    id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
+    policyholder_id = db.Column(db.String(50), db.ForeignKey('policyholders.id'), nullable=False)
+    entry_type = db.Column(db.String(20), nullable=False)  # 'challenge', 'achievement', 'behavior', 'adjustment'
+    reference = db.Column(db.String(100), nullable=False)  # Challenge window, achievement id or bonus period
+    points = db.Column(db.Integer, nullable=False)
+    description = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'policyholder_id': self.policyholder_id,
+            'entry_type': self.entry_type,
+            'reference': self.reference,
+            'points': self.points,
+            'description': self.description,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class PointsBalance(db.Model):
+    __tablename__ = 'points_balances'
+
+    policyholder_id = db.Column(db.String(50), db.ForeignKey('policyholders.id'), primary_key=True)
+    balance = db.Column(db.Integer, nullable=False, default=0)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    last_entry_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'policyholder_id': self.policyholder_id,
+            'balance': self.balance,
+            'entry_count': self.entry_count,
+            'last_entry_at': self.last_entry_at.isoformat() if self.last_entry_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class HistoricalWeather(db.Model):
+    __tablename__ = 'historical_weather'
+
+    # Grid cell id (row * cols + col, see services.weather_history) and UTC hour
+    cell = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    hour = db.Column(db.DateTime, primary_key=True)
+    weather_conditions = db.Column(db.String(50), nullable=False)
+    temperature_c = db.Column(db.Float, nullable=True)
+    precipitation_mm = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'cell': self.cell,
+            'hour': self.hour.isoformat() if self.hour else None,
+            'weather_conditions': self.weather_conditions,
+            'temperature_c': self.temperature_c,
+            'precipitation_mm': self.precipitation_mm
+        }
@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify, request
 from src.models.telematics import Policyholder, Trip, RawTelematicsData, db
+from src.services.weather_history import weather_history
+from src.services.query_budget import query_budget
 from datetime import datetime, timedelta
 import json
 import math
@@ -7,6 +9,7 @@ import math
 data_processing_bp = Blueprint('data_processing', __name__)
 
 @data_processing_bp.route('/process-trip', methods=['POST'])
+@query_budget(8)
 def process_trip():
     """Process raw telematics data into a trip record"""
     data = request.json
@@ -72,6 +75,12 @@ def process_trip():
     # Create route geometry (simplified)
     route_geometry = create_route_geometry(raw_points)
 
+    # Recorded weather along the route unless the client reports it
+    weather_conditions = data.get('weather_conditions') or weather_history.trip_conditions([
+        (point['latitude'], point['longitude'], datetime.fromisoformat(point['timestamp'].replace('Z', '+00:00')))
+        for point in raw_points
+    ]) or 'clear'
+
     # Create trip record
     trip = Trip(
         policyholder_id=policyholder_id,
@@ -89,7 +98,7 @@ def process_trip():
         route_geometry=route_geometry,
         start_location_name=data.get('start_location_name', 'Unknown'),
         end_location_name=data.get('end_location_name', 'Unknown'),
-        weather_conditions=data.get('weather_conditions', 'clear'),
+        weather_conditions=weather_conditions,
         traffic_conditions=data.get('traffic_conditions', 'light'),
         high_risk_area_minutes=data.get('high_risk_area_minutes', 0)
     )
@@ -104,6 +113,7 @@ def process_trip():
     }), 201
 
 @data_processing_bp.route('/batch-process', methods=['POST'])
+@query_budget(4)
 def batch_process():
     """Batch process multiple trips for a policyholder"""
     data = request.json
@@ -124,6 +134,8 @@ def batch_process():
 
     # Group raw data into trips (simplified logic)
     trips = group_raw_data_into_trips(raw_data)
+    # One weather store read for every trip below
+    weather_history.prefetch([(point.latitude, point.longitude, point.timestamp) for point in raw_data])
 
     processed_trips = []
     for trip_points in trips:
@@ -147,6 +159,7 @@ def batch_process():
     })
 
 @data_processing_bp.route('/update-aggregates/<string:policyholder_id>', methods=['POST'])
+@query_budget(8)
 def update_aggregates(policyholder_id):
     """Update aggregate statistics for a policyholder"""
     policyholder = Policyholder.query.get_or_404(policyholder_id)
@@ -303,6 +316,9 @@ def process_trip_from_points(trip_points, policyholder_id):
     return {
         'start_time': trip_points[0].timestamp.isoformat(),
         'end_time': trip_points[-1].timestamp.isoformat(),
-        'points_count': len(trip_points)
+        'points_count': len(trip_points),
+        'weather_conditions': weather_history.trip_conditions(
+            [(point.latitude, point.longitude, point.timestamp) for point in trip_points]
+        ) or 'clear'
     }
 
@@ -0,0 +1,54 @@
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from src.services.export import ExportJob, EXPORT_DATASETS, EXPORT_FORMATS, parse_export_time
+
+export_bp = Blueprint('export', __name__)
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+@export_bp.route('/export/<string:dataset>', methods=['GET'])
+def export_dataset(dataset):
+    """Stream trips, raw data or risk history for a time range as CSV or NDJSON"""
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({'error': f"Unknown dataset, expected one of: {', '.join(EXPORT_DATASETS)}"}), 404
+
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unsupported format, expected one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        start = parse_export_time(request.args.get('start'))
+        end = parse_export_time(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO 8601 dates or datetimes'}), 400
+
+    chunk_size = request.args.get('chunk_size', 5000, type=int)
+    if chunk_size < 1:
+        return jsonify({'error': 'chunk_size must be a positive integer'}), 400
+
+    _, serializer, _ = EXPORT_DATASETS[dataset]
+    job = ExportJob(
+        dataset,
+        start=start,
+        end=end,
+        cursor=request.args.get('cursor'),
+        fields=serializer.parse_fields(request.args.get('fields')),
+        policyholder_id=request.args.get('policyholder_id'),
+        chunk_size=min(chunk_size, 50000)
+    )
+    # Validate the cursor before the response starts streaming
+    job.query()
+
+    checkpoints = request.args.get('checkpoints', 'false').lower() in ('1', 'true', 'yes')
+    filename = f"{dataset}.{export_format}"
+
+    return Response(
+        stream_with_context(job.iter_format(export_format, checkpoints)),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no'  # Let reverse proxies pass chunks straight through
+        }
+    )
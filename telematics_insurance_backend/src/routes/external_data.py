@@ -1,8 +1,17 @@
-from flask import Blueprint, jsonify, request
-import requests
+from flask import Blueprint, current_app, jsonify, request
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
+from src.models.telematics import RawTelematicsData, Trip, db
+from src.services.external_context import context_cache
+from src.services.context_clients import ProviderError, clear_latency_budget, context_fanout, start_latency_budget
+from src.services.contextual_risk import (
+    FACTOR_WEIGHTS, location_risk, risk_level, score_trace, time_risk, traffic_risk, weather_condition, weather_risk
+)
+from src.services.spatial_index import incident_indexes
+from src.lazy import lazy_import
+
+np = lazy_import('numpy')
 
 external_data_bp = Blueprint('external_data', __name__)
 
@@ -10,6 +19,20 @@ external_data_bp = Blueprint('external_data', __name__)
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', 'demo_key')
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', 'demo_key')
 
+@external_data_bp.before_request
+def start_provider_budget():
+    """Bound the total time this request spends waiting on external providers"""
+    start_latency_budget(current_app.config.get('EXTERNAL_CONTEXT_LATENCY_BUDGET_SECONDS', 2.0))
+
+@external_data_bp.teardown_request
+def end_provider_budget(error=None):
+    clear_latency_budget()
+
+@external_data_bp.errorhandler(ProviderError)
+def provider_unavailable(error):
+    current_app.logger.warning('External provider unavailable: %s', error)
+    return jsonify({'error': 'External data provider unavailable, try again shortly'}), 503
+
 @external_data_bp.route('/weather/current', methods=['GET'])
 def get_current_weather():
     """Get current weather conditions for a location"""
@@ -19,47 +42,9 @@ def get_current_weather():
     if not lat or not lon:
         return jsonify({'error': 'Latitude and longitude are required'}), 400
 
-    # Mock weather data for demonstration
-    # In production, this would call OpenWeatherMap API
-    mock_weather_data = {
-        'location': {
-            'lat': lat,
-            'lon': lon,
-            'name': 'Current Location'
-        },
-        'current': {
-            'temperature': 22.5,
-            'feels_like': 24.1,
-            'humidity': 65,
-            'pressure': 1013,
-            'visibility': 10000,
-            'wind_speed': 3.2,
-            'wind_direction': 180,
-            'weather_main': 'Clear',
-            'weather_description': 'clear sky',
-            'weather_icon': '01d',
-            'clouds': 5,
-            'uv_index': 6.8
-        },
-        'conditions': {
-            'is_raining': False,
-            'is_snowing': False,
-            'is_foggy': False,
-            'visibility_km': 10,
-            'road_conditions': 'dry',
-            'driving_risk_level': 'low'
-        },
-        'timestamp': datetime.utcnow().isoformat(),
-        'source': 'OpenWeatherMap'
-    }
-
-    # Simulate API call delay
-    # In production:
-    # url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-    # response = requests.get(url)
-    # weather_data = response.json()
-
-    return jsonify(mock_weather_data)
+    # Served from the geo-cell cache; the provider is only asked on a miss
+    weather_data = context_cache.lookup('weather', [(lat, lon)])
+    return jsonify(_at_location(weather_data, lat=lat, lon=lon))
 
 @external_data_bp.route('/weather/forecast', methods=['GET'])
 def get_weather_forecast():
@@ -71,31 +56,8 @@ def get_weather_forecast():
     if not lat or not lon:
         return jsonify({'error': 'Latitude and longitude are required'}), 400
 
-    # Mock forecast data
-    forecast_data = {
-        'location': {
-            'lat': lat,
-            'lon': lon,
-            'name': 'Current Location'
-        },
-        'forecast': []
-    }
-
-    # Generate mock forecast for next few days
-    for i in range(days):
-        date = datetime.utcnow() + timedelta(days=i)
-        forecast_data['forecast'].append({
-            'date': date.strftime('%Y-%m-%d'),
-            'temperature_max': 25 + (i % 3),
-            'temperature_min': 15 + (i % 3),
-            'weather_main': ['Clear', 'Clouds', 'Rain'][i % 3],
-            'weather_description': ['clear sky', 'scattered clouds', 'light rain'][i % 3],
-            'precipitation_probability': [10, 30, 80][i % 3],
-            'wind_speed': 2.5 + (i * 0.5),
-            'driving_conditions': ['excellent', 'good', 'caution'][i % 3]
-        })
-
-    return jsonify(forecast_data)
+    forecast_data = context_cache.lookup('forecast', [(lat, lon)], days=days)
+    return jsonify(_at_location(forecast_data, lat=lat, lon=lon))
 
 @external_data_bp.route('/traffic/current', methods=['GET'])
 def get_current_traffic():
@@ -108,59 +70,13 @@ def get_current_traffic():
     if not all([origin_lat, origin_lon, dest_lat, dest_lon]):
         return jsonify({'error': 'Origin and destination coordinates are required'}), 400
 
-    # Mock traffic data
-    mock_traffic_data = {
-        'route': {
-            'origin': {'lat': origin_lat, 'lon': origin_lon},
-            'destination': {'lat': dest_lat, 'lon': dest_lon},
-            'distance_km': 15.2,
-            'duration_normal_minutes': 18,
-            'duration_current_minutes': 25
-        },
-        'traffic_conditions': {
-            'overall_level': 'moderate',
-            'congestion_level': 0.6,  # 0-1 scale
-            'incidents_count': 1,
-            'average_speed_kph': 35,
-            'expected_speed_kph': 50
-        },
-        'segments': [
-            {
-                'segment_id': 1,
-                'start_lat': origin_lat,
-                'start_lon': origin_lon,
-                'end_lat': origin_lat + 0.01,
-                'end_lon': origin_lon + 0.01,
-                'traffic_level': 'light',
-                'speed_kph': 45,
-                'duration_minutes': 8
-            },
-            {
-                'segment_id': 2,
-                'start_lat': origin_lat + 0.01,
-                'start_lon': origin_lon + 0.01,
-                'end_lat': dest_lat,
-                'end_lon': dest_lon,
-                'traffic_level': 'heavy',
-                'speed_kph': 25,
-                'duration_minutes': 17
-            }
-        ],
-        'incidents': [
-            {
-                'type': 'construction',
-                'severity': 'medium',
-                'description': 'Lane closure due to road work',
-                'lat': origin_lat + 0.005,
-                'lon': origin_lon + 0.005,
-                'estimated_delay_minutes': 7
-            }
-        ],
-        'timestamp': datetime.utcnow().isoformat(),
-        'source': 'Google Maps'
-    }
-
-    return jsonify(mock_traffic_data)
+    traffic_data = context_cache.lookup('traffic', [(origin_lat, origin_lon), (dest_lat, dest_lon)])
+    route = dict(
+        traffic_data['route'],
+        origin={'lat': origin_lat, 'lon': origin_lon},
+        destination={'lat': dest_lat, 'lon': dest_lon}
+    )
+    return jsonify(dict(traffic_data, route=route))
 
 @external_data_bp.route('/crime-data', methods=['GET'])
 def get_crime_data():
@@ -171,43 +87,14 @@ def get_crime_data():
 
     if not lat or not lon:
         return jsonify({'error': 'Latitude and longitude are required'}), 400
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        return jsonify({'error': f'radius_km must be greater than 0 and at most {MAX_RADIUS_KM}'}), 400
 
-    # Mock crime data
-    mock_crime_data = {
-        'location': {
-            'lat': lat,
-            'lon': lon,
-            'radius_km': radius_km
-        },
-        'crime_statistics': {
-            'total_incidents_last_year': 245,
-            'vehicle_theft_incidents': 12,
-            'vandalism_incidents': 8,
-            'break_ins': 15,
-            'crime_rate_per_1000': 8.5,
-            'safety_score': 7.2,  # 1-10 scale, 10 being safest
-            'risk_level': 'medium'
-        },
-        'recent_incidents': [
-            {
-                'type': 'vehicle_theft',
-                'date': '2025-09-08',
-                'distance_km': 0.8,
-                'severity': 'high'
-            },
-            {
-                'type': 'vandalism',
-                'date': '2025-09-05',
-                'distance_km': 1.2,
-                'severity': 'low'
-            }
-        ],
-        'area_classification': 'suburban_residential',
-        'timestamp': datetime.utcnow().isoformat(),
-        'source': 'Local Crime Database'
-    }
+    if 'crime' in incident_indexes:
+        return jsonify(incident_report(incident_indexes['crime'], 'crime_statistics', lat, lon, radius_km))
 
-    return jsonify(mock_crime_data)
+    crime_data = context_cache.lookup('crime', [(lat, lon)], radius_km=radius_km)
+    return jsonify(_at_location(crime_data, lat=lat, lon=lon))
 
 @external_data_bp.route('/accident-data', methods=['GET'])
 def get_accident_data():
@@ -218,58 +105,14 @@ def get_accident_data():
 
     if not lat or not lon:
         return jsonify({'error': 'Latitude and longitude are required'}), 400
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        return jsonify({'error': f'radius_km must be greater than 0 and at most {MAX_RADIUS_KM}'}), 400
 
-    # Mock accident data
-    mock_accident_data = {
-        'location': {
-            'lat': lat,
-            'lon': lon,
-            'radius_km': radius_km
-        },
-        'accident_statistics': {
-            'total_accidents_last_year': 18,
-            'fatal_accidents': 0,
-            'injury_accidents': 6,
-            'property_damage_only': 12,
-            'accidents_per_1000_vehicles': 2.3,
-            'risk_score': 6.8,  # 1-10 scale, 10 being highest risk
-            'primary_causes': [
-                {'cause': 'rear_end_collision', 'count': 7},
-                {'cause': 'intersection_accident', 'count': 5},
-                {'cause': 'weather_related', 'count': 3},
-                {'cause': 'speeding', 'count': 3}
-            ]
-        },
-        'hotspots': [
-            {
-                'intersection': 'Main St & Oak Ave',
-                'lat': lat + 0.002,
-                'lon': lon + 0.001,
-                'accident_count': 5,
-                'severity_avg': 6.2
-            },
-            {
-                'intersection': 'Highway 101 On-ramp',
-                'lat': lat - 0.001,
-                'lon': lon + 0.003,
-                'accident_count': 3,
-                'severity_avg': 7.8
-            }
-        ],
-        'time_patterns': {
-            'peak_hours': ['07:00-09:00', '17:00-19:00'],
-            'high_risk_days': ['Friday', 'Saturday'],
-            'weather_correlation': {
-                'rain': 0.35,
-                'fog': 0.28,
-                'clear': 0.15
-            }
-        },
-        'timestamp': datetime.utcnow().isoformat(),
-        'source': 'Department of Transportation'
-    }
+    if 'accidents' in incident_indexes:
+        return jsonify(incident_report(incident_indexes['accidents'], 'accident_statistics', lat, lon, radius_km))
 
-    return jsonify(mock_accident_data)
+    accident_data = context_cache.lookup('accidents', [(lat, lon)], radius_km=radius_km)
+    return jsonify(_at_location(accident_data, lat=lat, lon=lon))
 
 @external_data_bp.route('/road-conditions', methods=['GET'])
 def get_road_conditions():
@@ -280,52 +123,16 @@ def get_road_conditions():
 
     if not lat or not lon:
         return jsonify({'error': 'Latitude and longitude are required'}), 400
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        return jsonify({'error': f'radius_km must be greater than 0 and at most {MAX_RADIUS_KM}'}), 400
 
-    # Mock road conditions data
-    mock_road_data = {
-        'location': {
-            'lat': lat,
-            'lon': lon,
-            'radius_km': radius_km
-        },
-        'road_conditions': {
-            'overall_condition': 'good',
-            'surface_quality': 8.2,  # 1-10 scale
-            'maintenance_score': 7.5,
-            'lighting_quality': 'adequate',
-            'signage_quality': 'good'
-        },
-        'construction_zones': [
-            {
-                'project_id': 'CONST-2025-001',
-                'location': 'Highway 101, Mile 15-18',
-                'lat': lat + 0.01,
-                'lon': lon + 0.02,
-                'type': 'lane_closure',
-                'severity': 'medium',
-                'expected_delay_minutes': 5,
-                'start_date': '2025-09-01',
-                'end_date': '2025-10-15',
-                'active_hours': '06:00-18:00'
-            }
-        ],
-        'road_closures': [],
-        'special_conditions': [
-            {
-                'type': 'school_zone',
-                'location': 'Elementary School Area',
-                'lat': lat - 0.005,
-                'lon': lon - 0.003,
-                'speed_limit': 25,
-                'active_hours': '07:00-09:00, 14:00-16:00',
-                'active_days': 'Monday-Friday'
-            }
-        ],
-        'timestamp': datetime.utcnow().isoformat(),
-        'source': 'Department of Transportation'
-    }
+    road_data = context_cache.lookup('road_conditions', [(lat, lon)], radius_km=radius_km)
+    return jsonify(_at_location(road_data, lat=lat, lon=lon))
 
-    return jsonify(mock_road_data)
+@external_data_bp.route('/context-cache/stats', methods=['GET'])
+def get_context_cache_stats():
+    """Get external context cache size and per-source hit rates"""
+    return jsonify(context_cache.stats())
 
 @external_data_bp.route('/contextual-risk', methods=['POST'])
 def calculate_contextual_risk():
@@ -336,28 +143,36 @@ def calculate_contextual_risk():
     lon = data.get('lon')
     time_of_day = data.get('time_of_day')  # 24-hour format
     day_of_week = data.get('day_of_week')  # Monday, Tuesday, etc.
-    weather_conditions = data.get('weather_conditions', 'clear')
+    weather_conditions = data.get('weather_conditions')
 
     if not lat or not lon:
         return jsonify({'error': 'Latitude and longitude are required'}), 400
 
+    # Provider lookups run concurrently; a failed one falls back to the local estimate
+    lookups = {'traffic': lambda: context_cache.lookup('traffic', [(lat, lon), (lat, lon)])}
+    if weather_conditions is None:
+        lookups['weather'] = lambda: context_cache.lookup('weather', [(lat, lon)])
+    context, errors = context_fanout.run(lookups)
+    for source, error in errors.items():
+        current_app.logger.warning('Contextual risk %s lookup failed: %s', source, error)
+
+    # Failed lookups leave the defaults: neutral weather risk and time-of-day traffic
+    if weather_conditions is None and 'weather' in context:
+        weather_conditions = weather_condition(context['weather'])
+    traffic = context.get('traffic')
+
     # Calculate risk factors
     risk_factors = {
         'weather_risk': calculate_weather_risk(weather_conditions),
         'time_risk': calculate_time_risk(time_of_day, day_of_week),
         'location_risk': calculate_location_risk(lat, lon),
-        'traffic_risk': calculate_traffic_risk(lat, lon, time_of_day)
+        'traffic_risk': calculate_traffic_risk(
+            lat, lon, time_of_day, traffic['traffic_conditions']['congestion_level'] if traffic else None
+        )
     }
 
     # Calculate overall contextual risk score (0-1 scale)
-    weights = {
-        'weather_risk': 0.3,
-        'time_risk': 0.2,
-        'location_risk': 0.3,
-        'traffic_risk': 0.2
-    }
-
-    overall_risk = sum(risk_factors[factor] * weights[factor] for factor in risk_factors)
+    overall_risk = sum(risk_factors[factor] * FACTOR_WEIGHTS[factor] for factor in risk_factors)
 
     # Generate recommendations
     recommendations = generate_risk_recommendations(risk_factors)
@@ -365,76 +180,130 @@ def calculate_contextual_risk():
     return jsonify({
         'location': {'lat': lat, 'lon': lon},
         'contextual_risk_score': round(overall_risk, 3),
-        'risk_level': get_risk_level(overall_risk),
+        'risk_level': risk_level(overall_risk),
         'risk_factors': risk_factors,
         'recommendations': recommendations,
+        'fallbacks': sorted(errors),
         'timestamp': datetime.utcnow().isoformat()
     })
 
+@external_data_bp.route('/contextual-risk/batch', methods=['POST'])
+def calculate_contextual_risk_batch():
+    """Score every point of a trip trace, with a time-weighted trip summary"""
+    data = request.json or {}
+    weather_conditions = data.get('weather_conditions')
+
+    if data.get('trip_id'):
+        trip = db.get_or_404(Trip, data['trip_id'])
+        lat, lon, timestamps = trip_trace(trip)
+        weather_conditions = weather_conditions or trip.weather_conditions
+    elif data.get('points'):
+        try:
+            lat = [float(point['lat']) for point in data['points']]
+            lon = [float(point['lon']) for point in data['points']]
+            timestamps = [_epoch_seconds(point['timestamp']) for point in data['points']]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each point needs lat, lon and an ISO 8601 or epoch-seconds timestamp'}), 400
+    else:
+        return jsonify({'error': 'Either trip_id or points is required'}), 400
+
+    if not lat:
+        return jsonify({'error': 'No points to score'}), 400
+    if len(lat) > MAX_BATCH_POINTS:
+        return jsonify({'error': f'At most {MAX_BATCH_POINTS} points can be scored per request'}), 400
+    try:
+        utc_offset_minutes = int(data.get('utc_offset_minutes', 0))
+    except (TypeError, ValueError):
+        utc_offset_minutes = None
+    if utc_offset_minutes is None or abs(utc_offset_minutes) > MAX_UTC_OFFSET_MINUTES:
+        return jsonify({'error': f'utc_offset_minutes must be a whole number of minutes, at most {MAX_UTC_OFFSET_MINUTES} either way'}), 400
+
+    result = score_trace(lat, lon, timestamps, weather_conditions=weather_conditions,
+                         utc_offset_minutes=utc_offset_minutes)
+    result['points']['timestamp'] = [datetime.utcfromtimestamp(timestamp).isoformat() for timestamp in timestamps]
+    return jsonify(dict(result, trip_id=data.get('trip_id'), timestamp=datetime.utcnow().isoformat()))
+
+MAX_BATCH_POINTS = 50000
+MAX_UTC_OFFSET_MINUTES = 14 * 60  # UTC-12:00 to UTC+14:00
+MAX_RADIUS_KM = 100  # Area lookups (crime, accidents, road conditions)
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
 # Helper functions
+def _at_location(payload, **location):
+    """Report the requested coordinates rather than the cached cell's"""
+    return dict(payload, location=dict(payload['location'], **location))
+
+def _epoch_seconds(timestamp):
+    """Epoch seconds of an ISO 8601 string, datetime or number; naive times are UTC"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
 def calculate_weather_risk(weather_conditions):
     """Calculate risk based on weather conditions"""
-    weather_risk_map = {
-        'clear': 0.1,
-        'partly_cloudy': 0.2,
-        'cloudy': 0.3,
-        'light_rain': 0.6,
-        'heavy_rain': 0.8,
-        'snow': 0.9,
-        'fog': 0.7,
-        'ice': 0.95
-    }
-    return weather_risk_map.get(weather_conditions.lower(), 0.3)
+    return weather_risk(weather_conditions)
 
 def calculate_time_risk(time_of_day, day_of_week):
     """Calculate risk based on time and day"""
     hour = int(time_of_day.split(':')[0]) if time_of_day else 12
-
-    # Higher risk during night hours and weekends
-    time_risk = 0.3  # Base risk
-
-    if 22 <= hour or hour <= 6:  # Night hours
-        time_risk += 0.4
-    elif 7 <= hour <= 9 or 17 <= hour <= 19:  # Rush hours
-        time_risk += 0.2
-
-    if day_of_week in ['Friday', 'Saturday']:  # Weekend nights
-        time_risk += 0.2
-
-    return min(time_risk, 1.0)
+    weekday = DAYS_OF_WEEK.index(day_of_week) if day_of_week in DAYS_OF_WEEK else -1
+    return float(time_risk(np.array([hour]), np.array([weekday]))[0])
 
 def calculate_location_risk(lat, lon):
     """Calculate risk based on location (crime, accidents, etc.)"""
-    # Mock calculation based on coordinates
-    # In reality, this would query crime and accident databases
-    base_risk = 0.3
-
-    # Simulate urban vs rural risk
-    if abs(lat) > 40:  # Simulate urban area
-        base_risk += 0.2
+    return float(location_risk([lat], [lon])[0])
 
-    return min(base_risk, 1.0)
-
-def calculate_traffic_risk(lat, lon, time_of_day):
+def calculate_traffic_risk(lat, lon, time_of_day, congestion_level=None):
     """Calculate risk based on traffic conditions"""
     hour = int(time_of_day.split(':')[0]) if time_of_day else 12
+    # Live congestion (0-1) from the traffic provider weighs as much as the hour
+    congestion = None if congestion_level is None else np.array([congestion_level], dtype=np.float64)
+    return float(traffic_risk(np.array([hour]), congestion)[0])
+
+def incident_report(index, statistics_key, lat, lon, radius_km):
+    """Radius query against a local incident index, shaped like the provider payloads"""
+    found = index.query(lat, lon, radius_km)
+    return {
+        'location': {
+            'lat': lat,
+            'lon': lon,
+            'radius_km': radius_km
+        },
+        statistics_key: {
+            'total_incidents': found['count'],
+            'incidents_by_type': found['by_type'],
+            'severity_avg': found['severity_avg'],
+            'severity_max': found['severity_max'],
+            'incidents_per_km2': found['density_per_km2'],
+            'risk_level': risk_level(index.density_risk(lat, lon, radius_km))
+        },
+        'hotspots': found['hotspots'],
+        'index_built_at': index.meta['built_at'],
+        'timestamp': datetime.utcnow().isoformat(),
+        'source': 'Local incident index'
+    }
 
-    # Higher risk during heavy traffic
-    if 7 <= hour <= 9 or 17 <= hour <= 19:
-        return 0.6
-    elif 10 <= hour <= 16:
-        return 0.3
-    else:
-        return 0.2
-
-def get_risk_level(risk_score):
-    """Convert risk score to categorical level"""
-    if risk_score <= 0.3:
-        return 'low'
-    elif risk_score <= 0.6:
-        return 'medium'
-    else:
-        return 'high'
+def trip_trace(trip):
+    """(lat, lon, epoch timestamps) of a trip: its raw samples, else its route geometry"""
+    rows = db.session.execute(
+        db.select(RawTelematicsData.latitude, RawTelematicsData.longitude, RawTelematicsData.timestamp)
+        .where(RawTelematicsData.policyholder_id == trip.policyholder_id,
+               RawTelematicsData.timestamp.between(trip.start_timestamp, trip.end_timestamp))
+        .order_by(RawTelematicsData.timestamp)
+    ).all()
+    if rows:
+        return [row[0] for row in rows], [row[1] for row in rows], [_epoch_seconds(row[2]) for row in rows]
+
+    # GeoJSON LineString coordinates are [lon, lat]; spread the samples evenly over the trip
+    coordinates = json.loads(trip.route_geometry)['coordinates'] if trip.route_geometry else []
+    start, end = _epoch_seconds(trip.start_timestamp), _epoch_seconds(trip.end_timestamp)
+    step = (end - start) / max(len(coordinates) - 1, 1)
+    return ([coordinate[1] for coordinate in coordinates], [coordinate[0] for coordinate in coordinates],
+            [start + i * step for i in range(len(coordinates))])
 
 def generate_risk_recommendations(risk_factors):
     """Generate recommendations based on risk factors"""
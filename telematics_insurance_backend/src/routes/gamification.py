@@ -1,112 +1,59 @@
-from flask import Blueprint, jsonify, request
-from src.models.telematics import Policyholder, Trip, db
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from src.models.telematics import Policyholder, PointsBalance, PointsLedgerEntry, Trip, db
+from src.models.serializers import dumps, json_response, points_ledger_serializer
+from src.models.pagination import KeysetPage
+from src.services.pubsub import feedback_broker
+from src.services.leaderboard import leaderboard
+from src.services.cohorts import cohort_leaderboards, COHORT_DIMENSIONS
+from src.services.ranking import rank_index
+from src.services.achievements import ACHIEVEMENTS, earned_achievements
+from src.services.challenges import CHALLENGES, challenge_tracker, load_progress
+from src.services.profiles import get_driver_profile
+from src.services.risk_stream import risk_stream, epoch_seconds, EVENT_IMPACTS, DEFAULT_IMPACT
+from src.services.query_budget import query_budget
 from datetime import datetime, timedelta, date
 import json
 
 gamification_bp = Blueprint('gamification', __name__)
 
-# Achievement definitions
-ACHIEVEMENTS = {
-    'safe_driver': {
-        'name': 'Safe Driver',
-        'description': 'Low risk score for 3 months',
-        'icon': 'award',
-        'color': 'yellow',
-        'criteria': {'risk_score_threshold': 0.3, 'duration_months': 3}
-    },
-    'smooth_operator': {
-        'name': 'Smooth Operator',
-        'description': 'Minimal harsh events',
-        'icon': 'target',
-        'color': 'green',
-        'criteria': {'harsh_events_per_100km_threshold': 3.0}
-    },
-    'eco_driver': {
-        'name': 'Eco Driver',
-        'description': 'Efficient driving patterns',
-        'icon': 'leaf',
-        'color': 'green',
-        'criteria': {'avg_speed_threshold': 60}
-    },
-    'night_owl': {
-        'name': 'Night Owl',
-        'description': 'Reduced night driving',
-        'icon': 'moon',
-        'color': 'blue',
-        'criteria': {'night_driving_threshold': 10.0}
-    },
-    'consistent_driver': {
-        'name': 'Consistent Driver',
-        'description': 'Regular driving patterns',
-        'icon': 'calendar',
-        'color': 'purple',
-        'criteria': {'min_trips_per_month': 20}
-    }
-}
-
-# Challenge definitions
-CHALLENGES = {
-    'week_without_harsh_events': {
-        'name': 'Week Without Harsh Events',
-        'description': 'Complete 7 days without any harsh braking or acceleration',
-        'duration_days': 7,
-        'reward_points': 100,
-        'criteria': {'max_harsh_events': 0}
-    },
-    'reduce_night_driving': {
-        'name': 'Reduce Night Driving',
-        'description': 'Keep night driving under 10% for the month',
-        'duration_days': 30,
-        'reward_points': 150,
-        'criteria': {'night_driving_target': 10.0}
-    },
-    'smooth_month': {
-        'name': 'Smooth Month',
-        'description': 'Maintain less than 2 harsh events per 100km for a month',
-        'duration_days': 30,
-        'reward_points': 200,
-        'criteria': {'harsh_events_per_100km_target': 2.0}
-    },
-    'mileage_master': {
-        'name': 'Mileage Master',
-        'description': 'Drive 1000km with excellent behavior',
-        'duration_days': 60,
-        'reward_points': 250,
-        'criteria': {'target_distance': 1000, 'max_risk_score': 0.3}
-    }
-}
-
 @gamification_bp.route('/achievements/<string:policyholder_id>', methods=['GET'])
+@query_budget(2)
 def get_achievements(policyholder_id):
     """Get earned achievements for a policyholder"""
-    policyholder = Policyholder.query.get_or_404(policyholder_id)
-
-    earned_achievements = []
-
-    # Check each achievement
-    for achievement_id, achievement in ACHIEVEMENTS.items():
-        if check_achievement_earned(policyholder_id, achievement_id, achievement):
-            earned_achievements.append({
-                'id': achievement_id,
-                'name': achievement['name'],
-                'description': achievement['description'],
-                'icon': achievement['icon'],
-                'color': achievement['color'],
-                'earned_date': datetime.utcnow().isoformat()  # In real implementation, store this
-            })
+    # Awards are made as scores and aggregates change, and by `flask award-achievements`
+    awards = earned_achievements(policyholder_id)
+    if not awards:
+        db.get_or_404(Policyholder, policyholder_id)
+
+    earned = []
+    for achievement_id, earned_date in awards:
+        achievement = ACHIEVEMENTS.get(achievement_id)
+        if achievement is None:
+            continue  # Retired achievement
+        earned.append({
+            'id': achievement_id,
+            'name': achievement['name'],
+            'description': achievement['description'],
+            'icon': achievement['icon'],
+            'color': achievement['color'],
+            'earned_date': earned_date.isoformat()
+        })
 
-    return jsonify(earned_achievements)
+    return jsonify(earned)
 
 @gamification_bp.route('/challenges/<string:policyholder_id>', methods=['GET'])
+@query_budget(2)
 def get_challenges(policyholder_id):
     """Get active challenges for a policyholder"""
     policyholder = Policyholder.query.get_or_404(policyholder_id)
+    states = load_progress(policyholder_id)
+    now = datetime.utcnow()
 
     active_challenges = []
 
-    # Check each challenge
+    # Progress comes from the tracked totals; no trip scans
     for challenge_id, challenge in CHALLENGES.items():
-        progress = calculate_challenge_progress(policyholder_id, challenge_id, challenge)
+        progress = challenge_tracker.progress(challenge_id, states.get(challenge_id), policyholder, now)
 
         active_challenges.append({
             'id': challenge_id,
@@ -121,59 +68,94 @@ def get_challenges(policyholder_id):
     return jsonify(active_challenges)
 
 @gamification_bp.route('/leaderboard', methods=['GET'])
+@query_budget(1)
 def get_leaderboard():
     """Get leaderboard of top drivers"""
-    # Get top drivers by risk score (lower is better)
-    top_drivers = Policyholder.query.order_by(Policyholder.risk_score_current.asc()).limit(10).all()
-
-    leaderboard = []
-    for i, driver in enumerate(top_drivers):
-        # Calculate total points (simplified)
-        total_points = calculate_driver_points(driver.id)
-
-        leaderboard.append({
-            'rank': i + 1,
-            'name': f"{driver.first_name} {driver.last_name[0]}.",  # Privacy-friendly
-            'risk_score': driver.risk_score_current,
-            'total_points': total_points,
-            'vehicle': f"{driver.vehicle_make} {driver.vehicle_model}",
-            'premium_savings': abs(calculate_premium_adjustment(driver.risk_score_current))
-        })
+    # Top drivers by risk score (lower is better), served from the materialized board
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    return jsonify(leaderboard.page(limit, offset))
+
+@gamification_bp.route('/leaderboard/segments', methods=['GET'])
+@query_budget(1)
+def get_leaderboard_segments():
+    """List cohort segments with their driver counts"""
+    return jsonify(cohort_leaderboards.segments())
+
+@gamification_bp.route('/leaderboard/<string:dimension>/<path:value>', methods=['GET'])
+@query_budget(1)
+def get_cohort_leaderboard(dimension, value):
+    """Get top drivers within one cohort segment, e.g. /leaderboard/region/IL"""
+    if dimension not in COHORT_DIMENSIONS:
+        return jsonify({'error': f"Unknown dimension, expected one of: {', '.join(COHORT_DIMENSIONS)}"}), 404
+    limit = max(1, min(request.args.get('limit', 10, type=int), cohort_leaderboards.k))
+
+    entries = cohort_leaderboards.board(dimension, value, limit)
+    if entries is None:
+        return jsonify({'error': f"No drivers in {dimension} segment {value}"}), 404
+    return jsonify(entries)
+
+@gamification_bp.route('/points/<string:policyholder_id>', methods=['GET'])
+@query_budget(2)
+def get_points_balance(policyholder_id):
+    """Get a driver's running points balance"""
+    balance = db.session.get(PointsBalance, policyholder_id)
+    if balance is None:
+        db.get_or_404(Policyholder, policyholder_id)
+        balance = PointsBalance(policyholder_id=policyholder_id, balance=0, entry_count=0)
 
-    return jsonify(leaderboard)
+    return jsonify({
+        'policyholder_id': policyholder_id,
+        'balance': balance.balance,
+        'entry_count': balance.entry_count,
+        'last_entry_at': balance.last_entry_at.isoformat() if balance.last_entry_at else None
+    })
+
+@gamification_bp.route('/points/<string:policyholder_id>/history', methods=['GET'])
+@query_budget(1)
+def get_points_history(policyholder_id):
+    """Get a driver's points ledger, newest first, one keyset page at a time"""
+    fields = points_ledger_serializer.parse_fields(request.args.get('fields'))
+    page = KeysetPage.from_request(keys=(PointsLedgerEntry.created_at, PointsLedgerEntry.id), descending=True)
+
+    query = db.select(*points_ledger_serializer.columns(fields)).where(PointsLedgerEntry.policyholder_id == policyholder_id)
+    rows = page.finish(db.session.execute(page.apply(query)).all())
+    return json_response(points_ledger_serializer.serialize_rows(rows, fields), headers=page.headers())
 
 @gamification_bp.route('/driver-score/<string:policyholder_id>', methods=['GET'])
+@query_budget(1)
 def get_driver_score(policyholder_id):
     """Get comprehensive driver score and ranking"""
-    policyholder = Policyholder.query.get_or_404(policyholder_id)
+    # One snapshot, loaded once (or served from cache), feeds every scorer
+    profile = get_driver_profile(policyholder_id)
+    if profile is None:
+        abort(404)
 
     # Calculate various scores
-    safety_score = calculate_safety_score(policyholder_id)
-    efficiency_score = calculate_efficiency_score(policyholder_id)
-    consistency_score = calculate_consistency_score(policyholder_id)
+    safety_score = calculate_safety_score(profile)
+    efficiency_score = calculate_efficiency_score(profile)
+    consistency_score = calculate_consistency_score(profile)
 
     # Overall score (weighted average)
     overall_score = (safety_score * 0.5 + efficiency_score * 0.3 + consistency_score * 0.2)
 
-    # Calculate rank among all drivers
-    better_drivers = Policyholder.query.filter(
-        Policyholder.risk_score_current < policyholder.risk_score_current
-    ).count()
-    total_drivers = Policyholder.query.count()
-    rank = better_drivers + 1
+    # Rank among all drivers, from the in-memory rank index
+    standing = rank_index.standing(profile.risk_score_current)
 
     return jsonify({
         'overall_score': round(overall_score, 1),
         'safety_score': round(safety_score, 1),
         'efficiency_score': round(efficiency_score, 1),
         'consistency_score': round(consistency_score, 1),
-        'rank': rank,
-        'total_drivers': total_drivers,
-        'percentile': round((total_drivers - rank) / total_drivers * 100, 1),
-        'total_points': calculate_driver_points(policyholder_id)
+        'rank': standing['rank'],
+        'total_drivers': standing['total_drivers'],
+        'percentile': standing['percentile'],
+        'total_points': profile.total_points
     })
 
 @gamification_bp.route('/real-time-feedback', methods=['POST'])
+@query_budget(0)
 def real_time_feedback():
     """Process real-time driving event and provide immediate feedback"""
     data = request.json
@@ -183,27 +165,66 @@ def real_time_feedback():
     policyholder_id = data.get('policyholder_id')
     location = data.get('location', {})
     timestamp = data.get('timestamp', datetime.utcnow().isoformat())
+    try:
+        # Scored at the time the event happened, not when it arrived
+        at = epoch_seconds(datetime.fromisoformat(timestamp.replace('Z', '+00:00')))
+    except (AttributeError, ValueError):
+        return jsonify({'error': 'timestamp must be an ISO 8601 datetime'}), 400
 
     # Generate appropriate feedback message
     feedback = generate_feedback_message(event_type, severity)
 
-    # Calculate impact on risk score (immediate estimate)
-    risk_impact = calculate_event_risk_impact(event_type, severity)
-
-    # Store the event for later processing
-    # In a real implementation, this would go to a real-time processing queue
-
     response = {
         'feedback_message': feedback['message'],
         'feedback_type': feedback['type'],  # 'warning', 'tip', 'congratulation'
-        'risk_impact': risk_impact,
+        'risk_impact': calculate_event_risk_impact(event_type, severity),
         'suggestions': feedback['suggestions'],
         'timestamp': timestamp
     }
 
+    if policyholder_id:
+        # Fold the event into the driver's live risk estimate
+        update = risk_stream.observe(policyholder_id, event_type, severity, at=at)
+        response.update({
+            'risk_impact': round(update.risk_impact, 6),
+            'live_risk': round(update.live_risk, 6),
+            'risk_delta': round(update.risk_delta, 6),
+            'event_rate': round(update.event_rate, 3)
+        })
+
+        # Push to any dashboards streaming this driver's feedback, unless this event type is cooling down
+        if not update.cooldown_active:
+            feedback_broker.publish(policyholder_id, 'feedback', dict(response, event_type=event_type, severity=severity, location=location))
+
     return jsonify(response)
 
+@gamification_bp.route('/feedback/stream/<string:policyholder_id>', methods=['GET'])
+@query_budget(0)
+def stream_feedback(policyholder_id):
+    """Server-sent events stream of real-time feedback for a policyholder"""
+    heartbeat = current_app.config.get('FEEDBACK_STREAM_HEARTBEAT_SECONDS', 25)
+    subscription = feedback_broker.subscribe(policyholder_id)
+
+    def event_stream():
+        try:
+            # Reconnect delay hint, then hold the connection open
+            yield 'retry: 3000\n\n'
+            while True:
+                events = subscription.wait(heartbeat)
+                if not events:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield ''.join(format_sse(event_id, event_type, data) for event_id, event_type, data in events)
+        finally:
+            feedback_broker.unsubscribe(subscription)
+
+    return Response(event_stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @gamification_bp.route('/driving-tips/<string:policyholder_id>', methods=['GET'])
+@query_budget(1)
 def get_driving_tips(policyholder_id):
     """Get personalized driving tips based on behavior"""
     policyholder = Policyholder.query.get_or_404(policyholder_id)
@@ -247,142 +268,41 @@ def get_driving_tips(policyholder_id):
     return jsonify(tips)
 
 # Helper functions
-def check_achievement_earned(policyholder_id, achievement_id, achievement):
-    """Check if a policyholder has earned a specific achievement"""
-    policyholder = Policyholder.query.get(policyholder_id)
-    criteria = achievement['criteria']
-
-    if achievement_id == 'safe_driver':
-        # Check if risk score has been below threshold for required months
-        return policyholder.risk_score_current <= criteria['risk_score_threshold']
-
-    elif achievement_id == 'smooth_operator':
-        return policyholder.avg_harsh_events_per_100km <= criteria['harsh_events_per_100km_threshold']
-
-    elif achievement_id == 'night_owl':
-        return policyholder.night_driving_percentage <= criteria['night_driving_threshold']
-
-    elif achievement_id == 'consistent_driver':
-        # Check average trips per month
-        return policyholder.avg_daily_trips * 30 >= criteria['min_trips_per_month']
-
-    return False
-
-def calculate_challenge_progress(policyholder_id, challenge_id, challenge):
-    """Calculate progress for a specific challenge"""
-    policyholder = Policyholder.query.get(policyholder_id)
-
-    if challenge_id == 'week_without_harsh_events':
-        # Check last 7 days for harsh events
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        recent_trips = Trip.query.filter(
-            Trip.policyholder_id == policyholder_id,
-            Trip.start_timestamp >= seven_days_ago
-        ).all()
-
-        days_without_events = 0
-        for i in range(7):
-            day = datetime.utcnow() - timedelta(days=i)
-            day_trips = [t for t in recent_trips if t.start_timestamp.date() == day.date()]
-
-            total_harsh_events = sum(
-                t.harsh_braking_count + t.rapid_acceleration_count + t.harsh_cornering_count
-                for t in day_trips
-            )
-
-            if total_harsh_events == 0:
-                days_without_events += 1
-
-        return {
-            'current': days_without_events,
-            'target': 7,
-            'percentage': min(days_without_events / 7 * 100, 100),
-            'description': f"{days_without_events}/7 days completed"
-        }
-
-    elif challenge_id == 'reduce_night_driving':
-        target = challenge['criteria']['night_driving_target']
-        current = policyholder.night_driving_percentage
-
-        # Progress is based on how close to target (lower is better)
-        if current <= target:
-            percentage = 100
-        else:
-            # Assume starting point was 20% for calculation
-            percentage = max(0, (20 - current) / (20 - target) * 100)
-
-        return {
-            'current': current,
-            'target': target,
-            'percentage': min(percentage, 100),
-            'description': f"{current:.1f}% night driving (target: <{target}%)"
-        }
-
-    # Default progress
-    return {
-        'current': 0,
-        'target': 100,
-        'percentage': 0,
-        'description': 'Not started'
-    }
-
-def calculate_driver_points(policyholder_id):
-    """Calculate total points for a driver based on achievements and challenges"""
-    # Simplified point calculation
-    policyholder = Policyholder.query.get(policyholder_id)
-
-    base_points = 1000
-    risk_bonus = max(0, (1 - policyholder.risk_score_current) * 500)  # Up to 500 bonus points
-
-    # Achievement bonuses (simplified)
-    achievement_bonus = 0
-    for achievement_id, achievement in ACHIEVEMENTS.items():
-        if check_achievement_earned(policyholder_id, achievement_id, achievement):
-            achievement_bonus += 100
-
-    return int(base_points + risk_bonus + achievement_bonus)
-
-def calculate_safety_score(policyholder_id):
-    """Calculate safety score (0-100)"""
-    policyholder = Policyholder.query.get(policyholder_id)
-
+def calculate_safety_score(profile):
+    """Calculate safety score (0-100) from a driver profile"""
     # Base score from risk score (inverted)
-    base_score = (1 - policyholder.risk_score_current) * 100
+    base_score = (1 - profile.risk_score_current) * 100
 
     # Adjust for harsh events
-    harsh_penalty = min(policyholder.avg_harsh_events_per_100km * 5, 30)
+    harsh_penalty = min(profile.avg_harsh_events_per_100km * 5, 30)
 
     return max(0, base_score - harsh_penalty)
 
-def calculate_efficiency_score(policyholder_id):
-    """Calculate efficiency score (0-100)"""
-    policyholder = Policyholder.query.get(policyholder_id)
-
+def calculate_efficiency_score(profile):
+    """Calculate efficiency score (0-100) from a driver profile"""
     # Base score
     score = 70
 
     # Bonus for avoiding peak hours
-    if policyholder.peak_hour_driving_percentage < 30:
+    if profile.peak_hour_driving_percentage < 30:
         score += 20
 
     # Bonus for reasonable mileage
-    if 5000 <= policyholder.total_mileage_ytd <= 15000:
+    if 5000 <= profile.total_mileage_ytd <= 15000:
         score += 10
 
     return min(score, 100)
 
-def calculate_consistency_score(policyholder_id):
-    """Calculate consistency score (0-100)"""
-    policyholder = Policyholder.query.get(policyholder_id)
-
+def calculate_consistency_score(profile):
+    """Calculate consistency score (0-100) from a driver profile"""
     # Base score for regular driving
-    if 1.5 <= policyholder.avg_daily_trips <= 3.0:
+    if 1.5 <= profile.avg_daily_trips <= 3.0:
         score = 80
     else:
         score = 60
 
     # Bonus for consistent patterns
-    if policyholder.night_driving_percentage < 15:
+    if profile.night_driving_percentage < 15:
         score += 20
 
     return min(score, 100)
@@ -449,21 +369,11 @@ def generate_feedback_message(event_type, severity):
         'suggestions': ['Maintain focus on the road']
     })
 
-def calculate_event_risk_impact(event_type, severity):
-    """Calculate the impact of a driving event on risk score"""
-    impact_values = {
-        'harsh_braking': {'low': 0.001, 'medium': 0.003, 'high': 0.005},
-        'rapid_acceleration': {'low': 0.001, 'medium': 0.002, 'high': 0.004},
-        'speeding': {'low': 0.002, 'medium': 0.004, 'high': 0.008},
-        'harsh_cornering': {'low': 0.001, 'medium': 0.002, 'high': 0.003}
-    }
+def format_sse(event_id, event_type, data):
+    """Encode one server-sent event"""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {dumps(data).decode('utf-8')}\n\n"
 
-    return impact_values.get(event_type, {}).get(severity, 0.001)
-
-def calculate_premium_adjustment(risk_score):
-    """Calculate premium adjustment percentage based on risk score"""
-    # Simple linear adjustment: 0.0 risk = -20% premium, 1.0 risk = +30% premium
-    base_adjustment = -20  # 20% discount for perfect score
-    risk_penalty = 50 * risk_score  # Up to 50% penalty for worst score
-    return base_adjustment + risk_penalty
+def calculate_event_risk_impact(event_type, severity):
+    """Calculate the base impact of a driving event on risk score"""
+    return EVENT_IMPACTS.get(event_type, {}).get(severity, DEFAULT_IMPACT)
 
@@ -0,0 +1,33 @@
+from flask import Blueprint, Response, request
+from src.services.metrics import provider_stats, render_prometheus, route_metrics
+import os
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.before_app_request
+def start_request_metrics():
+    if route_metrics.enabled:
+        route_metrics.start_request()
+
+@metrics_bp.after_app_request
+def record_request_metrics(response):
+    if route_metrics.recording():
+        # Raw environ and header reads; the parsed content_length properties cost more than the rest of the hook
+        environ = request.environ
+        route_metrics.finish_request(request.endpoint or 'unmatched', environ['REQUEST_METHOD'], response.status_code,
+                                     int(environ.get('CONTENT_LENGTH') or 0), response.headers.get('Content-Length'))
+    return response
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request latency, SQL and payload metrics per endpoint, in Prometheus text format"""
+    if route_metrics.directory:
+        # Summed over every worker, whichever one answers the scrape
+        routes, providers = route_metrics.collect()
+        text = render_prometheus(routes, providers)
+    else:
+        # This worker's counters only
+        providers = provider_stats()
+        worker = os.getpid()
+        text = render_prometheus(route_metrics.snapshot(), {worker: providers} if providers else None, worker=worker)
+    return Response(text, mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,31 @@
+from flask import Blueprint, abort, jsonify, request, send_file
+from src.services.profiling import request_profiler
+
+profiling_bp = Blueprint('profiling', __name__)
+
+PROFILE_MIMETYPES = {
+    'pstats': 'application/octet-stream',
+    'collapsed': 'text/plain',
+    'meta': 'application/json'
+}
+
+@profiling_bp.before_request
+def require_profile_token():
+    # Profiles expose code paths and timings: admin token only, and hidden unless profiling is set up
+    if not request_profiler.authorized(request.headers):
+        abort(404)
+
+@profiling_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """Stored request profiles, newest first"""
+    return jsonify({'profiles': request_profiler.list()})
+
+@profiling_bp.route('/profiles/<string:profile_id>/<string:kind>', methods=['GET'])
+def download_profile(profile_id, kind):
+    """Download a stored profile as pstats, collapsed stacks or its metadata"""
+    path = request_profiler.path(profile_id, kind)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    extension = {'meta': 'json'}.get(kind, kind)
+    return send_file(path, mimetype=PROFILE_MIMETYPES[kind], as_attachment=True,
+                     download_name=f"{profile_id}.{extension}")
@@ -1,5 +1,13 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, abort, jsonify, request
 from src.models.telematics import Policyholder, Trip, RawTelematicsData, RiskScoreHistory, db
+from src.models.pagination import KeysetPage
+from src.models.serializers import policyholder_serializer, trip_serializer, raw_data_serializer, risk_history_serializer, json_response
+from src.services.dashboard import get_dashboard_entry
+from src.services.pricing import calculate_premium_adjustment
+from src.services.pubsub import feedback_broker
+from src.services.risk_stream import risk_stream, epoch_seconds
+from src.services.query_budget import query_budget
+from src.routes.gamification import generate_feedback_message
 from datetime import datetime, date
 import json
 
@@ -7,12 +15,17 @@ telematics_bp = Blueprint('telematics', __name__)
 
 # Policyholder routes
 @telematics_bp.route('/policyholders', methods=['GET'])
+@query_budget(1)
 def get_policyholders():
-    """Get all policyholders"""
-    policyholders = Policyholder.query.all()
-    return jsonify([ph.to_dict() for ph in policyholders])
+    """Get policyholders, one keyset page at a time"""
+    fields = policyholder_serializer.parse_fields(request.args.get('fields'))
+    page = KeysetPage.from_request(keys=(Policyholder.id,))
+
+    rows = page.finish(db.session.execute(page.apply(db.select(*policyholder_serializer.columns(fields)))).all())
+    return json_response(policyholder_serializer.serialize_rows(rows, fields), headers=page.headers())
 
 @telematics_bp.route('/policyholders', methods=['POST'])
+@query_budget(2)
 def create_policyholder():
     """Create a new policyholder"""
     data = request.json
@@ -37,12 +50,14 @@ def create_policyholder():
     return jsonify(policyholder.to_dict()), 201
 
 @telematics_bp.route('/policyholders/<string:policyholder_id>', methods=['GET'])
+@query_budget(1)
 def get_policyholder(policyholder_id):
     """Get a specific policyholder"""
     policyholder = Policyholder.query.get_or_404(policyholder_id)
     return jsonify(policyholder.to_dict())
 
 @telematics_bp.route('/policyholders/<string:policyholder_id>', methods=['PUT'])
+@query_budget(8)
 def update_policyholder(policyholder_id):
     """Update a policyholder"""
     policyholder = Policyholder.query.get_or_404(policyholder_id)
@@ -77,18 +92,22 @@ def update_policyholder(policyholder_id):
 
 # Trip routes
 @telematics_bp.route('/trips', methods=['GET'])
+@query_budget(1)
 def get_trips():
-    """Get all trips, optionally filtered by policyholder"""
+    """Get trips newest first, optionally filtered by policyholder, one keyset page at a time"""
     policyholder_id = request.args.get('policyholder_id')
+    fields = trip_serializer.parse_fields(request.args.get('fields'))
+    page = KeysetPage.from_request(keys=(Trip.start_timestamp, Trip.id), descending=True)
 
+    query = db.select(*trip_serializer.columns(fields))
     if policyholder_id:
-        trips = Trip.query.filter_by(policyholder_id=policyholder_id).all()
-    else:
-        trips = Trip.query.all()
+        query = query.where(Trip.policyholder_id == policyholder_id)
 
-    return jsonify([trip.to_dict() for trip in trips])
+    rows = page.finish(db.session.execute(page.apply(query)).all())
+    return json_response(trip_serializer.serialize_rows(rows, fields), headers=page.headers())
 
 @telematics_bp.route('/trips', methods=['POST'])
+@query_budget(5)
 def create_trip():
     """Create a new trip"""
     data = request.json
@@ -123,6 +142,7 @@ def create_trip():
     return jsonify(trip.to_dict()), 201
 
 @telematics_bp.route('/trips/<string:trip_id>', methods=['GET'])
+@query_budget(1)
 def get_trip(trip_id):
     """Get a specific trip"""
     trip = Trip.query.get_or_404(trip_id)
@@ -130,6 +150,7 @@ def get_trip(trip_id):
 
 # Raw telematics data routes
 @telematics_bp.route('/raw-data', methods=['POST'])
+@query_budget(2)
 def ingest_raw_data():
     """Ingest raw telematics data"""
     data = request.json
@@ -156,7 +177,9 @@ def ingest_raw_data():
             records.append(raw_data)
 
         db.session.add_all(records)
+        events = driving_events(records)
         db.session.commit()
+        publish_driving_events(events)
         return jsonify({'message': f'Ingested {len(records)} records'}), 201
     else:
         raw_data = RawTelematicsData(
@@ -176,35 +199,40 @@ def ingest_raw_data():
         )
 
         db.session.add(raw_data)
+        events = driving_events([raw_data])
         db.session.commit()
+        publish_driving_events(events)
         return jsonify(raw_data.to_dict()), 201
 
 @telematics_bp.route('/raw-data', methods=['GET'])
+@query_budget(1)
 def get_raw_data():
     """Get raw telematics data, optionally filtered by policyholder and time range"""
     policyholder_id = request.args.get('policyholder_id')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    limit = request.args.get('limit', 100, type=int)
+    fields = raw_data_serializer.parse_fields(request.args.get('fields'))
+    page = KeysetPage.from_request(keys=(RawTelematicsData.timestamp, RawTelematicsData.id), descending=True)
 
-    query = RawTelematicsData.query
+    query = db.select(*raw_data_serializer.columns(fields))
 
     if policyholder_id:
-        query = query.filter_by(policyholder_id=policyholder_id)
+        query = query.where(RawTelematicsData.policyholder_id == policyholder_id)
 
     if start_date:
         start_dt = datetime.fromisoformat(start_date)
-        query = query.filter(RawTelematicsData.timestamp >= start_dt)
+        query = query.where(RawTelematicsData.timestamp >= start_dt)
 
     if end_date:
         end_dt = datetime.fromisoformat(end_date)
-        query = query.filter(RawTelematicsData.timestamp <= end_dt)
+        query = query.where(RawTelematicsData.timestamp <= end_dt)
 
-    raw_data = query.order_by(RawTelematicsData.timestamp.desc()).limit(limit).all()
-    return jsonify([data.to_dict() for data in raw_data])
+    rows = page.finish(db.session.execute(page.apply(query)).all())
+    return json_response(raw_data_serializer.serialize_rows(rows, fields), headers=page.headers())
 
 # Risk scoring routes
 @telematics_bp.route('/risk-score/<string:policyholder_id>', methods=['POST'])
+@query_budget(9)
 def calculate_risk_score(policyholder_id):
     """Calculate and update risk score for a policyholder"""
     policyholder = Policyholder.query.get_or_404(policyholder_id)
@@ -253,42 +281,67 @@ def calculate_risk_score(policyholder_id):
     })
 
 @telematics_bp.route('/risk-history/<string:policyholder_id>', methods=['GET'])
+@query_budget(1)
 def get_risk_history(policyholder_id):
-    """Get risk score history for a policyholder"""
-    history = RiskScoreHistory.query.filter_by(policyholder_id=policyholder_id).order_by(RiskScoreHistory.score_date.desc()).all()
-    return jsonify([record.to_dict() for record in history])
+    """Get risk score history for a policyholder, newest first, one keyset page at a time"""
+    fields = risk_history_serializer.parse_fields(request.args.get('fields'))
+    page = KeysetPage.from_request(keys=(RiskScoreHistory.score_date, RiskScoreHistory.id), descending=True)
+
+    query = db.select(*risk_history_serializer.columns(fields)).where(RiskScoreHistory.policyholder_id == policyholder_id)
+    rows = page.finish(db.session.execute(page.apply(query)).all())
+    return json_response(risk_history_serializer.serialize_rows(rows, fields), headers=page.headers())
 
 # Dashboard data routes
 @telematics_bp.route('/dashboard/<string:policyholder_id>', methods=['GET'])
+@query_budget(4)
 def get_dashboard_data(policyholder_id):
     """Get comprehensive dashboard data for a policyholder"""
-    policyholder = Policyholder.query.get_or_404(policyholder_id)
-
-    # Get recent trips
-    recent_trips = Trip.query.filter_by(policyholder_id=policyholder_id).order_by(Trip.start_timestamp.desc()).limit(10).all()
-
-    # Get risk score history
-    risk_history = RiskScoreHistory.query.filter_by(policyholder_id=policyholder_id).order_by(RiskScoreHistory.score_date.desc()).limit(12).all()
-
-    # Calculate summary statistics
-    total_trips = Trip.query.filter_by(policyholder_id=policyholder_id).count()
-    total_distance = db.session.query(db.func.sum(Trip.distance_km)).filter_by(policyholder_id=policyholder_id).scalar() or 0
-
-    return jsonify({
-        'policyholder': policyholder.to_dict(),
-        'recent_trips': [trip.to_dict() for trip in recent_trips],
-        'risk_history': [record.to_dict() for record in risk_history],
-        'summary': {
-            'total_trips': total_trips,
-            'total_distance_km': total_distance,
-            'current_risk_score': policyholder.risk_score_current,
-            'premium_adjustment': calculate_premium_adjustment(policyholder.risk_score_current)
-        }
-    })
-
-def calculate_premium_adjustment(risk_score):
-    """Calculate premium adjustment percentage based on risk score"""
-    # Simple linear adjustment: 0.0 risk = -20% premium, 1.0 risk = +30% premium
-    base_adjustment = -20  # 20% discount for perfect score
-    risk_penalty = 50 * risk_score  # Up to 50% penalty for worst score
-    return base_adjustment + risk_penalty
\ No newline at end of file
+    # Served from the per-policyholder read model cache once one indexed read confirms it is current
+    entry = get_dashboard_entry(policyholder_id)
+    if entry is None:
+        abort(404)
+
+    response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.last_modified = entry.last_modified
+    response.cache_control.no_cache = True  # Clients must revalidate, which is a cheap 304
+
+    return response.make_conditional(request)
+
+def driving_events(records):
+    """Non-normal events in ingested raw data, read before the commit expires the records"""
+    events = []
+    for record in records:
+        if not record.event_type or record.event_type == 'normal':
+            continue
+        payload = json.loads(record.raw_data_payload) if record.raw_data_payload else {}
+        events.append({
+            'policyholder_id': record.policyholder_id,
+            'event_type': record.event_type,
+            'severity': payload.get('severity', 'medium') if isinstance(payload, dict) else 'medium',
+            'timestamp': record.timestamp,
+            'location': {'latitude': record.latitude, 'longitude': record.longitude}
+        })
+    return events
+
+def publish_driving_events(events):
+    """Feed driving events to the live risk stream and streaming dashboards"""
+    for event in events:
+        feedback = generate_feedback_message(event['event_type'], event['severity'])
+        update = risk_stream.observe(
+            event['policyholder_id'], event['event_type'], event['severity'],
+            at=epoch_seconds(event['timestamp'])
+        )
+        if update.cooldown_active:
+            continue
+        feedback_broker.publish(event['policyholder_id'], 'feedback', {
+            'feedback_message': feedback['message'],
+            'feedback_type': feedback['type'],
+            'risk_impact': round(update.risk_impact, 6),
+            'live_risk': round(update.live_risk, 6),
+            'suggestions': feedback['suggestions'],
+            'timestamp': event['timestamp'].isoformat(),
+            'event_type': event['event_type'],
+            'severity': event['severity'],
+            'location': event['location']
+        })
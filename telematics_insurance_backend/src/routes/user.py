@@ -1,12 +1,17 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db
+from src.models.pagination import KeysetPage
+from src.models.serializers import user_serializer, json_response
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    fields = user_serializer.parse_fields(request.args.get('fields'))
+    page = KeysetPage.from_request(keys=(User.id,))
+
+    rows = page.finish(db.session.execute(page.apply(db.select(*user_serializer.columns(fields)))).all())
+    return json_response(user_serializer.serialize_rows(rows, fields), headers=page.headers())
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
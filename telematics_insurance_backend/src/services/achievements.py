@@ -0,0 +1,209 @@
+from src.models.telematics import Policyholder, PolicyholderAchievement, db
+from src.services.points import ACHIEVEMENT_POINTS, post_points
+from src.lazy import lazy_import
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from datetime import datetime
+import operator
+import uuid
+
+np = lazy_import('numpy')
+
+# criteria key -> (policyholder feature, comparison, scale applied to the feature)
+CRITERIA_PREDICATES = {
+    'risk_score_threshold': ('risk_score_current', operator.le, 1),
+    'harsh_events_per_100km_threshold': ('avg_harsh_events_per_100km', operator.le, 1),
+    'night_driving_threshold': ('night_driving_percentage', operator.le, 1),
+    'min_trips_per_month': ('avg_daily_trips', operator.ge, 30)
+}
+
+# Criteria that qualify another criterion rather than test a feature. Score
+# duration is not tracked yet, so safe_driver checks the current score only.
+CRITERIA_MODIFIERS = frozenset({'duration_months'})
+
+# Achievement definitions
+ACHIEVEMENTS = {
+    'safe_driver': {
+        'name': 'Safe Driver',
+        'description': 'Low risk score for 3 months',
+        'icon': 'award',
+        'color': 'yellow',
+        'criteria': {'risk_score_threshold': 0.3, 'duration_months': 3}
+    },
+    'smooth_operator': {
+        'name': 'Smooth Operator',
+        'description': 'Minimal harsh events',
+        'icon': 'target',
+        'color': 'green',
+        'criteria': {'harsh_events_per_100km_threshold': 3.0}
+    },
+    'eco_driver': {
+        'name': 'Eco Driver',
+        'description': 'Efficient driving patterns',
+        'icon': 'leaf',
+        'color': 'green',
+        'criteria': {'avg_speed_threshold': 60}
+    },
+    'night_owl': {
+        'name': 'Night Owl',
+        'description': 'Reduced night driving',
+        'icon': 'moon',
+        'color': 'blue',
+        'criteria': {'night_driving_threshold': 10.0}
+    },
+    'consistent_driver': {
+        'name': 'Consistent Driver',
+        'description': 'Regular driving patterns',
+        'icon': 'calendar',
+        'color': 'purple',
+        'criteria': {'min_trips_per_month': 20}
+    }
+}
+
+class AchievementRule:
+    """An achievement's criteria compiled into one predicate
+
+    The predicate works element-wise on NumPy feature columns, evaluating the
+    whole book at once, and equally on the scalar attributes of one row.
+    Criteria with no known predicate make the achievement unearnable.
+    """
+
+    __slots__ = ('achievement_id', 'features', 'tests')
+
+    def __init__(self, achievement_id, criteria):
+        self.achievement_id = achievement_id
+        self.tests = []
+        for key, threshold in criteria.items():
+            if key in CRITERIA_MODIFIERS:
+                continue
+            if key not in CRITERIA_PREDICATES:
+                self.tests = None
+                break
+            feature, compare, scale = CRITERIA_PREDICATES[key]
+            self.tests.append((feature, compare, scale, threshold))
+        self.features = tuple(test[0] for test in self.tests or ())
+
+    def evaluate(self, features):
+        """Boolean mask over NumPy feature columns"""
+        size = len(next(iter(features.values()))) if features else 0
+        if not self.tests:
+            return np.zeros(size, dtype=bool)
+
+        earned = np.ones(size, dtype=bool)
+        for feature, compare, scale, threshold in self.tests:
+            earned &= compare(features[feature] * scale, threshold)
+        return earned
+
+    def earned_by(self, policyholder):
+        """Check one already loaded policyholder (model or row)"""
+        if not self.tests:
+            return False
+        return all(
+            compare(_feature(policyholder, feature) * scale, threshold)
+            for feature, compare, scale, threshold in self.tests
+        )
+
+def compile_achievements(achievements):
+    """Compile achievement definitions into rules keyed by achievement id"""
+    return {achievement_id: AchievementRule(achievement_id, definition['criteria'])
+            for achievement_id, definition in achievements.items()}
+
+# Compiled once; evaluates one driver or the whole book
+ACHIEVEMENT_RULES = compile_achievements(ACHIEVEMENTS)
+
+def evaluate_book(rules, snapshot):
+    """Masks of who currently meets each achievement, over a book snapshot"""
+    return {achievement_id: rule.evaluate(snapshot['features']) for achievement_id, rule in rules.items()}
+
+def award_achievements(rules, snapshot, earned_at=None):
+    """Persist newly earned achievements for the whole book in one batch
+
+    Returns the number of new awards per achievement id. Awards are kept once
+    earned, dated when the run first saw the criteria met, and each pays
+    ACHIEVEMENT_POINTS into the points ledger.
+    """
+    earned_at = earned_at or datetime.utcnow()
+    ids = snapshot['ids']
+    masks = evaluate_book(rules, snapshot)
+
+    awarded = set(db.session.execute(
+        db.select(PolicyholderAchievement.policyholder_id, PolicyholderAchievement.achievement_id)
+    ).all())
+
+    fresh = []
+    counts = {}
+    for achievement_id, mask in masks.items():
+        candidates = [str(policyholder_id) for policyholder_id in ids[mask]]
+        new_awards = [(policyholder_id, achievement_id) for policyholder_id in candidates
+                      if (policyholder_id, achievement_id) not in awarded]
+        counts[achievement_id] = len(new_awards)
+        fresh.extend(new_awards)
+
+    insert_awards(db.session, fresh, earned_at)
+    db.session.commit()
+    return counts
+
+def insert_awards(session, awards, earned_at):
+    """Write (policyholder_id, achievement_id) awards and pay their points in the same transaction"""
+    if not awards:
+        return
+    session.execute(db.insert(PolicyholderAchievement), [{
+        'id': str(uuid.uuid4()),
+        'policyholder_id': policyholder_id,
+        'achievement_id': achievement_id,
+        'earned_date': earned_at,
+        'created_at': earned_at
+    } for policyholder_id, achievement_id in awards])
+    post_points([{
+        'policyholder_id': policyholder_id,
+        'entry_type': 'achievement',
+        'reference': achievement_id,
+        'points': ACHIEVEMENT_POINTS,
+        'description': f"Earned achievement {achievement_id}",
+        'created_at': earned_at
+    } for policyholder_id, achievement_id in awards], session=session)
+
+def earned_achievements(policyholder_id):
+    """(achievement_id, earned_date) pairs for one policyholder, in award order"""
+    return db.session.execute(
+        db.select(PolicyholderAchievement.achievement_id, PolicyholderAchievement.earned_date)
+        .where(PolicyholderAchievement.policyholder_id == policyholder_id)
+        .order_by(PolicyholderAchievement.earned_date, PolicyholderAchievement.achievement_id)
+    ).all()
+
+@event.listens_for(Session, 'before_flush')
+def award_changed_policyholders(session, flush_context, instances):
+    """Award achievements in the same flush that changes a driver's risk score or aggregates
+
+    Only drivers whose achievement features changed are evaluated, so awards
+    keep up with scoring and aggregate updates; `flask award-achievements`
+    covers imported data and changed rules.
+    """
+    features = {feature for rule in ACHIEVEMENT_RULES.values() for feature in rule.features}
+    changed = [obj for obj in session.dirty if isinstance(obj, Policyholder) and _changed(obj, features)]
+    if not changed:
+        return
+
+    with session.no_autoflush:
+        awarded = set(session.execute(
+            db.select(PolicyholderAchievement.policyholder_id, PolicyholderAchievement.achievement_id)
+            .where(PolicyholderAchievement.policyholder_id.in_([policyholder.id for policyholder in changed]))
+        ).all())
+        insert_awards(session, [
+            (policyholder.id, achievement_id)
+            for policyholder in changed
+            for achievement_id, rule in ACHIEVEMENT_RULES.items()
+            if (policyholder.id, achievement_id) not in awarded and rule.earned_by(policyholder)
+        ], datetime.utcnow())
+
+# Helper functions
+def _feature(policyholder, feature):
+    # NULL features fall back to the model defaults, as in the book snapshot
+    value = getattr(policyholder, feature)
+    if value is None:
+        return 0.5 if feature == 'risk_score_current' else 0.0
+    return value
+
+def _changed(policyholder, features):
+    state = inspect(policyholder)
+    return any(state.attrs[feature].history.has_changes() for feature in features)
@@ -0,0 +1,337 @@
+from src.models.telematics import ChallengeProgress, Policyholder, Trip, db
+from src.services.points import post_points
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta, timezone
+import json
+
+# Challenge definitions
+CHALLENGES = {
+    'week_without_harsh_events': {
+        'name': 'Week Without Harsh Events',
+        'description': 'Complete 7 days without any harsh braking or acceleration',
+        'duration_days': 7,
+        'reward_points': 100,
+        'criteria': {'max_harsh_events': 0}
+    },
+    'reduce_night_driving': {
+        'name': 'Reduce Night Driving',
+        'description': 'Keep night driving under 10% for the month',
+        'duration_days': 30,
+        'reward_points': 150,
+        'criteria': {'night_driving_target': 10.0}
+    },
+    'smooth_month': {
+        'name': 'Smooth Month',
+        'description': 'Maintain less than 2 harsh events per 100km for a month',
+        'duration_days': 30,
+        'reward_points': 200,
+        'criteria': {'harsh_events_per_100km_target': 2.0}
+    },
+    'mileage_master': {
+        'name': 'Mileage Master',
+        'description': 'Drive 1000km with excellent behavior',
+        'duration_days': 60,
+        'reward_points': 250,
+        'criteria': {'target_distance': 1000, 'max_risk_score': 0.3}
+    }
+}
+
+class ChallengeTracker:
+    """Per-policyholder, per-challenge running totals updated as trips are written
+
+    Each challenge keeps a window (duration_days long, starting at the day of
+    the first trip in it) with distance, driving, night and harsh event
+    totals. A trip past the window end closes it and starts a new one.
+    Trailing-day challenges keep one window and a short list of event days;
+    once completed, they re-arm with the first trip a full duration_days
+    after the completion. Progress is computed from the stored totals, never
+    from trips.
+    """
+
+    def __init__(self, challenges):
+        self.challenges = challenges
+
+    def record_trip(self, trip, policyholder, states):
+        """Fold one new trip into the policyholder's challenge states
+
+        `states` maps challenge id to ChallengeProgress; missing states are
+        created and returned in the dict. Returns (challenge_id, window_start,
+        completed_at) for each window this trip completed.
+        """
+        completed = []
+        started = _naive_utc(trip.start_timestamp)
+        for challenge_id, challenge in self.challenges.items():
+            state = states.get(challenge_id)
+            if state is None:
+                state = states[challenge_id] = _new_state(trip.policyholder_id, challenge_id, started)
+
+            window_end = state.window_start + timedelta(days=challenge['duration_days'])
+            if started < state.window_start:
+                continue  # Belongs to an already closed window
+            if _measured_by(challenge) in ROLLING_CRITERIA:
+                if state.completed_at is not None and started >= state.completed_at + timedelta(days=challenge['duration_days']):
+                    # Re-arm a full period after the last completion, so the next reward needs
+                    # another complete trailing period; harsh event days are kept
+                    _reset_window(state, state.completed_at)
+            elif started >= window_end:
+                # Settle the closing window at its end, then start over
+                if self._settle(challenge_id, state, policyholder, window_end):
+                    completed.append((challenge_id, state.window_start, window_end))
+                _reset_window(state, started)
+
+            if _counts_trip(challenge, policyholder):
+                _accumulate(state, trip, started, challenge['duration_days'])
+            if self._settle(challenge_id, state, policyholder, started):
+                completed.append((challenge_id, state.window_start, started))
+
+        return completed
+
+    def progress(self, challenge_id, state, policyholder, now=None):
+        """Progress of one challenge from its stored state"""
+        challenge = self.challenges[challenge_id]
+        now = now or datetime.utcnow()
+        key = _measured_by(challenge)
+        if key is None:
+            return not_started()
+
+        if state is not None and key not in ROLLING_CRITERIA:
+            if now > state.window_start + timedelta(days=challenge['duration_days']):
+                state = None  # Window over with no trips since; a new one starts on the next trip
+        return PROGRESS_EVALUATORS[key](challenge, state, policyholder, now)
+
+    # Helper methods
+    def _settle(self, challenge_id, state, policyholder, at):
+        # Mark the window complete the first time its progress reaches 100%
+        if state.completed_at is not None:
+            return False
+        if self.progress(challenge_id, state, policyholder, at)['percentage'] >= 100:
+            state.completed_at = at
+            return True
+        return False
+
+# Keeps challenge progress current as trips are written
+challenge_tracker = ChallengeTracker(CHALLENGES)
+
+def challenge_reward(policyholder_id, challenge_id, challenge, window_start, completed_at):
+    """Ledger entry paying a challenge's reward_points for one completed window"""
+    return {
+        'policyholder_id': policyholder_id,
+        'entry_type': 'challenge',
+        'reference': f"{challenge_id}:{window_start.date().isoformat()}",
+        'points': challenge['reward_points'],
+        'description': f"Completed {challenge['name']}",
+        'created_at': completed_at
+    }
+
+def load_progress(policyholder_id):
+    """challenge id -> ChallengeProgress for one policyholder, in one indexed read"""
+    rows = db.session.execute(
+        db.select(ChallengeProgress).where(ChallengeProgress.policyholder_id == policyholder_id)
+    ).scalars()
+    return {row.challenge_id: row for row in rows}
+
+def not_started():
+    """Progress reported before a challenge has any data"""
+    return {
+        'current': 0,
+        'target': 100,
+        'percentage': 0,
+        'description': 'Not started'
+    }
+
+def clean_days_progress(challenge, state, policyholder, now):
+    """Tracked days in the trailing window without harsh events"""
+    if state is None:
+        return not_started()
+
+    days = challenge['duration_days']
+    today = now.date()
+    # Days before tracking started cannot count as clean
+    tracked = min(max((today - state.window_start.date()).days + 1, 0), days)
+    event_days = {day for day in _event_days(state) if 0 <= (today - day).days < tracked}
+    clean = tracked - len(event_days)
+
+    return {
+        'current': clean,
+        'target': days,
+        'percentage': min(clean / days * 100, 100),
+        'description': f"{clean}/{days} days completed"
+    }
+
+def night_driving_progress(challenge, state, policyholder, now):
+    """Night driving share of the window, lower is better"""
+    if state is None or not state.driving_minutes:
+        return not_started()
+
+    target = challenge['criteria']['night_driving_target']
+    current = state.night_minutes / state.driving_minutes * 100
+
+    # Progress is based on how close to target (lower is better)
+    if current <= target:
+        percentage = 100
+    else:
+        # Assume starting point was 20% for calculation
+        percentage = max(0, (20 - current) / (20 - target) * 100)
+
+    return {
+        'current': current,
+        'target': target,
+        'percentage': min(percentage, 100),
+        'description': f"{current:.1f}% night driving (target: <{target}%)"
+    }
+
+def harsh_rate_progress(challenge, state, policyholder, now):
+    """Harsh events per 100km held under target for the whole window"""
+    if state is None or not state.distance_km:
+        return not_started()
+
+    target = challenge['criteria']['harsh_events_per_100km_target']
+    days = challenge['duration_days']
+    current = state.harsh_events / state.distance_km * 100
+    elapsed = min(max((now - state.window_start).days, 0), days)
+
+    # Time under target counts; going over resets the month's progress
+    percentage = elapsed / days * 100 if current < target else 0
+
+    return {
+        'current': round(current, 2),
+        'target': target,
+        'percentage': min(percentage, 100),
+        'description': f"{current:.1f} harsh events per 100km (target: <{target}), day {elapsed}/{days}"
+    }
+
+def distance_progress(challenge, state, policyholder, now):
+    """Distance driven while the risk score is within the challenge limit"""
+    target = challenge['criteria']['target_distance']
+    current = state.distance_km if state is not None else 0.0
+
+    return {
+        'current': round(current, 1),
+        'target': target,
+        'percentage': min(current / target * 100, 100),
+        'description': f"{current:.0f}/{target} km driven"
+    }
+
+# First matching criteria key decides how a challenge's progress is measured
+PROGRESS_EVALUATORS = {
+    'max_harsh_events': clean_days_progress,
+    'night_driving_target': night_driving_progress,
+    'harsh_events_per_100km_target': harsh_rate_progress,
+    'target_distance': distance_progress
+}
+
+# Measured over the trailing days rather than a fixed window
+ROLLING_CRITERIA = frozenset({'max_harsh_events'})
+
+# Trip columns the tracker reads
+TRIP_COLUMNS = (
+    'policyholder_id', 'start_timestamp', 'duration_seconds', 'distance_km', 'harsh_braking_count',
+    'rapid_acceleration_count', 'harsh_cornering_count', 'night_driving_minutes'
+)
+
+def rebuild_progress(tracker, chunk_size=5000):
+    """Recompute every policyholder's challenge state by replaying all trips
+
+    Only progress is rebuilt; rewards already in the points ledger stand.
+    """
+    db.session.execute(db.delete(ChallengeProgress))
+
+    columns = [getattr(Trip, name) for name in TRIP_COLUMNS]
+    query = db.select(*columns).order_by(Trip.policyholder_id, Trip.start_timestamp, Trip.id)
+    current_id, policyholder, states = None, None, {}
+    trips = 0
+
+    # Eligibility uses today's risk scores; history is not scored per trip
+    policyholders = {row.id: row for row in db.session.execute(db.select(Policyholder.id, Policyholder.risk_score_current))}
+    for trip in db.session.execute(query.execution_options(yield_per=chunk_size)):
+        if trip.policyholder_id != current_id:
+            _save_states(states)
+            current_id, states = trip.policyholder_id, {}
+            policyholder = policyholders.get(current_id)
+        tracker.record_trip(trip, policyholder, states)
+        trips += 1
+
+    _save_states(states)
+    db.session.commit()
+    return trips
+
+@event.listens_for(Session, 'before_flush')
+def track_new_trips(session, flush_context, instances):
+    """Update challenge progress in the same flush that writes new trips"""
+    trips = [obj for obj in session.new if isinstance(obj, Trip)]
+    if not trips:
+        return
+
+    with session.no_autoflush:
+        for policyholder_id in {trip.policyholder_id for trip in trips}:
+            states = load_progress(policyholder_id)
+            known = set(states)
+            policyholder = session.get(Policyholder, policyholder_id)
+            completed = []
+            for trip in sorted((t for t in trips if t.policyholder_id == policyholder_id),
+                               key=lambda t: _naive_utc(t.start_timestamp)):
+                completed.extend(challenge_tracker.record_trip(trip, policyholder, states))
+            session.add_all(state for challenge_id, state in states.items() if challenge_id not in known)
+
+            # Rewards are paid in the same transaction as the completing trip
+            post_points([
+                challenge_reward(policyholder_id, challenge_id, challenge_tracker.challenges[challenge_id], window_start, at)
+                for challenge_id, window_start, at in completed
+            ], session=session)
+
+# Helper functions
+def _measured_by(challenge):
+    return next((key for key in PROGRESS_EVALUATORS if key in challenge['criteria']), None)
+
+def _new_state(policyholder_id, challenge_id, starting):
+    state = ChallengeProgress(policyholder_id=policyholder_id, challenge_id=challenge_id)
+    _reset_window(state, starting)
+    state.harsh_event_days = None
+    return state
+
+def _reset_window(state, starting):
+    state.window_start = datetime.combine(starting.date(), datetime.min.time())
+    state.trip_count = 0
+    state.distance_km = 0.0
+    state.driving_minutes = 0.0
+    state.night_minutes = 0.0
+    state.harsh_events = 0
+    state.completed_at = None
+
+def _counts_trip(challenge, policyholder):
+    # "With excellent behavior": only distance driven within the risk limit counts
+    max_risk = challenge['criteria'].get('max_risk_score')
+    if max_risk is None:
+        return True
+    return policyholder is not None and (policyholder.risk_score_current or 0) <= max_risk
+
+def _accumulate(state, trip, started, days_kept):
+    harsh = (trip.harsh_braking_count or 0) + (trip.rapid_acceleration_count or 0) + (trip.harsh_cornering_count or 0)
+    state.trip_count = (state.trip_count or 0) + 1
+    state.distance_km = (state.distance_km or 0.0) + trip.distance_km
+    state.driving_minutes = (state.driving_minutes or 0.0) + trip.duration_seconds / 60
+    state.night_minutes = (state.night_minutes or 0.0) + (trip.night_driving_minutes or 0)
+    state.harsh_events = (state.harsh_events or 0) + harsh
+
+    if harsh:
+        days = set(_event_days(state))
+        days.add(started.date())
+        latest = max(days)
+        # Only the challenge's trailing period is ever read back
+        state.harsh_event_days = json.dumps(sorted(day.isoformat() for day in days if (latest - day).days < days_kept))
+
+def _naive_utc(timestamp):
+    # Stored timestamps are naive UTC; API input may carry an offset
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _event_days(state):
+    if state is None or not state.harsh_event_days:
+        return []
+    return [date.fromisoformat(day) for day in json.loads(state.harsh_event_days)]
+
+def _save_states(states):
+    db.session.add_all(states.values())
+    db.session.flush()
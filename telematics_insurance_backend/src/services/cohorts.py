@@ -0,0 +1,332 @@
+from src.models.telematics import Policyholder, PointsBalance, db
+from src.models.signals import policyholder_changed, points_posted
+from src.services.leaderboard import LEADERBOARD_COLUMNS, build_entry
+from bisect import bisect_left, insort
+from datetime import date
+import heapq
+import re
+import threading
+import time
+
+# Extra columns segments are derived from
+SEGMENT_COLUMNS = ('vehicle_year', 'address', 'date_of_birth')
+
+YEAR_BAND_SIZE = 5
+AGE_BANDS = ((16, 24), (25, 34), (35, 44), (45, 54), (55, 64), (65, 120))
+
+# "..., Springfield, IL 62701" -> "IL"
+REGION_PATTERN = re.compile(r',\s*([A-Za-z][A-Za-z .]*?)\s+\d{5}(?:-\d{4})?\s*$')
+
+class CohortDimension:
+    """How policyholders are segmented along one dimension
+
+    `key` maps a row to its segment value (None when it has none); `where`
+    narrows a SQL query to candidates for one value, used to refill a board.
+    """
+
+    def __init__(self, name, key, where):
+        self.name = name
+        self.key = key
+        self.where = where
+
+def vehicle_year_band(row, today):
+    if not row.vehicle_year:
+        return None
+    start = row.vehicle_year - row.vehicle_year % YEAR_BAND_SIZE
+    return f"{start}-{start + YEAR_BAND_SIZE - 1}"
+
+def region(row, today):
+    if not row.address:
+        return None
+    match = REGION_PATTERN.search(row.address)
+    return match.group(1).strip().upper() if match else None
+
+def age_band(row, today):
+    if not row.date_of_birth:
+        return None
+    born = row.date_of_birth
+    age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    for low, high in AGE_BANDS:
+        if low <= age <= high:
+            return f"{low}+" if high >= 120 else f"{low}-{high}"
+    return None
+
+def _year_band_where(value):
+    start, end = (int(part) for part in value.split('-'))
+    return Policyholder.vehicle_year.between(start, end)
+
+def _age_band_where(value):
+    low, _, high = value.rstrip('+').partition('-')
+    today = date.today()
+    # Born between these dates -> age within [low, high]
+    youngest = _years_before(today, int(low))
+    clause = Policyholder.date_of_birth <= youngest
+    if high:
+        clause = clause & (Policyholder.date_of_birth > _years_before(today, int(high) + 1))
+    return clause
+
+COHORT_DIMENSIONS = {dimension.name: dimension for dimension in (
+    CohortDimension('vehicle_make', lambda row, today: row.vehicle_make or None,
+                    lambda value: Policyholder.vehicle_make == value),
+    CohortDimension('vehicle_year', vehicle_year_band, _year_band_where),
+    CohortDimension('region', region, lambda value: Policyholder.address.like(f"%{value}%")),
+    CohortDimension('age_band', age_band, _age_band_where)
+)}
+
+# A change to any of these can move a driver between boards or alter their entry
+COHORT_FIELDS = frozenset(LEADERBOARD_COLUMNS) | frozenset(SEGMENT_COLUMNS)
+
+class CohortLeaderboards:
+    """Bounded top-K boards for every cohort segment
+
+    Each segment keeps its best `k + slack` drivers in (risk_score, id) order.
+    The whole book is segmented in one streamed pass with bounded heaps, so
+    memory grows with the number of segments, not the book. Committed changes
+    are queued and patched in on the next read with one primary-key query; a
+    board that drops below `k` while its segment has more drivers is refilled
+    from the database on its own. Rendered boards are cached per segment.
+    Segment sizes are counted at each rebuild.
+    """
+
+    def __init__(self, k=100, slack=50, refresh_seconds=900, dimensions=None):
+        self.k = k
+        self.slack = slack
+        self.refresh_seconds = refresh_seconds
+        self.dimensions = dimensions or COHORT_DIMENSIONS
+        self._boards = {}  # (dimension, value) -> sorted [(score, policyholder_id)]
+        self._sizes = {}  # (dimension, value) -> drivers in the segment at the last build
+        self._complete = set()  # Segments whose board holds every driver in them
+        self._members = {}  # policyholder_id -> (sort key, segments, entry) for drivers on any board
+        self._rendered = {}  # (dimension, value) -> ranked entries, built on first read
+        self._pending = {}  # policyholder_id -> deleted, changes committed since the last read
+        self._needs_rebuild = True
+        self._loaded_at = 0.0
+        self._lock = threading.RLock()
+
+    def board(self, dimension, value, limit=10):
+        """Ranked top drivers of one segment; None for an unknown segment"""
+        with self._lock:
+            self._prepare()
+            segment = (dimension, value)
+            if segment not in self._boards:
+                return None
+
+            rendered = self._rendered.get(segment)
+            if rendered is None:
+                if self._is_short(segment):
+                    self._refill(segment)
+                rendered = self._rendered[segment] = [
+                    dict(self._members[policyholder_id][2], rank=i + 1)
+                    for i, (_, policyholder_id) in enumerate(self._boards[segment][:self.k])
+                ]
+            return rendered[:limit]
+
+    def segments(self):
+        """dimension -> {segment value: driver count}"""
+        with self._lock:
+            self._prepare()
+            listed = {name: {} for name in self.dimensions}
+            for segment, board in self._boards.items():
+                dimension, value = segment
+                listed[dimension][value] = len(board) if segment in self._complete else self._sizes.get(segment, 0)
+            return listed
+
+    def apply_change(self, policyholder_id, deleted=False):
+        """Queue a committed change to one policyholder; applied on the next read"""
+        with self._lock:
+            if not self._needs_rebuild:
+                self._pending[policyholder_id] = deleted
+
+    def invalidate(self):
+        with self._lock:
+            self._needs_rebuild = True
+            self._pending.clear()
+
+    def build(self, rows, today=None):
+        """Segment the whole book in one pass, keeping bounded heaps per segment"""
+        today = today or date.today()
+        capacity = self.k + self.slack
+        heaps = {}
+        worst = {}  # segment -> worst kept key once its heap is full
+        sizes = {}
+
+        for row in rows:
+            key = (_score(row.risk_score_current), row.id)
+            for segment in self._segments_for(row, today):
+                sizes[segment] = sizes.get(segment, 0) + 1
+                heap = heaps.get(segment)
+                if heap is None:
+                    heap = heaps[segment] = []
+                # Max-heap on the sort key via negation: the root is the worst kept driver.
+                # Rows ride along so evicted ones are freed instead of held for the whole pass
+                if len(heap) < capacity:
+                    heapq.heappush(heap, (-key[0], _Inverted(key[1]), row))
+                elif key < worst[segment]:
+                    heapq.heapreplace(heap, (-key[0], _Inverted(key[1]), row))
+                else:
+                    continue
+                if len(heap) == capacity:
+                    worst[segment] = (-heap[0][0], heap[0][1].value)
+
+        boards = {}
+        members = {}
+        for segment, heap in heaps.items():
+            boards[segment] = sorted((-negated, inverted.value) for negated, inverted, _ in heap)
+            for negated, inverted, row in heap:
+                if inverted.value not in members:
+                    members[inverted.value] = (
+                        (-negated, inverted.value), tuple(self._segments_for(row, today)), build_entry(row)
+                    )
+
+        with self._lock:
+            self._boards, self._sizes, self._members = boards, sizes, members
+            self._complete = {segment for segment, board in boards.items() if len(board) < capacity}
+            self._rendered = {}
+            self._pending = {}
+            self._needs_rebuild = False
+            self._loaded_at = time.monotonic()
+
+    def apply_rows(self, rows, deleted_ids=(), today=None):
+        """Patch boards with fresh rows for changed drivers (and drop deleted ones)"""
+        today = today or date.today()
+        capacity = self.k + self.slack
+        with self._lock:
+            for policyholder_id in deleted_ids:
+                self._remove(policyholder_id)
+            for row in rows:
+                self._remove(row.id)
+                key = (_score(row.risk_score_current), row.id)
+                segments = tuple(self._segments_for(row, today))
+                placed = False
+                for segment in segments:
+                    if segment not in self._boards:
+                        # First driver of a new segment
+                        self._boards[segment] = []
+                        self._complete.add(segment)
+                    board = self._boards[segment]
+                    # Past the tail of an incomplete board there may be better drivers it never held
+                    if segment in self._complete or (board and key < board[-1]):
+                        insort(board, key)
+                        placed = True
+                        if len(board) > capacity:
+                            self._drop(segment, board.pop()[1])
+                            self._complete.discard(segment)
+                    self._rendered.pop(segment, None)
+                if placed:
+                    self._members[row.id] = (key, segments, build_entry(row))
+
+    # Helper methods
+    def _prepare(self):
+        if self._needs_rebuild or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.build(db.session.execute(_cohort_query().execution_options(yield_per=10000)))
+        elif self._pending:
+            pending, self._pending = self._pending, {}
+            changed = [policyholder_id for policyholder_id, deleted in pending.items() if not deleted]
+            rows = db.session.execute(_cohort_query().where(Policyholder.id.in_(changed))).all() if changed else []
+            found = {row.id for row in rows}
+            self.apply_rows(rows, deleted_ids=[policyholder_id for policyholder_id in pending if policyholder_id not in found])
+
+    def _remove(self, policyholder_id):
+        member = self._members.pop(policyholder_id, None)
+        if member is None:
+            return
+        key, segments, _ = member
+        for segment in segments:
+            board = self._boards.get(segment)
+            if board is None:
+                continue
+            index = bisect_left(board, key)
+            if index < len(board) and board[index] == key:
+                del board[index]
+            self._rendered.pop(segment, None)
+
+    def _drop(self, segment, policyholder_id):
+        # Evicted from one board; forget the member once it is on none
+        member = self._members.get(policyholder_id)
+        if member is not None and not any(
+            other != segment and _on_board(self._boards.get(other, ()), member[0]) for other in member[1]
+        ):
+            del self._members[policyholder_id]
+
+    def _is_short(self, segment):
+        return segment not in self._complete and len(self._boards[segment]) < self.k
+
+    def _refill(self, segment):
+        # Reload one segment's top drivers; the dimension's filter narrows the scan
+        dimension, value = segment
+        today = date.today()
+        query = _cohort_query().where(self.dimensions[dimension].where(value))
+        board = []
+        for row in db.session.execute(query.execution_options(yield_per=10000)):
+            if self.dimensions[dimension].key(row, today) != value:
+                continue
+            key = (_score(row.risk_score_current), row.id)
+            if len(board) < self.k + self.slack or key < board[-1]:
+                insort(board, key)
+                del board[self.k + self.slack:]
+                if row.id not in self._members:
+                    self._members[row.id] = (key, tuple(self._segments_for(row, today)), build_entry(row))
+        self._boards[segment] = board
+        if len(board) < self.k + self.slack:
+            self._complete.add(segment)
+
+    def _segments_for(self, row, today):
+        for name, dimension in self.dimensions.items():
+            value = dimension.key(row, today)
+            if value is not None:
+                yield (name, value)
+
+cohort_leaderboards = CohortLeaderboards()
+
+def configure_cohort_leaderboards(app):
+    """Apply COHORT_LEADERBOARD_* settings from the app config"""
+    cohort_leaderboards.k = app.config.get('COHORT_LEADERBOARD_SIZE', cohort_leaderboards.k)
+    cohort_leaderboards.slack = app.config.get('COHORT_LEADERBOARD_SLACK', cohort_leaderboards.slack)
+    cohort_leaderboards.refresh_seconds = app.config.get('COHORT_LEADERBOARD_REFRESH_SECONDS', cohort_leaderboards.refresh_seconds)
+
+# Helper functions
+def _cohort_query():
+    columns = [getattr(Policyholder, name) for name in LEADERBOARD_COLUMNS + SEGMENT_COLUMNS]
+    return db.select(*columns, PointsBalance.balance.label('total_points')).outerjoin(
+        PointsBalance, PointsBalance.policyholder_id == Policyholder.id
+    )
+
+def _score(risk_score):
+    # Same ordering as the overall leaderboard: unscored drivers first
+    return -1.0 if risk_score is None else risk_score
+
+def _on_board(board, key):
+    index = bisect_left(board, key)
+    return index < len(board) and board[index] == key
+
+def _years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:  # Feb 29
+        return day.replace(year=day.year - years, day=28)
+
+class _Inverted:
+    """Reverses ordering of ids so ties on score keep the smallest id"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __gt__(self, other):
+        return self.value < other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+@policyholder_changed.connect
+def _update_on_policyholder_change(policyholder_id, fields=frozenset(), deleted=False, **kwargs):
+    if deleted or fields & COHORT_FIELDS:
+        cohort_leaderboards.apply_change(policyholder_id, deleted=deleted)
+
+@points_posted.connect
+def _update_on_points_posted(policyholder_id, **kwargs):
+    cohort_leaderboards.apply_change(policyholder_id)
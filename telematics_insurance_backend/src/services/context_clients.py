@@ -0,0 +1,349 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+import bisect
+import contextvars
+import threading
+import time
+from src.lazy import lazy_import
+
+requests = lazy_import('requests')
+
+# Upper bounds of the provider latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Monotonic deadline for provider calls made on behalf of the current request
+_deadline = contextvars.ContextVar('context_deadline', default=None)
+
+class ProviderError(Exception):
+    """A provider lookup failed, timed out or was refused by its circuit breaker"""
+
+class CircuitOpenError(ProviderError):
+    pass
+
+class BudgetExhaustedError(ProviderError):
+    pass
+
+class CircuitBreaker:
+    """Stops calling a provider after repeated failures
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are refused at once. After `reset_seconds` one trial call is let
+    through (half-open); its success closes the circuit, its failure opens
+    it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.opened = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+                self._trial = False
+            if self.state == 'half_open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opened += 1
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed bucket bounds, in seconds"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * (len(self.bounds) + 1)  # Last bucket is +Inf
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile; None when empty or past the last bound"""
+        with self._lock:
+            rank, seen = q * self.count, 0
+            for bound, count in zip(self.bounds, self._counts):
+                seen += count
+                if seen >= rank and self.count:
+                    return bound
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, seconds = self.count, self.sum
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds + ('+Inf',), counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'count': total, 'sum': round(seconds, 6),
+                'p50': self.quantile(0.5), 'p99': self.quantile(0.99)}
+
+def start_latency_budget(seconds):
+    """Bound the provider calls made from now on, in this context, to `seconds` in total"""
+    _deadline.set(time.monotonic() + seconds)
+
+def clear_latency_budget():
+    _deadline.set(None)
+
+@contextmanager
+def latency_budget(seconds):
+    """Bound the provider calls made inside the block to `seconds` in total"""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_budget():
+    """Seconds left in the current latency budget, or None when there is none"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one in-flight call
+
+    The first caller for a key runs the call; callers arriving while it is
+    in flight wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, call, timeout=None):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result(timeout)
+
+        try:
+            result = call()
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+class ProviderClient:
+    """Keep-alive JSON client for one external provider
+
+    One pooled requests.Session per provider, so repeated lookups reuse open
+    connections. `timeout` is a requests timeout (seconds, or a (connect,
+    read) pair), shortened to whatever is left of the caller's latency
+    budget; `params` are sent with every request, e.g. API keys. A circuit
+    breaker fails calls fast while the provider is down, and every call's
+    latency and failure kind are recorded.
+    """
+
+    def __init__(self, name, base_url, timeout=2.0, pool_size=10, params=None, breaker=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.params = params or {}
+        self.calls = 0
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyHistogram()
+        self.errors = {}  # Failure kind -> count
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    def get_json(self, path, **params):
+        """GET base_url/path; identical concurrent requests share one call"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        params = dict(self.params, **params)
+        remaining = remaining_budget()
+        try:
+            return self._flight.do((url, tuple(sorted(params.items()))), lambda: self._get(url, params),
+                                   timeout=None if remaining is None else max(remaining, 0))
+        except TimeoutError as error:
+            # Waited on another caller's request past this caller's budget
+            raise BudgetExhaustedError(f"{self.name} lookup exceeded the latency budget") from error
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self._flight.coalesced,
+            'circuit': self.breaker.state,
+            'circuit_opened': self.breaker.opened,
+            'errors': dict(self.errors),
+            'latency_seconds': self.latency.snapshot()
+        }
+
+    def close(self):
+        self.session.close()
+
+    # Helper methods
+    def _get(self, url, params):
+        timeout = self._timeout()
+        if timeout is None:
+            self._error('budget')
+            raise BudgetExhaustedError(f"{self.name} lookup skipped, the latency budget is spent")
+        if not self.breaker.allow():
+            self._error('circuit_open')
+            raise CircuitOpenError(f"{self.name} circuit is open after repeated failures")
+
+        with self._lock:
+            self.calls += 1
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except requests.Timeout as error:
+            raise self._failed('timeout', started, error) from error
+        except requests.ConnectionError as error:
+            raise self._failed('connection', started, error) from error
+        except requests.HTTPError as error:
+            raise self._failed('http', started, error) from error
+        except ValueError as error:
+            raise self._failed('invalid_response', started, error) from error
+        except requests.RequestException as error:
+            raise self._failed('request', started, error) from error
+        except Exception as error:
+            # Anything else still counts against the breaker, or a failed half-open trial would leave it stuck
+            raise self._failed('unexpected', started, error) from error
+        self.latency.observe(time.perf_counter() - started)
+        self.breaker.record_success()
+        return payload
+
+    def _timeout(self):
+        """Request timeout cut to the remaining budget; None when nothing is left"""
+        remaining = remaining_budget()
+        if remaining is None:
+            return self.timeout
+        if remaining <= 0:
+            return None
+        if isinstance(self.timeout, tuple):
+            return tuple(min(part, remaining) for part in self.timeout)
+        return min(self.timeout, remaining)
+
+    def _failed(self, kind, started, error):
+        self.latency.observe(time.perf_counter() - started)
+        self.breaker.record_failure()
+        self._error(kind)
+        return ProviderError(f"{self.name} lookup failed ({kind}): {error}")
+
+    def _error(self, kind):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+class HttpProvider:
+    """External context provider backed by HTTP gateways
+
+    Each source with a client is fetched from `<base_url>/<source>` with the
+    same arguments and payload shape as StubProvider; sources without a
+    client are answered by `fallback`.
+    """
+
+    def __init__(self, clients, fallback):
+        self.clients = clients
+        self.fallback = fallback
+
+    def weather(self, lat, lon):
+        return self._get('weather', lat=lat, lon=lon)
+
+    def forecast(self, lat, lon, days=5):
+        return self._get('forecast', lat=lat, lon=lon, days=days)
+
+    def traffic(self, origin_lat, origin_lon, dest_lat, dest_lon):
+        return self._get('traffic', origin_lat=origin_lat, origin_lon=origin_lon, dest_lat=dest_lat, dest_lon=dest_lon)
+
+    def crime(self, lat, lon, radius_km=5):
+        return self._get('crime', lat=lat, lon=lon, radius_km=radius_km)
+
+    def accidents(self, lat, lon, radius_km=2):
+        return self._get('accidents', lat=lat, lon=lon, radius_km=radius_km)
+
+    def road_conditions(self, lat, lon, radius_km=10):
+        return self._get('road_conditions', lat=lat, lon=lon, radius_km=radius_km)
+
+    def stats(self):
+        return {name: client.stats() for name, client in self.clients.items()}
+
+    # Helper methods
+    def _get(self, source, **params):
+        client = self.clients.get(source)
+        if client is None:
+            return getattr(self.fallback, source)(**params)
+        return client.get_json(source, **params)
+
+class FanOut:
+    """Runs independent lookups concurrently on a shared thread pool
+
+    Total latency follows the slowest lookup rather than the sum; lookups
+    still running after `timeout_seconds`, or after the caller's latency
+    budget, are reported as failed. Lookups run with the caller's budget.
+    """
+
+    def __init__(self, max_workers=16, timeout_seconds=2.5):
+        self.timeout_seconds = timeout_seconds
+        self._resize(max_workers)
+
+    def run(self, tasks):
+        """Run {name: callable}; returns (name -> result, name -> exception)"""
+        timeout = self.timeout_seconds
+        remaining = remaining_budget()
+        if remaining is not None:
+            timeout = max(min(timeout, remaining), 0)
+        futures = {name: self._executor.submit(contextvars.copy_context().run, task) for name, task in tasks.items()}
+        done, _ = wait(futures.values(), timeout=timeout)
+
+        results, errors = {}, {}
+        for name, future in futures.items():
+            if future not in done:
+                future.cancel()
+                errors[name] = TimeoutError(f"{name} lookup took longer than {timeout:.3f}s")
+            elif future.exception() is not None:
+                errors[name] = future.exception()
+            else:
+                results[name] = future.result()
+        return results, errors
+
+    # Helper methods
+    def _resize(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='context-fetch')
+
+context_fanout = FanOut()
@@ -0,0 +1,269 @@
+from datetime import datetime, timedelta
+import time
+
+class StubProvider:
+    """Offline provider returning canned external context data
+
+    Stands in for OpenWeatherMap, Google Maps and the crime, accident and
+    road databases until those are wired up. Payloads depend only on the
+    coordinates asked for, and an optional delay simulates a network round
+    trip so caching can be exercised locally.
+    """
+
+    def __init__(self, latency_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def weather(self, lat, lon):
+        self._call()
+        # In production:
+        # url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
+        return {
+            'location': {
+                'lat': lat,
+                'lon': lon,
+                'name': 'Current Location'
+            },
+            'current': {
+                'temperature': 22.5,
+                'feels_like': 24.1,
+                'humidity': 65,
+                'pressure': 1013,
+                'visibility': 10000,
+                'wind_speed': 3.2,
+                'wind_direction': 180,
+                'weather_main': 'Clear',
+                'weather_description': 'clear sky',
+                'weather_icon': '01d',
+                'clouds': 5,
+                'uv_index': 6.8
+            },
+            'conditions': {
+                'is_raining': False,
+                'is_snowing': False,
+                'is_foggy': False,
+                'visibility_km': 10,
+                'road_conditions': 'dry',
+                'driving_risk_level': 'low'
+            },
+            'timestamp': datetime.utcnow().isoformat(),
+            'source': 'OpenWeatherMap'
+        }
+
+    def forecast(self, lat, lon, days=5):
+        self._call()
+        forecast_data = {
+            'location': {
+                'lat': lat,
+                'lon': lon,
+                'name': 'Current Location'
+            },
+            'forecast': []
+        }
+
+        # Generate mock forecast for next few days
+        for i in range(days):
+            date = datetime.utcnow() + timedelta(days=i)
+            forecast_data['forecast'].append({
+                'date': date.strftime('%Y-%m-%d'),
+                'temperature_max': 25 + (i % 3),
+                'temperature_min': 15 + (i % 3),
+                'weather_main': ['Clear', 'Clouds', 'Rain'][i % 3],
+                'weather_description': ['clear sky', 'scattered clouds', 'light rain'][i % 3],
+                'precipitation_probability': [10, 30, 80][i % 3],
+                'wind_speed': 2.5 + (i * 0.5),
+                'driving_conditions': ['excellent', 'good', 'caution'][i % 3]
+            })
+
+        return forecast_data
+
+    def traffic(self, origin_lat, origin_lon, dest_lat, dest_lon):
+        self._call()
+        return {
+            'route': {
+                'origin': {'lat': origin_lat, 'lon': origin_lon},
+                'destination': {'lat': dest_lat, 'lon': dest_lon},
+                'distance_km': 15.2,
+                'duration_normal_minutes': 18,
+                'duration_current_minutes': 25
+            },
+            'traffic_conditions': {
+                'overall_level': 'moderate',
+                'congestion_level': 0.6,  # 0-1 scale
+                'incidents_count': 1,
+                'average_speed_kph': 35,
+                'expected_speed_kph': 50
+            },
+            'segments': [
+                {
+                    'segment_id': 1,
+                    'start_lat': origin_lat,
+                    'start_lon': origin_lon,
+                    'end_lat': origin_lat + 0.01,
+                    'end_lon': origin_lon + 0.01,
+                    'traffic_level': 'light',
+                    'speed_kph': 45,
+                    'duration_minutes': 8
+                },
+                {
+                    'segment_id': 2,
+                    'start_lat': origin_lat + 0.01,
+                    'start_lon': origin_lon + 0.01,
+                    'end_lat': dest_lat,
+                    'end_lon': dest_lon,
+                    'traffic_level': 'heavy',
+                    'speed_kph': 25,
+                    'duration_minutes': 17
+                }
+            ],
+            'incidents': [
+                {
+                    'type': 'construction',
+                    'severity': 'medium',
+                    'description': 'Lane closure due to road work',
+                    'lat': origin_lat + 0.005,
+                    'lon': origin_lon + 0.005,
+                    'estimated_delay_minutes': 7
+                }
+            ],
+            'timestamp': datetime.utcnow().isoformat(),
+            'source': 'Google Maps'
+        }
+
+    def crime(self, lat, lon, radius_km=5):
+        self._call()
+        return {
+            'location': {
+                'lat': lat,
+                'lon': lon,
+                'radius_km': radius_km
+            },
+            'crime_statistics': {
+                'total_incidents_last_year': 245,
+                'vehicle_theft_incidents': 12,
+                'vandalism_incidents': 8,
+                'break_ins': 15,
+                'crime_rate_per_1000': 8.5,
+                'safety_score': 7.2,  # 1-10 scale, 10 being safest
+                'risk_level': 'medium'
+            },
+            'recent_incidents': [
+                {
+                    'type': 'vehicle_theft',
+                    'date': '2025-09-08',
+                    'distance_km': 0.8,
+                    'severity': 'high'
+                },
+                {
+                    'type': 'vandalism',
+                    'date': '2025-09-05',
+                    'distance_km': 1.2,
+                    'severity': 'low'
+                }
+            ],
+            'area_classification': 'suburban_residential',
+            'timestamp': datetime.utcnow().isoformat(),
+            'source': 'Local Crime Database'
+        }
+
+    def accidents(self, lat, lon, radius_km=2):
+        self._call()
+        return {
+            'location': {
+                'lat': lat,
+                'lon': lon,
+                'radius_km': radius_km
+            },
+            'accident_statistics': {
+                'total_accidents_last_year': 18,
+                'fatal_accidents': 0,
+                'injury_accidents': 6,
+                'property_damage_only': 12,
+                'accidents_per_1000_vehicles': 2.3,
+                'risk_score': 6.8,  # 1-10 scale, 10 being highest risk
+                'primary_causes': [
+                    {'cause': 'rear_end_collision', 'count': 7},
+                    {'cause': 'intersection_accident', 'count': 5},
+                    {'cause': 'weather_related', 'count': 3},
+                    {'cause': 'speeding', 'count': 3}
+                ]
+            },
+            'hotspots': [
+                {
+                    'intersection': 'Main St & Oak Ave',
+                    'lat': lat + 0.002,
+                    'lon': lon + 0.001,
+                    'accident_count': 5,
+                    'severity_avg': 6.2
+                },
+                {
+                    'intersection': 'Highway 101 On-ramp',
+                    'lat': lat - 0.001,
+                    'lon': lon + 0.003,
+                    'accident_count': 3,
+                    'severity_avg': 7.8
+                }
+            ],
+            'time_patterns': {
+                'peak_hours': ['07:00-09:00', '17:00-19:00'],
+                'high_risk_days': ['Friday', 'Saturday'],
+                'weather_correlation': {
+                    'rain': 0.35,
+                    'fog': 0.28,
+                    'clear': 0.15
+                }
+            },
+            'timestamp': datetime.utcnow().isoformat(),
+            'source': 'Department of Transportation'
+        }
+
+    def road_conditions(self, lat, lon, radius_km=10):
+        self._call()
+        return {
+            'location': {
+                'lat': lat,
+                'lon': lon,
+                'radius_km': radius_km
+            },
+            'road_conditions': {
+                'overall_condition': 'good',
+                'surface_quality': 8.2,  # 1-10 scale
+                'maintenance_score': 7.5,
+                'lighting_quality': 'adequate',
+                'signage_quality': 'good'
+            },
+            'construction_zones': [
+                {
+                    'project_id': 'CONST-2025-001',
+                    'location': 'Highway 101, Mile 15-18',
+                    'lat': lat + 0.01,
+                    'lon': lon + 0.02,
+                    'type': 'lane_closure',
+                    'severity': 'medium',
+                    'expected_delay_minutes': 5,
+                    'start_date': '2025-09-01',
+                    'end_date': '2025-10-15',
+                    'active_hours': '06:00-18:00'
+                }
+            ],
+            'road_closures': [],
+            'special_conditions': [
+                {
+                    'type': 'school_zone',
+                    'location': 'Elementary School Area',
+                    'lat': lat - 0.005,
+                    'lon': lon - 0.003,
+                    'speed_limit': 25,
+                    'active_hours': '07:00-09:00, 14:00-16:00',
+                    'active_days': 'Monday-Friday'
+                }
+            ],
+            'timestamp': datetime.utcnow().isoformat(),
+            'source': 'Department of Transportation'
+        }
+
+    # Helper methods
+    def _call(self):
+        self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
@@ -0,0 +1,198 @@
+from src.services.context_clients import context_fanout
+from src.services.external_context import context_cache
+from src.services.spatial_index import cell_ids, incident_indexes
+from src.lazy import lazy_import
+import time
+
+np = lazy_import('numpy')
+
+# Contextual risk factors and their weight in the overall score
+FACTOR_WEIGHTS = {
+    'weather_risk': 0.3,
+    'time_risk': 0.2,
+    'location_risk': 0.3,
+    'traffic_risk': 0.2
+}
+
+WEATHER_RISK = {
+    'clear': 0.1,
+    'partly_cloudy': 0.2,
+    'cloudy': 0.3,
+    'light_rain': 0.6,
+    'heavy_rain': 0.8,
+    'snow': 0.9,
+    'fog': 0.7,
+    'ice': 0.95
+}
+DEFAULT_WEATHER_RISK = 0.3
+
+# Provider weather_main -> WEATHER_RISK condition
+WEATHER_CONDITIONS = {
+    'Clear': 'clear',
+    'Clouds': 'cloudy',
+    'Drizzle': 'light_rain',
+    'Thunderstorm': 'heavy_rain',
+    'Snow': 'snow',
+    'Mist': 'fog',
+    'Fog': 'fog',
+    'Haze': 'fog'
+}
+
+# Location risk blends incident density around a point, accidents weighing more
+LOCATION_RISK_WEIGHTS = {'accidents': 0.6, 'crime': 0.4}
+
+# Points this recent get live weather and congestion from the providers,
+# looked up once per grid cell of this size, for at most this many cells
+LIVE_CONTEXT_SECONDS = 3600
+LIVE_CONTEXT_CELL_DEGREES = {'weather': 0.05, 'traffic': 0.01}
+LIVE_CONTEXT_MAX_CELLS = 64
+
+HIGH_RISK_SCORE = 0.6
+
+def score_points(lat, lon, timestamps, weather_conditions=None, utc_offset_minutes=0, now=None):
+    """Contextual risk factors and overall score for every point of a trace
+
+    lat, lon and timestamps (epoch seconds, UTC) are equal-length arrays.
+    Time and location risk are computed for all points at once; points from
+    the last LIVE_CONTEXT_SECONDS also get live weather (unless
+    weather_conditions is given) and congestion, fetched once per grid cell.
+    Returns a dict of factor name -> array, plus 'contextual_risk_score'.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    hours, weekdays = hour_and_weekday(timestamps, utc_offset_minutes)
+
+    weather = np.full(len(lat), weather_risk(weather_conditions))
+    congestion = np.full(len(lat), np.nan)
+    live = timestamps >= (time.time() if now is None else now) - LIVE_CONTEXT_SECONDS
+    if live.any():
+        _apply_live_context(lat, lon, live, weather if weather_conditions is None else None, congestion)
+
+    scores = {
+        'weather_risk': weather,
+        'time_risk': time_risk(hours, weekdays),
+        'location_risk': location_risk(lat, lon),
+        'traffic_risk': traffic_risk(hours, congestion)
+    }
+    scores['contextual_risk_score'] = sum(scores[factor] * weight for factor, weight in FACTOR_WEIGHTS.items())
+    return scores
+
+def summarize(scores, timestamps):
+    """Time-weighted trip summary of score_points() output
+
+    Each point stands for half the interval to each neighbour, so dense
+    bursts of samples don't outweigh long stretches of sparse ones.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    gaps = np.maximum(np.diff(timestamps), 0)
+    weights = np.zeros(len(timestamps))
+    weights[:-1] += gaps / 2
+    weights[1:] += gaps / 2
+    duration = float(gaps.sum())
+    if not duration:
+        weights = np.ones(len(timestamps))
+
+    overall = np.round(scores['contextual_risk_score'], 3)  # As reported per point
+    summary = {name: round(float(np.average(values, weights=weights)), 3) for name, values in scores.items()}
+    summary.update({
+        'risk_level': risk_level(summary['contextual_risk_score']),
+        'max_contextual_risk_score': round(float(overall.max()), 3),
+        'high_risk_seconds': round(float(weights[overall > HIGH_RISK_SCORE].sum()), 1) if duration else 0.0,
+        'duration_seconds': round(duration, 1),
+        'points': int(len(timestamps))
+    })
+    return summary
+
+def score_trace(lat, lon, timestamps, **options):
+    """Per-point scores (columnar, rounded) and the time-weighted summary of a trace"""
+    scores = score_points(lat, lon, timestamps, **options)
+    points = {name: np.round(values, 3).tolist() for name, values in scores.items()}
+    points['risk_level'] = [risk_level(score) for score in points['contextual_risk_score']]
+    return {'points': points, 'summary': summarize(scores, timestamps)}
+
+def hour_and_weekday(timestamps, utc_offset_minutes=0):
+    """Local hour (0-23) and weekday (Monday is 0) of epoch-second timestamps"""
+    local = np.floor(np.asarray(timestamps, dtype=np.float64) + utc_offset_minutes * 60).astype(np.int64)
+    # 1970-01-01 was a Thursday
+    return local // 3600 % 24, (local // 86400 + 3) % 7
+
+def weather_risk(weather_conditions):
+    """Risk of one weather condition; unknown or missing conditions get the default"""
+    return WEATHER_RISK.get((weather_conditions or '').lower(), DEFAULT_WEATHER_RISK)
+
+def time_risk(hours, weekdays):
+    """Risk by hour and weekday; higher at night, in rush hours and on Fridays and Saturdays"""
+    # Base risk, plus night hours or rush hours
+    risk = np.where((hours >= 22) | (hours <= 6), 0.3 + 0.4, np.where(_rush_hour(hours), 0.3 + 0.2, 0.3))
+    risk = np.where((weekdays == 4) | (weekdays == 5), risk + 0.2, risk)
+    return np.minimum(risk, 1.0)
+
+def traffic_risk(hours, congestion=None):
+    """Risk by hour, averaged with live congestion (0-1) where it is known (not NaN)"""
+    time_based = np.where(_rush_hour(hours), 0.6, np.where((hours >= 10) & (hours <= 16), 0.3, 0.2))
+    if congestion is None:
+        return time_based
+    return np.where(np.isnan(congestion), time_based, np.round((time_based + congestion) / 2, 3))
+
+def location_risk(lat, lon):
+    """Risk from incident density around each point, from the loaded incident indexes"""
+    lat = np.asarray(lat, dtype=np.float64)
+    weighted = [(incident_indexes[dataset].area_risk(lat, lon), weight)
+                for dataset, weight in LOCATION_RISK_WEIGHTS.items() if dataset in incident_indexes]
+    if weighted:
+        density = sum(risk * weight for risk, weight in weighted) / sum(weight for _, weight in weighted)
+        return np.round(0.1 + 0.8 * density, 3)
+
+    # Mock estimate until incident indexes are built: higher latitudes stand in for urban areas
+    return np.where(np.abs(lat) > 40, 0.3 + 0.2, 0.3)
+
+def weather_condition(weather_data):
+    """Map a weather provider payload onto a WEATHER_RISK condition"""
+    if not weather_data:
+        return 'clear'
+    main = weather_data['current']['weather_main']
+    description = weather_data['current']['weather_description']
+    if main == 'Rain':
+        return 'heavy_rain' if 'heavy' in description else 'light_rain'
+    return WEATHER_CONDITIONS.get(main, 'clear')
+
+def risk_level(risk_score):
+    """Convert risk score to categorical level"""
+    if risk_score <= 0.3:
+        return 'low'
+    elif risk_score <= HIGH_RISK_SCORE:
+        return 'medium'
+    else:
+        return 'high'
+
+# Helper functions
+def _rush_hour(hours):
+    return ((hours >= 7) & (hours <= 9)) | ((hours >= 17) & (hours <= 19))
+
+def _apply_live_context(lat, lon, live, weather, congestion):
+    """Fill live weather risk (when weather is given) and congestion in place, one lookup per cell"""
+    points = np.flatnonzero(live)
+    tasks, members = {}, {}
+    for source, cell_degrees in LIVE_CONTEXT_CELL_DEGREES.items():
+        if source == 'weather' and weather is None:
+            continue
+        _, first, inverse = np.unique(cell_ids(lat[points], lon[points], cell_degrees),
+                                      return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        # Past the cell cap, the cells with the most points win
+        for cell in np.argsort(-np.bincount(inverse), kind='stable')[:LIVE_CONTEXT_MAX_CELLS]:
+            point = (float(lat[points[first[cell]]]), float(lon[points[first[cell]]]))
+            if source == 'weather':
+                tasks[(source, cell)] = lambda point=point: context_cache.lookup('weather', [point])
+            else:
+                tasks[(source, cell)] = lambda point=point: context_cache.lookup('traffic', [point, point])
+            members[(source, cell)] = points[inverse == cell]
+
+    # Failed lookups leave the local estimates in place
+    results, _ = context_fanout.run(tasks)
+    for (source, cell), payload in results.items():
+        if source == 'weather':
+            weather[members[(source, cell)]] = weather_risk(weather_condition(payload))
+        else:
+            congestion[members[(source, cell)]] = payload['traffic_conditions']['congestion_level']
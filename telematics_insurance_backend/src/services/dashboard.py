@@ -0,0 +1,127 @@
+from src.models.telematics import Policyholder, Trip, RiskScoreHistory, db
+from src.models.serializers import trip_serializer, dumps
+from src.models.signals import policyholder_changed, trip_recorded, risk_score_recorded
+from src.services.pricing import calculate_premium_adjustment
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.services.ttl_cache import TTLCache
+from collections import namedtuple
+from datetime import datetime
+import hashlib
+
+# Trip columns shown on the dashboard; route_geometry is deliberately left out
+DASHBOARD_TRIP_FIELDS = tuple(name for name in trip_serializer.field_names if name != 'route_geometry')
+
+RECENT_TRIPS_LIMIT = 10
+RISK_HISTORY_LIMIT = 12
+
+DashboardEntry = namedtuple('DashboardEntry', ['body', 'etag', 'last_modified', 'version'])
+
+class DashboardCache(TTLCache):
+    """Per-policyholder LRU cache of serialized dashboard payloads
+
+    Each entry keeps the policyholder's `updated_at` it was built from, which
+    every write to the policyholder, their trips or their risk history bumps.
+    An entry is only served while that version is still current in the
+    database, so a write made by any server process is seen at once.
+    """
+
+    def put(self, policyholder_id, body, last_modified, version):
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        return super().put(policyholder_id, DashboardEntry(body, etag, last_modified, version))
+
+dashboard_cache = DashboardCache()
+
+def configure_dashboard_cache(app):
+    """Apply DASHBOARD_CACHE_* settings from the app config"""
+    dashboard_cache.max_entries = app.config.get('DASHBOARD_CACHE_MAX_ENTRIES', dashboard_cache.max_entries)
+    # Entries are checked against the database on every read; the TTL only frees memory
+    dashboard_cache.ttl_seconds = app.config.get('DASHBOARD_CACHE_TTL_SECONDS', dashboard_cache.ttl_seconds)
+
+def get_dashboard_entry(policyholder_id):
+    """Return the dashboard for a policyholder, from the cache while it is current, building it otherwise"""
+    entry = dashboard_cache.get(policyholder_id)
+    if entry is not None:
+        # One primary-key read tells whether anything changed since the entry was built
+        version = db.session.execute(
+            db.select(Policyholder.updated_at).where(Policyholder.id == policyholder_id)
+        ).scalar_one_or_none()
+        if version is not None and version == entry.version:
+            return entry
+        dashboard_cache.invalidate(policyholder_id)
+
+    payload, last_modified, version = build_dashboard(policyholder_id)
+    if payload is None:
+        return None
+
+    return dashboard_cache.put(policyholder_id, dumps(payload), last_modified, version)
+
+def build_dashboard(policyholder_id):
+    """Build the dashboard read model; returns (payload, last_modified, version) or (None, None, None)"""
+    # Policyholder row plus trip aggregates in a single statement
+    trip_count = db.select(db.func.count(Trip.id)).where(Trip.policyholder_id == policyholder_id).scalar_subquery()
+    trip_distance = db.select(db.func.coalesce(db.func.sum(Trip.distance_km), 0)).where(Trip.policyholder_id == policyholder_id).scalar_subquery()
+    last_trip_at = db.select(db.func.max(Trip.created_at)).where(Trip.policyholder_id == policyholder_id).scalar_subquery()
+
+    row = db.session.execute(
+        db.select(Policyholder, trip_count, trip_distance, last_trip_at).where(Policyholder.id == policyholder_id)
+    ).first()
+    if row is None:
+        return None, None, None
+    policyholder, total_trips, total_distance, last_trip_at = row
+
+    # Recent trips without the route geometry column
+    trip_rows = db.session.execute(
+        db.select(*trip_serializer.columns(DASHBOARD_TRIP_FIELDS))
+        .where(Trip.policyholder_id == policyholder_id)
+        .order_by(Trip.start_timestamp.desc())
+        .limit(RECENT_TRIPS_LIMIT)
+    ).all()
+
+    risk_history = RiskScoreHistory.query.filter_by(policyholder_id=policyholder_id).order_by(
+        RiskScoreHistory.score_date.desc()
+    ).limit(RISK_HISTORY_LIMIT).all()
+
+    last_modified = max(
+        [ts for ts in (policyholder.updated_at, policyholder.last_score_update, last_trip_at) if ts] +
+        [record.created_at for record in risk_history if record.created_at] or [datetime.utcnow()]
+    )
+
+    payload = {
+        'policyholder': policyholder.to_dict(),
+        'recent_trips': trip_serializer.serialize_rows(trip_rows, DASHBOARD_TRIP_FIELDS),
+        'risk_history': [record.to_dict() for record in risk_history],
+        'summary': {
+            'total_trips': total_trips,
+            'total_distance_km': total_distance,
+            'current_risk_score': policyholder.risk_score_current,
+            'premium_adjustment': calculate_premium_adjustment(policyholder.risk_score_current)
+        }
+    }
+
+    return payload, last_modified.replace(microsecond=0), policyholder.updated_at
+
+@event.listens_for(Session, 'after_flush')
+def touch_changed_dashboards(session, flush_context):
+    """Bump updated_at of policyholders whose trips or risk history this flush wrote, invalidating their dashboards"""
+    touched = {obj.policyholder_id for collection in (session.new, session.deleted) for obj in collection
+               if isinstance(obj, (Trip, RiskScoreHistory))}
+    # Policyholders written in this flush already got a new updated_at
+    touched -= {obj.id for collection in (session.new, session.dirty) for obj in collection
+                if isinstance(obj, Policyholder) and (obj in session.new or session.is_modified(obj))}
+    if touched:
+        session.execute(db.update(Policyholder).where(Policyholder.id.in_(touched)).values(updated_at=datetime.utcnow())
+                        .execution_options(synchronize_session=False))
+
+# Cache invalidation on committed writes
+@policyholder_changed.connect
+def _invalidate_on_policyholder_change(policyholder_id, **kwargs):
+    dashboard_cache.invalidate(policyholder_id)
+
+@trip_recorded.connect
+def _invalidate_on_trip(policyholder_id, **kwargs):
+    dashboard_cache.invalidate(policyholder_id)
+
+@risk_score_recorded.connect
+def _invalidate_on_risk_score(policyholder_id, **kwargs):
+    dashboard_cache.invalidate(policyholder_id)
@@ -0,0 +1,170 @@
+from src.models.telematics import Trip, RawTelematicsData, RiskScoreHistory, db
+from src.models.serializers import trip_serializer, raw_data_serializer, risk_history_serializer, dumps
+from src.models.pagination import encode_cursor, decode_cursor
+from sqlalchemy import tuple_
+from datetime import date, datetime, timezone
+import csv
+import io
+
+# dataset name -> (model, serializer, time column used for ranges and ordering)
+EXPORT_DATASETS = {
+    'trips': (Trip, trip_serializer, Trip.start_timestamp),
+    'raw-data': (RawTelematicsData, raw_data_serializer, RawTelematicsData.timestamp),
+    'risk-history': (RiskScoreHistory, risk_history_serializer, RiskScoreHistory.score_date)
+}
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+DEFAULT_CHUNK_SIZE = 5000
+
+class ExportJob:
+    """A resumable, streamed export of one dataset over a time range
+
+    Rows are read through a server-side cursor in (time, id) order, one
+    chunk at a time, so memory stays constant whatever the range. After each
+    chunk `cursor` holds an opaque position that resumes right after it.
+    """
+
+    def __init__(self, dataset, start=None, end=None, cursor=None, fields=None,
+                 policyholder_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        if dataset not in EXPORT_DATASETS:
+            raise ValueError(f"Unknown export dataset: {dataset}")
+
+        self.dataset = dataset
+        self.model, self.serializer, self.time_column = EXPORT_DATASETS[dataset]
+        self.keys = (self.time_column, self.model.id)
+        self.fields = tuple(fields) if fields else self.serializer.field_names
+        # Date-typed keys (risk history) compare against dates, not datetimes
+        if self.time_column.type.python_type is date:
+            start = start.date() if isinstance(start, datetime) else start
+            end = end.date() if isinstance(end, datetime) else end
+        self.start = start
+        self.end = end
+        self.policyholder_id = policyholder_id
+        self.chunk_size = chunk_size
+        self.cursor = cursor
+        self.rows_exported = 0
+
+    def query(self):
+        """Column-only select for the requested range, positioned after the cursor"""
+        query = db.select(*self.serializer.columns(self.fields), *self.keys)
+
+        if self.start is not None:
+            query = query.where(self.time_column >= self.start)
+        if self.end is not None:
+            query = query.where(self.time_column < self.end)
+        if self.policyholder_id:
+            query = query.where(self.model.policyholder_id == self.policyholder_id)
+        if self.cursor:
+            query = query.where(tuple_(*self.keys) > tuple_(*decode_cursor(self.cursor, self.keys)))
+
+        return query.order_by(*self.keys)
+
+    def chunks(self):
+        """Yield lists of row tuples (fields only), advancing the cursor after each"""
+        # Core execution on the session's connection skips ORM row processing
+        connection = db.session.connection()
+        result = connection.execution_options(stream_results=True, yield_per=self.chunk_size).execute(self.query())
+        width = len(self.fields)
+
+        try:
+            for partition in result.partitions():
+                self.cursor = encode_cursor(partition[-1][width:])
+                self.rows_exported += len(partition)
+                yield [row[:width] for row in partition]
+        finally:
+            result.close()
+
+    def iter_csv(self, header=True):
+        """Yield the export as CSV, one encoded chunk at a time"""
+        temporal = [i for i, column in enumerate(self.serializer.columns(self.fields)) if _is_temporal(column)]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if header:
+            writer.writerow(self.fields)
+
+        for rows in self.chunks():
+            if temporal:
+                rows = [_isoformat_columns(row, temporal) for row in rows]
+            writer.writerows(rows)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+        if header and not self.rows_exported:
+            yield buffer.getvalue().encode('utf-8')
+
+    def iter_ndjson(self, checkpoints=False):
+        """Yield the export as newline-delimited JSON, optionally with cursor checkpoints"""
+        names = self.fields
+        for rows in self.chunks():
+            lines = [dumps(dict(zip(names, row))) for row in rows]
+            if checkpoints:
+                lines.append(dumps({'_checkpoint': self.cursor}))
+            lines.append(b'')
+            yield b'\n'.join(lines)
+
+    def iter_format(self, export_format, checkpoints=False):
+        """Dispatch to the CSV or NDJSON encoder"""
+        if export_format == 'csv':
+            return self.iter_csv(header=not self.cursor)
+        if export_format == 'ndjson':
+            return self.iter_ndjson(checkpoints)
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    def write_columnar(self, path):
+        """Write the export to a local Parquet file, one row group per chunk"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError('Columnar export needs the optional pyarrow package (pip install pyarrow)')
+
+        schema = pa.schema([
+            (name, _arrow_type(pa, column)) for name, column in zip(self.fields, self.serializer.columns(self.fields))
+        ])
+        with pq.ParquetWriter(path, schema) as writer:
+            for rows in self.chunks():
+                columns = list(zip(*rows))
+                writer.write_table(pa.table(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema
+                ))
+
+def parse_export_time(value):
+    """Parse an ISO date or datetime range bound"""
+    if not value:
+        return None
+
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # Stored timestamps are naive UTC
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+# Helper functions
+def _isoformat_columns(row, indexes):
+    row = list(row)
+    for i in indexes:
+        if row[i] is not None:
+            row[i] = row[i].isoformat()
+    return row
+
+def _is_temporal(column):
+    try:
+        return column.type.python_type in (datetime, date)
+    except NotImplementedError:
+        return False
+
+def _arrow_type(pa, column):
+    """Arrow type for a SQL column"""
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return pa.timestamp('us')
+    if python_type is date:
+        return pa.date32()
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    return pa.string()
@@ -0,0 +1,245 @@
+from src.models.serializers import dumps
+from src.services.context_providers import StubProvider
+from src.services.context_clients import CircuitBreaker, HttpProvider, ProviderClient, context_fanout
+from collections import OrderedDict, namedtuple
+import threading
+import time
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+class ContextSource:
+    """How one kind of external context is fetched and cached
+
+    Coordinates are quantized to geohash cells of `precision` characters and
+    the provider is asked about each cell's center, so nearby lookups share
+    one entry. Entries belong to a `bucket_seconds` time bucket and are fresh
+    for `ttl_seconds`; for `stale_seconds` after that (or after the bucket
+    rolls over) they are still served while a background refresh runs.
+    """
+
+    def __init__(self, name, fetch, precision, bucket_seconds, ttl_seconds, stale_seconds):
+        self.name = name
+        self.fetch = fetch  # Provider method name
+        self.precision = precision
+        self.bucket_seconds = bucket_seconds
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+
+# Cell sizes: precision 4 ~ 39km, 5 ~ 4.9km, 6 ~ 1.2km
+CONTEXT_SOURCES = {source.name: source for source in (
+    ContextSource('weather', 'weather', precision=5, bucket_seconds=600, ttl_seconds=600, stale_seconds=300),
+    ContextSource('forecast', 'forecast', precision=4, bucket_seconds=3600, ttl_seconds=3600, stale_seconds=1800),
+    ContextSource('traffic', 'traffic', precision=6, bucket_seconds=60, ttl_seconds=120, stale_seconds=60),
+    ContextSource('crime', 'crime', precision=6, bucket_seconds=86400, ttl_seconds=86400, stale_seconds=3600),
+    ContextSource('accidents', 'accidents', precision=6, bucket_seconds=86400, ttl_seconds=86400, stale_seconds=3600),
+    ContextSource('road_conditions', 'road_conditions', precision=6, bucket_seconds=900, ttl_seconds=900, stale_seconds=300)
+)}
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'expires_at', 'size'])
+
+class ContextCache:
+    """LRU cache of external context lookups, bounded by encoded payload size
+
+    Keys are (source, geohash cells, parameters, time bucket). A miss fetches
+    from the provider inline; an expired entry, or the previous bucket's
+    entry, is served while one background refresh per key replaces it.
+    When an inline fetch fails, any entry left for the key is served instead.
+    Hit, stale hit and miss counts are kept per source.
+    """
+
+    def __init__(self, provider=None, sources=None, max_bytes=32 * 1024 * 1024):
+        self.provider = provider or StubProvider()
+        self.sources = dict(sources or CONTEXT_SOURCES)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (key, bucket) -> CacheEntry
+        self._bytes = 0
+        self._refreshing = set()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, name, points, **params):
+        """Context from source `name` for the cells holding `points`, a list of (lat, lon)"""
+        source = self.sources[name]
+        now = time.time()
+        cells = tuple(geohash_encode(lat, lon, source.precision) for lat, lon in points)
+        key = (name, cells, tuple(sorted(params.items())))
+        bucket = int(now // source.bucket_seconds)
+
+        with self._lock:
+            entry = self._entries.get((key, bucket))
+            if entry is not None and now < entry.expires_at:
+                self._entries.move_to_end((key, bucket))
+                self._count(name, 'hits')
+                return entry.value
+
+            # Last bucket's entry stands in while this bucket's is fetched
+            entry = entry or self._entries.get((key, bucket - 1))
+            if entry is not None and now < entry.expires_at + source.stale_seconds:
+                self._count(name, 'stale_hits')
+                refresh = (key, bucket) not in self._refreshing
+                if refresh:
+                    self._refreshing.add((key, bucket))
+            else:
+                entry = None
+                self._count(name, 'misses')
+
+        if entry is None:
+            try:
+                return self._fetch(source, key, bucket, cells, params)
+            except Exception:
+                # A provider failure serves whatever is still cached for the key, however old
+                with self._lock:
+                    entry = self._entries.get((key, bucket)) or self._entries.get((key, bucket - 1))
+                    self._count(name, 'fallbacks' if entry else 'errors')
+                if entry is None:
+                    raise
+                return entry.value
+        if refresh:
+            threading.Thread(
+                target=self._refresh, args=(source, key, bucket, cells, params), name='context-refresh', daemon=True
+            ).start()
+        return entry.value
+
+    def stats(self):
+        with self._lock:
+            sources = {}
+            for name, counts in self._counts.items():
+                lookups = counts['hits'] + counts['stale_hits'] + counts['misses']
+                sources[name] = dict(
+                    counts, hit_rate=round((counts['hits'] + counts['stale_hits']) / lookups, 4) if lookups else None
+                )
+            stats = {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'sources': sources
+            }
+        if hasattr(self.provider, 'stats'):
+            stats['provider'] = self.provider.stats()
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._counts.clear()
+
+    # Helper methods
+    def _fetch(self, source, key, bucket, cells, params):
+        centers = [coordinate for cell in cells for coordinate in geohash_decode(cell)]
+        value = getattr(self.provider, source.fetch)(*centers, **params)
+        self._store((key, bucket), CacheEntry(value, time.time() + source.ttl_seconds, len(dumps(value))))
+        return value
+
+    def _refresh(self, source, key, bucket, cells, params):
+        try:
+            self._fetch(source, key, bucket, cells, params)
+            outcome = 'refreshes'
+        except Exception:
+            # Keep serving the stale entry until its stale window runs out
+            outcome = 'refresh_errors'
+        with self._lock:
+            self._count(source.name, outcome)
+            self._refreshing.discard((key, bucket))
+
+    def _store(self, cache_key, entry):
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            stale = (cache_key[0], cache_key[1] - 1)
+            if stale in self._entries:
+                # Superseded by this bucket's entry
+                self._bytes -= self._entries.pop(stale).size
+
+            self._entries[cache_key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                (evicted_key, _), evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._count(evicted_key[0], 'evictions')
+
+    def _count(self, name, counter):
+        # Called with the lock held
+        counts = self._counts.get(name)
+        if counts is None:
+            counts = self._counts[name] = dict.fromkeys(
+                ('hits', 'stale_hits', 'misses', 'fallbacks', 'errors', 'refreshes', 'refresh_errors', 'evictions'), 0
+            )
+        counts[counter] += 1
+
+context_cache = ContextCache()
+
+def configure_context_cache(app):
+    """Apply EXTERNAL_CONTEXT_* settings from the app config
+
+    Per-source overrides are dicts keyed by source name, e.g.
+    EXTERNAL_CONTEXT_TTL_SECONDS = {'traffic': 60}.
+    """
+    context_cache.max_bytes = app.config.get('EXTERNAL_CONTEXT_CACHE_MAX_BYTES', context_cache.max_bytes)
+    for setting, attribute in (('EXTERNAL_CONTEXT_PRECISION', 'precision'),
+                               ('EXTERNAL_CONTEXT_BUCKET_SECONDS', 'bucket_seconds'),
+                               ('EXTERNAL_CONTEXT_TTL_SECONDS', 'ttl_seconds'),
+                               ('EXTERNAL_CONTEXT_STALE_SECONDS', 'stale_seconds')):
+        for name, value in app.config.get(setting, {}).items():
+            setattr(context_cache.sources[name], attribute, value)
+
+    stub = context_cache.provider if isinstance(context_cache.provider, StubProvider) else StubProvider()
+    if 'EXTERNAL_CONTEXT_STUB_LATENCY_SECONDS' in app.config:
+        stub.latency_seconds = app.config['EXTERNAL_CONTEXT_STUB_LATENCY_SECONDS']
+
+    # Sources with a gateway URL are fetched over HTTP; the rest stay on the stub
+    urls = app.config.get('EXTERNAL_CONTEXT_URLS', {})
+    timeouts = app.config.get('EXTERNAL_CONTEXT_TIMEOUTS', {})
+    params = app.config.get('EXTERNAL_CONTEXT_PARAMS', {})
+    pool_size = app.config.get('EXTERNAL_CONTEXT_POOL_SIZE', 10)
+    failures = app.config.get('EXTERNAL_CONTEXT_BREAKER_FAILURES', 5)
+    reset_seconds = app.config.get('EXTERNAL_CONTEXT_BREAKER_RESET_SECONDS', 30.0)
+    clients = {
+        name: ProviderClient(name, url, timeout=timeouts.get(name, 2.0), pool_size=pool_size, params=params.get(name),
+                             breaker=CircuitBreaker(failures, reset_seconds))
+        for name, url in urls.items()
+    }
+    context_cache.provider = HttpProvider(clients, fallback=stub) if clients else stub
+
+    context_fanout.timeout_seconds = app.config.get('EXTERNAL_CONTEXT_FANOUT_TIMEOUT_SECONDS', context_fanout.timeout_seconds)
+    if 'EXTERNAL_CONTEXT_FANOUT_WORKERS' in app.config:
+        context_fanout._resize(app.config['EXTERNAL_CONTEXT_FANOUT_WORKERS'])
+
+def geohash_encode(lat, lon, precision):
+    """Geohash of a point with `precision` characters"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+def geohash_decode(cell):
+    """(lat, lon) of a geohash cell's center"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
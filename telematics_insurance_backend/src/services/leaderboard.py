@@ -0,0 +1,148 @@
+from src.models.telematics import Policyholder, PointsBalance, db
+from src.models.signals import policyholder_changed, points_posted
+from src.services.pricing import calculate_premium_adjustment
+from bisect import bisect_left, insort
+import threading
+import time
+
+# Policyholder columns the leaderboard entries are built from
+LEADERBOARD_COLUMNS = ('id', 'first_name', 'last_name', 'vehicle_make', 'vehicle_model', 'risk_score_current')
+
+# A change to any of these can move a driver or alter their entry
+LEADERBOARD_FIELDS = frozenset(LEADERBOARD_COLUMNS)
+
+class MaterializedLeaderboard:
+    """Top drivers by risk score, with points balances and display fields precomputed
+
+    Holds the best `depth` drivers in (risk_score, id) order, loaded with one
+    indexed query. Committed score or aggregate changes are queued and patched
+    in place on the next read with one primary-key query; pages inside the
+    materialized depth are served from memory.
+    """
+
+    def __init__(self, depth=1000, refresh_seconds=300):
+        self.depth = depth
+        self.refresh_seconds = refresh_seconds
+        self._keys = []  # Sorted (risk_score, policyholder_id)
+        self._entries = {}  # policyholder_id -> (sort key, entry without rank)
+        self._complete = False  # True when the whole book fits within depth
+        self._needs_refill = True
+        self._pending = {}  # policyholder_id -> deleted, changes committed since the last read
+        self._loaded_at = 0.0
+        self._lock = threading.RLock()
+
+    def page(self, limit, offset=0):
+        """Return leaderboard rows for ranks offset+1 .. offset+limit"""
+        with self._lock:
+            if self._needs_refill or time.monotonic() - self._loaded_at > self.refresh_seconds:
+                self._reload()
+            elif self._pending:
+                self._apply_pending()
+
+            if offset + limit <= len(self._keys) or self._complete:
+                keys = self._keys[offset:offset + limit]
+                return [dict(self._entries[key[1]][1], rank=offset + i + 1) for i, key in enumerate(keys)]
+
+        # Deeper than the materialized window: one indexed read
+        rows = _leaderboard_query().offset(offset).limit(limit)
+        return [dict(build_entry(row), rank=offset + i + 1) for i, row in enumerate(db.session.execute(rows))]
+
+    def apply_change(self, policyholder_id, deleted=False):
+        """Queue a committed change to one policyholder; applied on the next read"""
+        with self._lock:
+            if not self._needs_refill:
+                self._pending[policyholder_id] = deleted
+
+    def invalidate(self):
+        with self._lock:
+            self._needs_refill = True
+            self._pending.clear()
+
+    # Helper methods
+    def _apply_pending(self):
+        # One primary-key read covers every driver changed since the last page
+        pending, self._pending = self._pending, {}
+        for policyholder_id in pending:
+            self._remove(policyholder_id)
+
+        changed = [policyholder_id for policyholder_id, deleted in pending.items() if not deleted]
+        rows = db.session.execute(_leaderboard_query().where(Policyholder.id.in_(changed))).all() if changed else []
+        if len(rows) < len(pending):
+            self._mark_short()
+
+        for row in rows:
+            key = (_score(row.risk_score_current), row.id)
+            # Only keep drivers who rank inside the materialized window. Unless the whole
+            # book is loaded, the window holds exactly the drivers up to its tail: one
+            # that falls past the tail may be behind drivers that were never loaded.
+            if self._complete or (self._keys and key < self._keys[-1]):
+                insort(self._keys, key)
+                self._entries[row.id] = (key, build_entry(row))
+                if len(self._keys) > self.depth:
+                    evicted = self._keys.pop()
+                    del self._entries[evicted[1]]
+                    self._complete = False
+            else:
+                self._mark_short()
+
+    def _remove(self, policyholder_id):
+        existing = self._entries.pop(policyholder_id, None)
+        if existing is not None:
+            index = bisect_left(self._keys, existing[0])
+            if index < len(self._keys) and self._keys[index] == existing[0]:
+                del self._keys[index]
+
+    def _mark_short(self):
+        # A driver left the window; refill lazily if the book has more drivers
+        if not self._complete and len(self._keys) < self.depth:
+            self._needs_refill = True
+
+    def _reload(self):
+        rows = db.session.execute(_leaderboard_query().limit(self.depth + 1)).all()
+        self._complete = len(rows) <= self.depth
+        rows = rows[:self.depth]
+
+        self._keys = [(_score(row.risk_score_current), row.id) for row in rows]
+        self._entries = {key[1]: (key, build_entry(row)) for key, row in zip(self._keys, rows)}
+        self._needs_refill = False
+        self._pending = {}
+        self._loaded_at = time.monotonic()
+
+def build_entry(row):
+    """Precompute a leaderboard entry (everything except rank)"""
+    return {
+        'name': f"{row.first_name} {row.last_name[0]}.",  # Privacy-friendly
+        'risk_score': row.risk_score_current,
+        'total_points': row.total_points or 0,
+        'vehicle': f"{row.vehicle_make} {row.vehicle_model}",
+        'premium_savings': abs(calculate_premium_adjustment(row.risk_score_current))
+    }
+
+leaderboard = MaterializedLeaderboard()
+
+def configure_leaderboard(app):
+    """Apply LEADERBOARD_* settings from the app config"""
+    leaderboard.depth = app.config.get('LEADERBOARD_DEPTH', leaderboard.depth)
+    # Other workers' writes only show up after this interval
+    leaderboard.refresh_seconds = app.config.get('LEADERBOARD_REFRESH_SECONDS', leaderboard.refresh_seconds)
+
+# Helper functions
+def _leaderboard_query():
+    # Served by ix_policyholders_risk_score_current_id
+    columns = [getattr(Policyholder, name) for name in LEADERBOARD_COLUMNS]
+    return db.select(*columns, PointsBalance.balance.label('total_points')).outerjoin(
+        PointsBalance, PointsBalance.policyholder_id == Policyholder.id
+    ).order_by(Policyholder.risk_score_current.asc().nulls_first(), Policyholder.id.asc())
+
+def _score(risk_score):
+    # Matches the NULLS FIRST ordering of the query
+    return -1.0 if risk_score is None else risk_score
+
+@policyholder_changed.connect
+def _update_on_policyholder_change(policyholder_id, fields=frozenset(), deleted=False, **kwargs):
+    if deleted or fields & LEADERBOARD_FIELDS:
+        leaderboard.apply_change(policyholder_id, deleted=deleted)
+
+@points_posted.connect
+def _update_on_points_posted(policyholder_id, **kwargs):
+    leaderboard.apply_change(policyholder_id)
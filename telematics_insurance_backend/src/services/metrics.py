@@ -0,0 +1,404 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import atexit
+import bisect
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Counters of workers that have exited, in METRICS_DIR
+RETIRED_FILE = 'retired.json'
+
+# [statements, SQL seconds, statement started at, request started at] for the request being served in this context
+_request_state = ContextVar('request_metrics', default=None)
+
+class RouteSeries:
+    """Counters for one (endpoint, method): status counts, latency, SQL and payload histograms"""
+
+    __slots__ = ('statuses', 'latency', 'latency_sum', 'statements', 'statement_count', 'sql_seconds',
+                 'response_sizes', 'response_bytes', 'request_bytes')
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = [0] * (len(REQUEST_LATENCY_BUCKETS) + 1)  # Last bucket is +Inf
+        self.latency_sum = 0.0
+        self.statements = [0] * (len(SQL_STATEMENT_BUCKETS) + 1)
+        self.statement_count = 0
+        self.sql_seconds = 0.0
+        self.response_sizes = [0] * (len(RESPONSE_SIZE_BUCKETS) + 1)
+        self.response_bytes = 0
+        self.request_bytes = 0
+
+    def observe(self, status, seconds, statements, sql_seconds, request_bytes, response_bytes):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency[bisect.bisect_left(REQUEST_LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+        self.statements[bisect.bisect_left(SQL_STATEMENT_BUCKETS, statements)] += 1
+        self.statement_count += statements
+        self.sql_seconds += sql_seconds
+        self.request_bytes += request_bytes
+        if response_bytes is not None:  # Unknown for streamed responses
+            self.response_sizes[bisect.bisect_left(RESPONSE_SIZE_BUCKETS, response_bytes)] += 1
+            self.response_bytes += response_bytes
+
+    def merge(self, other):
+        for status, count in list(other.statuses.items()):
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        for mine, theirs in ((self.latency, other.latency), (self.statements, other.statements),
+                             (self.response_sizes, other.response_sizes)):
+            for i, count in enumerate(theirs):
+                mine[i] += count
+        self.latency_sum += other.latency_sum
+        self.statement_count += other.statement_count
+        self.sql_seconds += other.sql_seconds
+        self.response_bytes += other.response_bytes
+        self.request_bytes += other.request_bytes
+
+    def dump(self):
+        """JSON-ready copy, read back with RouteSeries.load()"""
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['statuses'] = list(self.statuses.items())  # JSON keys would turn the status codes into strings
+        return state
+
+    @classmethod
+    def load(cls, state):
+        series = cls()
+        for name in cls.__slots__:
+            setattr(series, name, state[name])
+        series.statuses = {status: count for status, count in state['statuses']}
+        return series
+
+class RouteMetrics:
+    """Per-endpoint request metrics, recorded into per-thread shards
+
+    Each serving thread writes only to its own shard, so recording takes no
+    lock; a scrape merges the shards, folding in and dropping those of
+    threads that have exited. A scrape can catch a shard mid-update and be a
+    request behind on some counters, which the next scrape corrects.
+
+    With `directory` set, each worker process also writes its counters to
+    `worker-<pid>.json` there, every `flush_seconds` from its first request
+    and on exit, and collect() sums the files of every worker. Files left by
+    workers that have exited are folded into one retired file, so the sums
+    never go backwards when workers are recycled.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.directory = None
+        self.flush_seconds = 5.0
+        self.logger = None
+        self._local = threading.local()
+        self._shards = []  # (thread, {(endpoint, method): RouteSeries})
+        self._retired = {}
+        self._lock = threading.Lock()  # Guards the shard list and retired series, not recording
+        self._flushing = False
+
+    def start_request(self):
+        """Start timing a request, and counting the SQL it runs, in this context"""
+        _request_state.set([0, 0.0, 0.0, time.perf_counter()])
+
+    def recording(self):
+        return _request_state.get() is not None
+
+    def finish_request(self, endpoint, method, status, request_bytes, response_bytes):
+        """Record the request started in this context; response_bytes is None when unknown"""
+        state = _request_state.get()
+        _request_state.set(None)
+        shard = self._shard()
+        series = shard.get((endpoint, method))
+        if series is None:
+            series = shard[(endpoint, method)] = RouteSeries()
+        series.observe(status, time.perf_counter() - state[3], state[0], state[1], request_bytes,
+                       None if response_bytes is None else int(response_bytes))
+        if self.directory and not self._flushing:
+            self._start_flushing()
+
+    def snapshot(self):
+        """{(endpoint, method): RouteSeries} merged over every thread"""
+        merged = {}
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    _merge_into(self._retired, shard)
+            self._shards = live
+            _merge_into(merged, self._retired)
+        for _, shard in live:
+            _merge_into(merged, shard)
+        return merged
+
+    def flush(self):
+        """Write this worker's counters and provider stats to its file in the directory"""
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(self._worker_path(os.getpid()), {
+            'routes': [[endpoint, method, series.dump()] for (endpoint, method), series in self.snapshot().items()],
+            'providers': provider_stats()
+        })
+
+    def collect(self):
+        """Every worker's counters from the directory
+
+        Returns ({(endpoint, method): RouteSeries} summed over all workers,
+        past and present, and {pid: provider stats} for the live workers).
+        """
+        self.flush()
+        merged, providers = {}, {}
+        with _directory_lock(self.directory):
+            retired = _read_json(os.path.join(self.directory, RETIRED_FILE))
+            retired_routes = _load_routes(retired['routes']) if retired else {}
+            exited = []
+            for path in glob.glob(self._worker_path('*')):
+                pid = int(os.path.basename(path)[len('worker-'):-len('.json')])
+                worker = _read_json(path)
+                if worker is None:
+                    continue
+                if _alive(pid):
+                    _merge_into(merged, _load_routes(worker['routes']))
+                    if worker['providers']:
+                        providers[pid] = worker['providers']
+                else:
+                    _merge_into(retired_routes, _load_routes(worker['routes']))
+                    exited.append(path)
+            if exited:
+                # Written before the exited files are removed, so a crash can only count them twice, never lose them
+                _write_json(os.path.join(self.directory, RETIRED_FILE), {'routes': [
+                    [endpoint, method, series.dump()] for (endpoint, method), series in retired_routes.items()
+                ]})
+                for path in exited:
+                    os.remove(path)
+        _merge_into(merged, retired_routes)
+        return merged, providers
+
+    def clear(self):
+        with self._lock:
+            for _, shard in self._shards:
+                shard.clear()
+            self._retired.clear()
+
+    # Helper methods
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _worker_path(self, pid):
+        return os.path.join(self.directory, f"worker-{pid}.json")
+
+    def _start_flushing(self):
+        # Started by a worker's first request, like the live risk snapshots, so a preloading master has no thread
+        with self._lock:
+            if self._flushing:
+                return
+            self._flushing = True
+        atexit.register(self._final_flush, os.getpid())
+        threading.Thread(target=self._flush_loop, name='route-metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            if not self.directory:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                if self.logger is not None:
+                    self.logger.exception('Writing route metrics to %s failed', self.directory)
+
+    def _final_flush(self, pid):
+        # atexit handlers are inherited across fork; only the process that registered this one flushes
+        if os.getpid() == pid and self.directory:
+            self.flush()
+
+    def _forked(self):
+        # The parent reports its own counters; the child starts empty, with its own flush loop
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        self._flushing = False
+
+route_metrics = RouteMetrics()
+os.register_at_fork(after_in_child=route_metrics._forked)
+
+def configure_route_metrics(app):
+    """Apply METRICS_* settings from the app config"""
+    route_metrics.enabled = app.config.get('METRICS_ENABLED', route_metrics.enabled)
+    route_metrics.directory = app.config.get('METRICS_DIR')
+    route_metrics.flush_seconds = app.config.get('METRICS_FLUSH_SECONDS', route_metrics.flush_seconds)
+    route_metrics.logger = app.logger
+
+def reset_metrics_dir(directory):
+    """Remove every worker's counters from a metrics directory; run by the server before it starts workers"""
+    for path in glob.glob(os.path.join(directory, 'worker-*.json')) + [os.path.join(directory, RETIRED_FILE)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def provider_stats():
+    """External context provider call stats, when the configured provider keeps them"""
+    from src.services.external_context import context_cache
+
+    stats = getattr(context_cache.provider, 'stats', None)
+    return stats() if stats else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    state = _request_state.get()
+    if state is not None:
+        state[2] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    state = _request_state.get()
+    if state is not None:
+        state[0] += 1
+        state[1] += time.perf_counter() - state[2]
+
+def render_prometheus(metrics, providers=None, worker=None):
+    """Prometheus text exposition of route metrics and external provider client stats
+
+    `providers` maps worker pids to their provider stats, and those samples
+    carry the pid in a `worker` label. Route samples get the label only when
+    `worker` is given, i.e. when `metrics` are one worker's own counters:
+    each worker then keeps its own series, which stay monotonic whichever
+    worker answers a scrape.
+    """
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def sample(name, labels, value):
+        text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{{{text}}} {value}")
+
+    def route_labels(endpoint, method):
+        labels = {'endpoint': endpoint, 'method': method}
+        if worker is not None:
+            labels['worker'] = worker
+        return labels
+
+    def histogram(name, labels, bounds, counts, total, count):
+        cumulative = 0
+        for bound, bucket in zip(bounds + ('+Inf',), counts):
+            cumulative += bucket
+            sample(f"{name}_bucket", dict(labels, le=bound), cumulative)
+        sample(f"{name}_sum", labels, round(total, 6))
+        sample(f"{name}_count", labels, count)
+
+    series = sorted(metrics.items())
+    header('http_requests_total', 'counter', 'Requests served, by endpoint, method and status.')
+    for (endpoint, method), route in series:
+        for status, count in sorted(route.statuses.items()):
+            sample('http_requests_total', dict(route_labels(endpoint, method), status=status), count)
+
+    header('http_request_duration_seconds', 'histogram', 'Time to build the response (first byte for streams).')
+    for (endpoint, method), route in series:
+        labels = route_labels(endpoint, method)
+        histogram('http_request_duration_seconds', labels, REQUEST_LATENCY_BUCKETS, route.latency,
+                  route.latency_sum, sum(route.latency))
+
+    header('http_request_sql_statements', 'histogram', 'SQL statements executed per request.')
+    for (endpoint, method), route in series:
+        labels = route_labels(endpoint, method)
+        histogram('http_request_sql_statements', labels, SQL_STATEMENT_BUCKETS, route.statements,
+                  route.statement_count, sum(route.statements))
+
+    header('http_request_sql_seconds_total', 'counter', 'Time spent executing SQL statements.')
+    for (endpoint, method), route in series:
+        sample('http_request_sql_seconds_total', route_labels(endpoint, method),
+               round(route.sql_seconds, 6))
+
+    header('http_response_size_bytes', 'histogram', 'Response body sizes (streamed responses excluded).')
+    for (endpoint, method), route in series:
+        labels = route_labels(endpoint, method)
+        histogram('http_response_size_bytes', labels, RESPONSE_SIZE_BUCKETS, route.response_sizes,
+                  route.response_bytes, sum(route.response_sizes))
+
+    header('http_request_size_bytes_total', 'counter', 'Request body bytes received.')
+    for (endpoint, method), route in series:
+        sample('http_request_size_bytes_total', route_labels(endpoint, method),
+               route.request_bytes)
+
+    if providers:
+        workers = sorted(providers.items())
+        header('external_provider_request_duration_seconds', 'histogram', 'External context provider call latency.')
+        for pid, sources in workers:
+            for source, stats in sorted(sources.items()):
+                latency = stats['latency_seconds']
+                buckets = list(latency['buckets'].values())
+                counts = [count - previous for count, previous in zip(buckets, [0] + buckets[:-1])]
+                histogram('external_provider_request_duration_seconds', {'source': source, 'worker': pid},
+                          tuple(latency['buckets'])[:-1], counts, latency['sum'], latency['count'])
+        header('external_provider_errors_total', 'counter', 'Failed external provider calls, by kind.')
+        for pid, sources in workers:
+            for source, stats in sorted(sources.items()):
+                for kind, count in sorted(stats['errors'].items()):
+                    sample('external_provider_errors_total', {'source': source, 'kind': kind, 'worker': pid}, count)
+        header('external_provider_circuit_open', 'gauge', '1 while the provider circuit breaker is open.')
+        for pid, sources in workers:
+            for source, stats in sorted(sources.items()):
+                sample('external_provider_circuit_open', {'source': source, 'worker': pid}, int(stats['circuit'] == 'open'))
+
+    return '\n'.join(lines) + '\n'
+
+# Helper functions
+@contextmanager
+def _directory_lock(directory):
+    # Serializes collect() across workers and threads; the lock goes with the closed file
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+def _write_json(path, payload):
+    # Readers only ever see a complete file
+    temporary = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(temporary, 'w') as f:
+        json.dump(payload, f)
+    os.replace(temporary, path)
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _load_routes(routes):
+    return {(endpoint, method): RouteSeries.load(state) for endpoint, method, state in routes}
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _merge_into(merged, shard):
+    for key, series in list(shard.items()):
+        if key not in merged:
+            merged[key] = RouteSeries()
+        merged[key].merge(series)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,154 @@
+from src.models.telematics import PointsBalance, PointsLedgerEntry, Policyholder, db
+from src.models.signals import note_points_posted
+from sqlalchemy import bindparam, case, func, literal
+from datetime import datetime
+import uuid
+
+# Points for each newly earned achievement
+ACHIEVEMENT_POINTS = 100
+
+# Behavior bonus per period at risk score 0, scaled down linearly to 0 at risk 1
+BEHAVIOR_BONUS_POINTS = 500
+
+def post_points(entries, session=None):
+    """Append ledger entries and move the running balances in the same transaction
+
+    Each entry is a dict with policyholder_id, entry_type, reference, points
+    and optionally description and created_at. Balances are moved with
+    relative UPDATEs, so concurrent posts to one driver don't lose points.
+    Safe to call from inside flush hooks. Returns the number of entries.
+    """
+    session = session or db.session
+    if not entries:
+        return 0
+
+    now = datetime.utcnow()
+    rows = [{
+        'id': str(uuid.uuid4()),
+        'policyholder_id': entry['policyholder_id'],
+        'entry_type': entry['entry_type'],
+        'reference': entry['reference'],
+        'points': int(entry['points']),
+        'description': entry.get('description'),
+        'created_at': entry.get('created_at') or now
+    } for entry in entries]
+
+    # One balance delta per driver
+    deltas = {}
+    for row in rows:
+        delta = deltas.setdefault(row['policyholder_id'], {'points': 0, 'entries': 0, 'last_entry_at': row['created_at']})
+        delta['points'] += row['points']
+        delta['entries'] += 1
+        delta['last_entry_at'] = max(delta['last_entry_at'], row['created_at'])
+
+    balances = PointsBalance.__table__
+    with session.no_autoflush:
+        session.execute(PointsLedgerEntry.__table__.insert(), rows)
+
+        existing = set(session.execute(
+            db.select(balances.c.policyholder_id).where(balances.c.policyholder_id.in_(list(deltas)))
+        ).scalars())
+
+        updates = [_balance_params(policyholder_id, delta, now) for policyholder_id, delta in deltas.items()
+                   if policyholder_id in existing]
+        if updates:
+            session.execute(
+                balances.update()
+                .where(balances.c.policyholder_id == bindparam('b_policyholder_id'))
+                .values(
+                    balance=balances.c.balance + bindparam('b_points'),
+                    entry_count=balances.c.entry_count + bindparam('b_entries'),
+                    last_entry_at=case(
+                        (balances.c.last_entry_at >= bindparam('b_last_entry_at'), balances.c.last_entry_at),
+                        else_=bindparam('b_last_entry_at')
+                    ),
+                    updated_at=bindparam('b_now')
+                ),
+                updates
+            )
+
+        inserts = [{
+            'policyholder_id': policyholder_id,
+            'balance': delta['points'],
+            'entry_count': delta['entries'],
+            'last_entry_at': delta['last_entry_at'],
+            'updated_at': now
+        } for policyholder_id, delta in deltas.items() if policyholder_id not in existing]
+        if inserts:
+            session.execute(balances.insert(), inserts)
+
+    note_points_posted(session, deltas)
+    return len(rows)
+
+def points_balance(policyholder_id):
+    """Current balance for one policyholder: a primary-key read"""
+    return db.session.execute(
+        db.select(PointsBalance.balance).where(PointsBalance.policyholder_id == policyholder_id)
+    ).scalar() or 0
+
+def posted_references(entry_type, references=None):
+    """(policyholder_id, reference) pairs already posted for an entry type"""
+    query = db.select(PointsLedgerEntry.policyholder_id, PointsLedgerEntry.reference).where(
+        PointsLedgerEntry.entry_type == entry_type
+    )
+    if references is not None:
+        query = query.where(PointsLedgerEntry.reference.in_(list(references)))
+    return set(db.session.execute(query).all())
+
+def award_behavior_bonus(period, now=None):
+    """Post one period's behavior bonus to every scored policyholder, once per period"""
+    already = {policyholder_id for policyholder_id, _ in posted_references('behavior', [period])}
+    rows = db.session.execute(db.select(Policyholder.id, Policyholder.risk_score_current)).all()
+
+    entries = []
+    for policyholder_id, risk_score in rows:
+        if policyholder_id in already or risk_score is None:
+            continue
+        points = round(max(0.0, 1 - risk_score) * BEHAVIOR_BONUS_POINTS)
+        if points:
+            entries.append({
+                'policyholder_id': policyholder_id,
+                'entry_type': 'behavior',
+                'reference': period,
+                'points': points,
+                'description': f"Safe driving bonus for {period}",
+                'created_at': now
+            })
+
+    posted = post_points(entries)
+    db.session.commit()
+    return posted
+
+def replay_balances(policyholder_id=None):
+    """Rebuild running balances from the ledger with one aggregate INSERT ... SELECT"""
+    ledger = PointsLedgerEntry.__table__
+    balances = PointsBalance.__table__
+
+    delete = balances.delete()
+    totals = db.select(
+        ledger.c.policyholder_id,
+        func.sum(ledger.c.points),
+        func.count(),
+        func.max(ledger.c.created_at),
+        literal(datetime.utcnow(), PointsBalance.updated_at.type)
+    ).group_by(ledger.c.policyholder_id)
+    if policyholder_id is not None:
+        delete = delete.where(balances.c.policyholder_id == policyholder_id)
+        totals = totals.where(ledger.c.policyholder_id == policyholder_id)
+
+    db.session.execute(delete)
+    result = db.session.execute(balances.insert().from_select(
+        ['policyholder_id', 'balance', 'entry_count', 'last_entry_at', 'updated_at'], totals
+    ))
+    db.session.commit()
+    return result.rowcount
+
+# Helper functions
+def _balance_params(policyholder_id, delta, now):
+    return {
+        'b_policyholder_id': policyholder_id,
+        'b_points': delta['points'],
+        'b_entries': delta['entries'],
+        'b_last_entry_at': delta['last_entry_at'],
+        'b_now': now
+    }
@@ -0,0 +1,194 @@
+from src.models.telematics import Policyholder, db
+import numpy as np
+import json
+
+# Policyholder columns captured in a book snapshot
+FEATURE_COLUMNS = (
+    'risk_score_current',
+    'avg_harsh_events_per_100km',
+    'night_driving_percentage',
+    'peak_hour_driving_percentage',
+    'total_mileage_ytd',
+    'avg_daily_trips',
+    'vehicle_year',
+    'driving_history_score'
+)
+
+# Approximates the production scorer, min(harsh events per 100km / 10, 1), from the stored
+# average; production counts only the last 30 trips, which a book snapshot doesn't hold
+CURRENT_SCORING_WEIGHTS = {'avg_harsh_events_per_100km': 0.1}
+
+DEFAULT_PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+
+def snapshot_book(chunk_size=50000):
+    """Load current policyholder features into NumPy column arrays"""
+    columns = [getattr(Policyholder, name) for name in FEATURE_COLUMNS]
+
+    # Column-only, server-side streamed read so the ORM never hydrates rows
+    result = db.session.execute(
+        db.select(Policyholder.id, *columns).order_by(Policyholder.id).execution_options(yield_per=chunk_size)
+    )
+
+    id_chunks = []
+    feature_chunks = {name: [] for name in FEATURE_COLUMNS}
+    for partition in result.partitions():
+        id_chunks.append(np.array([row[0] for row in partition], dtype=object))
+        for i, name in enumerate(FEATURE_COLUMNS, start=1):
+            # NULL columns fall back to the model defaults (0.5 for risk, 0.0 otherwise)
+            default = 0.5 if name == 'risk_score_current' else 0.0
+            feature_chunks[name].append(np.fromiter(
+                (default if row[i] is None else row[i] for row in partition), dtype=np.float64, count=len(partition)
+            ))
+
+    return {
+        'ids': np.concatenate(id_chunks) if id_chunks else np.empty(0, dtype=object),
+        'features': {
+            name: np.concatenate(chunks) if chunks else np.empty(0, dtype=np.float64)
+            for name, chunks in feature_chunks.items()
+        }
+    }
+
+def save_snapshot(snapshot, path):
+    """Persist a book snapshot to a compressed .npz file for offline runs"""
+    np.savez_compressed(path, ids=snapshot['ids'].astype(str), **snapshot['features'])
+
+def load_snapshot(path):
+    """Load a book snapshot written by save_snapshot"""
+    with np.load(path, allow_pickle=False) as data:
+        return {
+            'ids': data['ids'],
+            'features': {name: data[name] for name in data.files if name != 'ids'}
+        }
+
+def linear_scorer(weights=None, intercept=0.0):
+    """Build a vectorized risk scorer: clip(intercept + sum(weight * feature), 0, 1)"""
+    weights = dict(CURRENT_SCORING_WEIGHTS if weights is None else weights)
+
+    def score(features):
+        size = len(next(iter(features.values()))) if features else 0
+        risk = np.full(size, float(intercept))
+        for feature, weight in weights.items():
+            if feature not in features:
+                raise KeyError(f"Unknown scoring feature: {feature}")
+            risk += weight * features[feature]
+        return np.clip(risk, 0.0, 1.0)
+
+    return score
+
+def linear_premium_curve(base_adjustment=-20.0, risk_penalty=50.0, floor=None, cap=None):
+    """Build a vectorized premium adjustment curve (percent) over risk scores"""
+    def curve(risk):
+        adjustment = base_adjustment + risk_penalty * np.asarray(risk, dtype=np.float64)
+        if floor is not None or cap is not None:
+            adjustment = np.clip(adjustment, floor, cap)
+        return adjustment
+
+    return curve
+
+# Vectorized equivalent of src.services.pricing.calculate_premium_adjustment
+current_premium_curve = linear_premium_curve()
+
+def run_simulation(snapshot, score_fn=None, premium_fn=None, base_premium=1000.0,
+                   percentiles=DEFAULT_PERCENTILES, bins=10):
+    """Apply candidate scoring/premium functions to the whole book and compare with today"""
+    features = snapshot['features']
+    baseline_risk = features['risk_score_current']
+    candidate_risk = score_fn(features) if score_fn else baseline_risk
+
+    baseline_adjustment = current_premium_curve(baseline_risk)
+    candidate_adjustment = (premium_fn or current_premium_curve)(candidate_risk)
+
+    base = np.broadcast_to(np.asarray(base_premium, dtype=np.float64), baseline_risk.shape)
+    baseline_premium = base * (1 + baseline_adjustment / 100)
+    candidate_premium = base * (1 + candidate_adjustment / 100)
+    premium_delta = candidate_premium - baseline_premium
+
+    baseline_revenue = float(baseline_premium.sum())
+    candidate_revenue = float(candidate_premium.sum())
+
+    return {
+        'policies': int(baseline_risk.size),
+        'risk_distribution': {
+            'baseline': summarize_distribution(baseline_risk),
+            'candidate': summarize_distribution(candidate_risk),
+            'histogram': risk_histograms(baseline_risk, candidate_risk, bins),
+            'ks_statistic': ks_statistic(baseline_risk, candidate_risk)
+        },
+        'premium_adjustment': {
+            'baseline': summarize_distribution(baseline_adjustment),
+            'candidate': summarize_distribution(candidate_adjustment)
+        },
+        'revenue_impact': {
+            'baseline_total': round(baseline_revenue, 2),
+            'candidate_total': round(candidate_revenue, 2),
+            'delta': round(candidate_revenue - baseline_revenue, 2),
+            'delta_percent': round((candidate_revenue - baseline_revenue) / baseline_revenue * 100, 3) if baseline_revenue else 0.0,
+            'policies_increased': int(np.count_nonzero(premium_delta > 0.005)),
+            'policies_decreased': int(np.count_nonzero(premium_delta < -0.005)),
+            'policies_unchanged': int(np.count_nonzero(np.abs(premium_delta) <= 0.005))
+        },
+        'percentiles': percentile_table(percentiles, {
+            'baseline_risk': baseline_risk,
+            'candidate_risk': candidate_risk,
+            'baseline_adjustment': baseline_adjustment,
+            'candidate_adjustment': candidate_adjustment,
+            'premium_delta': premium_delta
+        })
+    }
+
+# Helper functions
+def summarize_distribution(values):
+    """Summary statistics for a distribution"""
+    if values.size == 0:
+        return {'mean': 0.0, 'std': 0.0, 'min': 0.0, 'max': 0.0}
+
+    return {
+        'mean': round(float(values.mean()), 4),
+        'std': round(float(values.std()), 4),
+        'min': round(float(values.min()), 4),
+        'max': round(float(values.max()), 4)
+    }
+
+def risk_histograms(baseline_risk, candidate_risk, bins):
+    """Side-by-side histograms of baseline and candidate risk over 0-1"""
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    baseline_counts, _ = np.histogram(baseline_risk, bins=edges)
+    candidate_counts, _ = np.histogram(candidate_risk, bins=edges)
+
+    return [
+        {
+            'range': [round(float(edges[i]), 3), round(float(edges[i + 1]), 3)],
+            'baseline': int(baseline_counts[i]),
+            'candidate': int(candidate_counts[i])
+        }
+        for i in range(bins)
+    ]
+
+def ks_statistic(baseline, candidate):
+    """Two-sample Kolmogorov-Smirnov distance between two distributions"""
+    if baseline.size == 0 or candidate.size == 0:
+        return 0.0
+
+    baseline = np.sort(baseline)
+    candidate = np.sort(candidate)
+    grid = np.concatenate([baseline, candidate])
+    cdf_baseline = np.searchsorted(baseline, grid, side='right') / baseline.size
+    cdf_candidate = np.searchsorted(candidate, grid, side='right') / candidate.size
+
+    return round(float(np.abs(cdf_baseline - cdf_candidate).max()), 4)
+
+def percentile_table(percentiles, series):
+    """Percentile rows for several series computed in one pass per series"""
+    computed = {
+        name: np.percentile(values, percentiles) if values.size else np.zeros(len(percentiles))
+        for name, values in series.items()
+    }
+
+    return [
+        dict({'percentile': p}, **{name: round(float(values[i]), 4) for name, values in computed.items()})
+        for i, p in enumerate(percentiles)
+    ]
+
+def format_report(report):
+    """Render a simulation report as JSON"""
+    return json.dumps(report, indent=2)
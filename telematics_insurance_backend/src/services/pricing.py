@@ -0,0 +1,6 @@
+def calculate_premium_adjustment(risk_score):
+    """Calculate premium adjustment percentage based on risk score"""
+    # Simple linear adjustment: 0.0 risk = -20% premium, 1.0 risk = +30% premium
+    base_adjustment = -20  # 20% discount for perfect score
+    risk_penalty = 50 * risk_score  # Up to 50% penalty for worst score
+    return base_adjustment + risk_penalty
@@ -0,0 +1,50 @@
+from src.models.telematics import Policyholder, PointsBalance, db
+from src.models.signals import policyholder_changed, points_posted
+from src.services.ttl_cache import TTLCache
+from collections import namedtuple
+
+# Policyholder columns the gamification scorers read
+PROFILE_COLUMNS = (
+    'id', 'risk_score_current', 'avg_harsh_events_per_100km', 'night_driving_percentage',
+    'peak_hour_driving_percentage', 'total_mileage_ytd', 'avg_daily_trips'
+)
+
+# Immutable snapshot of one driver, shared by every scorer in a request
+DriverProfile = namedtuple('DriverProfile', PROFILE_COLUMNS + ('total_points',))
+
+# Cross-request cache of driver profiles
+profile_cache = TTLCache()
+
+def configure_profile_cache(app):
+    """Apply DRIVER_PROFILE_CACHE_* settings from the app config"""
+    profile_cache.max_entries = app.config.get('DRIVER_PROFILE_CACHE_MAX_ENTRIES', profile_cache.max_entries)
+    # Local writes invalidate at once, but a score or points change made by another
+    # server process is only seen here once the entry expires: keep this short
+    profile_cache.ttl_seconds = app.config.get('DRIVER_PROFILE_CACHE_TTL_SECONDS', profile_cache.ttl_seconds)
+
+def get_driver_profile(policyholder_id):
+    """Cached driver profile, loaded with one query on a miss; None if unknown"""
+    profile = profile_cache.get(policyholder_id)
+    if profile is not None:
+        return profile
+
+    columns = [getattr(Policyholder, name) for name in PROFILE_COLUMNS]
+    row = db.session.execute(
+        db.select(*columns, PointsBalance.balance)
+        .outerjoin(PointsBalance, PointsBalance.policyholder_id == Policyholder.id)
+        .where(Policyholder.id == policyholder_id)
+    ).first()
+    if row is None:
+        return None
+
+    profile = DriverProfile(*row[:-1], total_points=row[-1] or 0)
+    profile_cache.put(profile.id, profile)
+    return profile
+
+@policyholder_changed.connect
+def _invalidate_on_policyholder_change(policyholder_id, **kwargs):
+    profile_cache.invalidate(policyholder_id)
+
+@points_posted.connect
+def _invalidate_on_points_posted(policyholder_id, **kwargs):
+    profile_cache.invalidate(policyholder_id)
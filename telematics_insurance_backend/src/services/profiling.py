@@ -0,0 +1,255 @@
+from collections import Counter
+from flask import g, request
+import cProfile
+import hmac
+import json
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+PROFILE_MODES = ('sampling', 'cprofile')
+
+# Files stored per profile, by download kind
+PROFILE_FILES = {
+    'pstats': '.pstats',
+    'collapsed': '.collapsed',
+    'meta': '.json'
+}
+
+# Profile ids name files; downloads only accept ids of this form
+_SAFE_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread
+
+    Every `interval` seconds the sampler reads the target thread's current
+    frame and counts its stack, root first. The samples give the collapsed
+    stack flamegraph input and an approximate pstats table, at a cost to the
+    profiled request of the sampler taking the GIL once per interval.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()  # ((filename, first line, function), ...) root first -> samples
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed stack format: `module:function;...;module:function samples` per line"""
+        return ''.join(';'.join(f"{_module_name(filename)}:{function}" for filename, _, function in stack)
+                       + f" {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def stats(self):
+        """pstats table estimated from the samples
+
+        Call counts are sample counts, own and cumulative time are samples
+        times the interval.
+        """
+        stats = {}
+        for stack, count in self.stacks.items():
+            seconds = count * self.interval
+            seen = set()
+            for depth, key in enumerate(stack):
+                caller = stack[depth - 1] if depth else None
+                leaf = depth == len(stack) - 1
+                entry = stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+                if key not in seen:  # Recursive frames count once per sample
+                    seen.add(key)
+                    entry[0] += count
+                    entry[1] += count
+                    entry[3] += seconds
+                if leaf:
+                    entry[2] += seconds
+                if caller is not None:
+                    edge = entry[4].get(caller, (0, 0, 0.0, 0.0))
+                    entry[4][caller] = (edge[0] + count, edge[1] + count, edge[2] + (seconds if leaf else 0.0),
+                                        edge[3] + seconds)
+        return {key: tuple(entry) for key, entry in stats.items()}
+
+    # Helper methods
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self._stop.is_set():  # Stopped while this thread waited for the GIL: the target is in stop()
+                break
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+class RequestProfiler:
+    """On-demand profiles of single requests, stored on disk by a generated id
+
+    A request is profiled when it carries the admin token in the
+    X-Profile-Token header, or when its path starts with one of the
+    allowlisted prefixes. In `sampling` mode one StackSampler provides both
+    files; `cprofile` mode records exact pstats with the deterministic
+    profiler, which slows the request more, and samples for the flamegraph
+    alongside. Only token holders can pick the mode. Only the newest
+    `max_stored` profiles are kept.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.token = None
+        self.paths = ()
+        self.mode = 'sampling'
+        self.interval = 0.005
+        self.max_stored = 50
+        self._lock = threading.Lock()  # Serializes pruning
+
+    @property
+    def enabled(self):
+        return self.directory is not None and bool(self.token or self.paths)
+
+    def authorized(self, headers):
+        """True when the headers carry the admin token"""
+        token = headers.get('X-Profile-Token')
+        return bool(token and self.token and hmac.compare_digest(token, self.token))
+
+    def wanted(self, headers, path):
+        """True when a request with these headers and path should be profiled"""
+        return self.authorized(headers) or path.startswith(self.paths)
+
+    def start(self, profile_id, mode=None):
+        """Start profiling the calling thread; returns the state to hand to finish()"""
+        mode = mode if mode in PROFILE_MODES else self.mode
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profile = cProfile.Profile() if mode == 'cprofile' else None
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:  # Another request holds the interpreter's one profiler (Python 3.12+)
+                profile, mode = None, 'sampling'
+        sampler.start()
+        return {'id': profile_id, 'mode': mode, 'sampler': sampler, 'profile': profile,
+                'started_at': time.time(), 'start': time.perf_counter()}
+
+    def finish(self, state, **meta):
+        """Stop a profile started on this thread and store it with `meta` (endpoint, status, ...)"""
+        if state['profile'] is not None:
+            state['profile'].disable()
+        seconds = time.perf_counter() - state['start']
+        sampler = state['sampler']
+        sampler.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, state['id'])
+        files = ['collapsed']
+        with open(base + PROFILE_FILES['collapsed'], 'w') as f:
+            f.write(sampler.collapsed())
+        if state['profile'] is not None:
+            state['profile'].dump_stats(base + PROFILE_FILES['pstats'])
+            files.append('pstats')
+        elif sampler.samples:  # pstats can't load an empty table; requests shorter than the interval have none
+            with open(base + PROFILE_FILES['pstats'], 'wb') as f:
+                marshal.dump(sampler.stats(), f)
+            files.append('pstats')
+        meta.update(id=state['id'], mode=state['mode'], files=files, duration_ms=round(seconds * 1000, 3),
+                    samples=sampler.samples, sample_interval_ms=self.interval * 1000,
+                    created_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(state['started_at'])))
+        # Written last: a profile is listed once its metadata exists
+        with open(base + PROFILE_FILES['meta'], 'w') as f:
+            json.dump(meta, f)
+        self._prune()
+        return meta
+
+    def list(self):
+        """Stored profiles' metadata, newest first"""
+        if self.directory is None or not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(PROFILE_FILES['meta']):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # Pruned or being written
+        profiles.sort(key=lambda meta: meta.get('created_at', ''), reverse=True)
+        return profiles
+
+    def path(self, profile_id, kind):
+        """File of a stored profile, or None"""
+        if kind not in PROFILE_FILES or not _SAFE_ID.match(profile_id) or self.directory is None:
+            return None
+        path = os.path.join(self.directory, profile_id + PROFILE_FILES[kind])
+        return path if os.path.isfile(path) else None
+
+    # Helper methods
+    def _prune(self):
+        with self._lock:
+            stored = sorted((entry.stat().st_mtime, entry.name[:-len(PROFILE_FILES['meta'])])
+                            for entry in os.scandir(self.directory) if entry.name.endswith(PROFILE_FILES['meta']))
+            for _, profile_id in stored[:max(len(stored) - self.max_stored, 0)]:
+                for suffix in PROFILE_FILES.values():
+                    try:
+                        os.remove(os.path.join(self.directory, profile_id + suffix))
+                    except FileNotFoundError:
+                        pass
+
+request_profiler = RequestProfiler()
+
+def configure_request_profiler(app):
+    """Apply PROFILE_* settings from the app config; requests pay nothing unless a token or path is set"""
+    request_profiler.token = app.config.get('PROFILE_TOKEN')
+    request_profiler.paths = tuple(app.config.get('PROFILE_PATHS', ()))
+    request_profiler.mode = app.config.get('PROFILE_MODE', request_profiler.mode)
+    request_profiler.interval = app.config.get('PROFILE_SAMPLE_INTERVAL_SECONDS', request_profiler.interval)
+    request_profiler.max_stored = app.config.get('PROFILE_MAX_STORED', request_profiler.max_stored)
+    request_profiler.directory = app.config.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    if not request_profiler.enabled:
+        return
+
+    @app.before_request
+    def start_profile():
+        # Downloads carry the token too, but aren't worth profiling
+        if request.blueprint != 'profiling' and request_profiler.wanted(request.headers, request.path):
+            # Allowlisted paths need no token, so clients pick neither the file name nor the costlier profiler
+            mode = request.headers.get('X-Profile-Mode') if request_profiler.authorized(request.headers) else None
+            g.profile = request_profiler.start(uuid.uuid4().hex, mode)
+
+    @app.after_request
+    def tag_profile(response):
+        state = g.get('profile')
+        if state is not None:
+            response.headers['X-Profile-Id'] = state['id']
+            g.profile_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_profile(error=None):
+        # For stream_with_context responses teardown waits for the stream, so they are profiled to the end
+        state = g.pop('profile', None)
+        if state is not None:
+            request_profiler.finish(state, endpoint=request.endpoint, method=request.method, path=request.path,
+                                    status=g.pop('profile_status', 500),
+                                    request_id=request.headers.get('X-Request-ID', '')[:128] or None)
+
+# Helper functions
+def _module_name(filename):
+    """Dotted module name for a frame's file: src.routes.telematics, flask.app, or the bare file name"""
+    _, marker, name = filename.rpartition(f"{os.sep}site-packages{os.sep}")
+    if not marker:
+        _, marker, name = filename.rpartition(f"{os.sep}src{os.sep}")
+        name = os.path.join('src', name) if marker else os.path.basename(filename)
+    return (name[:-3] if name.endswith('.py') else name).replace(os.sep, '.')
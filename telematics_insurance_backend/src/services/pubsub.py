@@ -0,0 +1,170 @@
+from src.models.serializers import dumps
+from collections import deque
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+
+# Largest relayed event; feedback events are well under this
+MAX_RELAY_BYTES = 65536
+
+# Pause before reopening a failed bus socket
+RELAY_RETRY_SECONDS = 1.0
+
+class Subscription:
+    """One subscriber's bounded event queue
+
+    When the queue is full the oldest event is dropped, so a slow or stalled
+    client can never grow memory or block publishers.
+    """
+
+    __slots__ = ('channel', 'events', 'dropped', '_wakeup')
+
+    def __init__(self, channel, max_queue):
+        self.channel = channel
+        self.events = deque(maxlen=max_queue)
+        self.dropped = 0
+        self._wakeup = threading.Event()
+
+    def push(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        self._wakeup.set()
+
+    def wait(self, timeout):
+        """Block until events arrive or the timeout passes; return the drained events"""
+        if not self.events:
+            self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+        drained = []
+        while self.events:
+            drained.append(self.events.popleft())
+        return drained
+
+class Broker:
+    """In-process pub/sub fanning events out to per-channel subscribers
+
+    With `bus_path` set, every published event is also relayed as one Unix
+    datagram to that socket, where the process serving the streams listens
+    and delivers it to its own subscribers. Relaying never blocks: when the
+    listener is down or behind, the event is dropped and counted.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self.bus_path = None
+        self.logger = None
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._bus = None
+        self._listening = False
+        self.published = 0
+        self.relayed = 0
+        self.relay_dropped = 0
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel, self.max_queue)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel, event_type, data):
+        """Deliver an event to every current subscriber of a channel and relay it; returns the local receiver count"""
+        receivers = self._deliver(channel, event_type, data)
+        if self.bus_path and not self._listening:
+            self._relay(channel, event_type, data)
+        return receivers
+
+    def listen(self):
+        """Deliver events relayed by other server processes to this process's subscribers"""
+        bus = self._bind()
+        self._listening = True
+        threading.Thread(target=self._receive, args=(bus,), name='feedback-bus', daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'channels': len(self._channels),
+                'subscribers': sum(len(subscribers) for subscribers in self._channels.values()),
+                'published': self.published,
+                'relayed': self.relayed,
+                'relay_dropped': self.relay_dropped
+            }
+
+    # Helper methods
+    def _deliver(self, channel, event_type, data):
+        with self._lock:
+            subscribers = tuple(self._channels.get(channel, ()))
+            event = (next(self._ids), event_type, data)
+            self.published += 1
+
+        for subscription in subscribers:
+            subscription.push(event)
+        return len(subscribers)
+
+    def _relay(self, channel, event_type, data):
+        message = dumps([channel, event_type, data])
+        with self._lock:
+            if self._bus is None:
+                self._bus = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._bus.setblocking(False)
+            try:
+                self._bus.sendto(message, self.bus_path)
+                self.relayed += 1
+            except OSError:  # No listener, its buffer is full, or the event is too large
+                self.relay_dropped += 1
+
+    def _bind(self):
+        bus = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            os.unlink(self.bus_path)  # Left behind by a previous listener
+        except FileNotFoundError:
+            pass
+        bus.bind(self.bus_path)
+        return bus
+
+    def _receive(self, bus):
+        # Runs for the life of the process: a socket error reopens the bus instead of ending delivery
+        while True:
+            try:
+                if bus is None:
+                    bus = self._bind()
+                message = bus.recv(MAX_RELAY_BYTES)
+                if not message:  # Relayed events are never empty; the socket was shut down
+                    raise ConnectionAbortedError('feedback bus socket shut down')
+            except OSError:
+                if self.logger is not None:
+                    self.logger.exception('Feedback bus on %s failed; reopening it', self.bus_path)
+                if bus is not None:
+                    bus.close()
+                    bus = None
+                time.sleep(RELAY_RETRY_SECONDS)
+                continue
+
+            try:
+                channel, event_type, data = json.loads(message)
+            except ValueError:
+                continue
+            self._deliver(channel, event_type, data)
+
+# Real-time driver feedback, one channel per policyholder
+feedback_broker = Broker()
+
+def configure_feedback_broker(app):
+    """Apply FEEDBACK_STREAM_* settings from the app config"""
+    feedback_broker.max_queue = app.config.get('FEEDBACK_STREAM_MAX_QUEUE', feedback_broker.max_queue)
+    feedback_broker.bus_path = app.config.get('FEEDBACK_BUS_PATH')
+    feedback_broker.logger = app.logger
@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import re
+
+# Open QueryLogs in this context; each statement executed here is added to all of them
+_active_logs = ContextVar('query_logs', default=())
+
+# Expanded IN lists, `IN (?, ?, ?)`, differ only in how many values they bind
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+class QueryLog:
+    """SQL statements executed while a count_queries() block is open"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def repeated(self, threshold):
+        """{statement shape: executions} for shapes run at least `threshold` times, a probable N+1"""
+        shapes = {}
+        for statement in self.statements:
+            shape = statement_shape(statement)
+            shapes[shape] = shapes.get(shape, 0) + 1
+        return {shape: count for shape, count in shapes.items() if count >= threshold}
+
+@contextmanager
+def count_queries():
+    """Record the SQL statements executed in this context while the block runs
+
+        with count_queries() as log:
+            client.get('/api/leaderboard')
+        assert log.count <= 2
+    """
+    log = QueryLog()
+    token = _active_logs.set(_active_logs.get() + (log,))
+    try:
+        yield log
+    finally:
+        _active_logs.reset(token)
+
+def query_budget(statements):
+    """Mark a view with the most SQL statements one request may execute, however much data there is
+
+    The view is returned unchanged, so the mark costs nothing per request. The
+    test suite holds every route to its budget, and debug servers log requests
+    that go over it.
+    """
+    def mark(view):
+        view.query_budget = statements
+        return view
+    return mark
+
+def statement_shape(statement):
+    """Statement text with whitespace and IN-list lengths normalized"""
+    return _IN_LIST.sub('(?...)', ' '.join(statement.split()))
+
+def configure_query_checks(app):
+    """In debug mode (or with QUERY_CHECKS set), log probable N+1s and routes over their query budget
+
+    A request is flagged when one statement shape runs QUERY_REPEAT_THRESHOLD
+    or more times (default 5).
+    """
+    if not app.config.get('QUERY_CHECKS', app.debug):
+        return
+    threshold = app.config.get('QUERY_REPEAT_THRESHOLD', 5)
+
+    @app.before_request
+    def start_query_log():
+        g.query_log = QueryLog()
+        g.query_log_token = _active_logs.set(_active_logs.get() + (g.query_log,))
+
+    @app.after_request
+    def check_query_log(response):
+        log = g.get('query_log')
+        if log is None:
+            return response
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is not None and log.count > budget:
+            app.logger.warning('%s ran %d SQL statements, over its budget of %d', request.endpoint, log.count, budget)
+        for shape, count in log.repeated(threshold).items():
+            app.logger.warning('Probable N+1 in %s: the same statement ran %d times: %s',
+                               request.endpoint, count, shape[:300])
+        return response
+
+    @app.teardown_request
+    def stop_query_log(error=None):
+        token = g.pop('query_log_token', None)
+        if token is not None:
+            _active_logs.reset(token)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _log_statement(conn, cursor, statement, parameters, context, executemany):
+    for log in _active_logs.get():
+        log.statements.append(statement)
@@ -0,0 +1,141 @@
+from src.models.telematics import Policyholder, db
+from src.models.signals import policyholder_changed
+from bisect import bisect_left, insort
+import threading
+import time
+
+class RankIndex:
+    """Sorted risk scores for O(log n) rank and percentile lookups
+
+    Loaded with one column-only query and kept in sync from committed score
+    writes, so a lookup is a bisect instead of two table scans. A full reload
+    every `max_staleness` seconds picks up writes made by other processes.
+    Server workers load and reload in a background thread (start_refreshing);
+    elsewhere the first lookup loads, and a stale lookup reloads, in line.
+    """
+
+    def __init__(self, max_staleness=60):
+        self.max_staleness = max_staleness
+        self._scores = {}  # policyholder_id -> risk score (None when unscored)
+        self._sorted = []  # Non-null scores, ascending
+        self._loaded_at = None
+        self._replay = None  # Updates made while a reload is in flight
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False  # A background thread owns the reloads
+
+    def standing(self, risk_score):
+        """Rank, total and percentile for a risk score (lower is better)"""
+        self._ensure_fresh()
+        with self._lock:
+            # Ranked like COUNT(*) WHERE risk_score_current < x: unscored drivers never rank ahead
+            better = bisect_left(self._sorted, risk_score) if risk_score is not None else 0
+            total = len(self._scores)
+
+        rank = better + 1
+        total = max(total, rank)
+        return {
+            'rank': rank,
+            'total_drivers': total,
+            'percentile': round((total - rank) / total * 100, 1)
+        }
+
+    def update(self, policyholder_id, risk_score, deleted=False):
+        """Apply one committed score change"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            if self._replay is not None:
+                self._replay.append((policyholder_id, risk_score, deleted))
+            self._apply(policyholder_id, risk_score, deleted)
+
+    def refresh(self):
+        """Reload every score from the database"""
+        with self._refresh_lock:
+            self._reload()
+
+    def start_refreshing(self, app):
+        """Load now, then reload every `max_staleness` seconds off the request path"""
+        self._background_refresh(app)
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_loop, args=(app,), name='rank-index-refresh', daemon=True).start()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    # Helper methods
+    def _is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_staleness
+
+    def _ensure_fresh(self):
+        if self._refreshing and self._loaded_at is not None:
+            return  # Served as last loaded until the background reload lands
+        if self._is_stale():
+            with self._refresh_lock:
+                # Another request may have reloaded while this one waited
+                if self._is_stale():
+                    self._reload()
+
+    def _refresh_loop(self, app):
+        while True:
+            time.sleep(self.max_staleness)
+            self._background_refresh(app)
+
+    def _background_refresh(self, app):
+        # A failed load keeps the last scores; until one succeeds, lookups load in line
+        try:
+            with app.app_context():
+                self.refresh()
+        except Exception:
+            app.logger.exception('Loading the rank index failed')
+
+    def _reload(self):
+        with self._lock:
+            self._replay = []
+
+        try:
+            # The query runs outside the lock so lookups keep being served
+            rows = db.session.execute(db.select(Policyholder.id, Policyholder.risk_score_current)).all()
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+
+        scores = dict(rows)
+        ordered = sorted(score for score in scores.values() if score is not None)
+
+        with self._lock:
+            self._scores, self._sorted = scores, ordered
+            # Changes committed while the query ran may be missing from its snapshot
+            for change in self._replay:
+                self._apply(*change)
+            self._replay = None
+            self._loaded_at = time.monotonic()
+
+    def _apply(self, policyholder_id, risk_score, deleted):
+        if policyholder_id in self._scores:
+            previous = self._scores.pop(policyholder_id)
+            if previous is not None:
+                index = bisect_left(self._sorted, previous)
+                if index < len(self._sorted) and self._sorted[index] == previous:
+                    del self._sorted[index]
+
+        if not deleted:
+            self._scores[policyholder_id] = risk_score
+            if risk_score is not None:
+                insort(self._sorted, risk_score)
+
+rank_index = RankIndex()
+
+def configure_rank_index(app):
+    """Apply RANK_INDEX_* settings from the app config"""
+    rank_index.max_staleness = app.config.get('RANK_INDEX_MAX_STALENESS_SECONDS', rank_index.max_staleness)
+
+@policyholder_changed.connect
+def _update_on_policyholder_change(policyholder_id, fields=frozenset(), deleted=False, risk_score=None, **kwargs):
+    if deleted or 'risk_score_current' in fields:
+        rank_index.update(policyholder_id, risk_score, deleted=deleted)
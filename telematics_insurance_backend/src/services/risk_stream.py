@@ -0,0 +1,401 @@
+from collections import namedtuple
+from datetime import timezone
+import atexit
+import glob
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+# Base risk impact of one event, by type and severity
+EVENT_IMPACTS = {
+    'harsh_braking': {'low': 0.001, 'medium': 0.003, 'high': 0.005},
+    'rapid_acceleration': {'low': 0.001, 'medium': 0.002, 'high': 0.004},
+    'speeding': {'low': 0.002, 'medium': 0.004, 'high': 0.008},
+    'harsh_cornering': {'low': 0.001, 'medium': 0.002, 'high': 0.003}
+}
+DEFAULT_IMPACT = 0.001
+
+# Wait for the owning process's reply before scoring the event locally
+OWNER_TIMEOUT_SECONDS = 1.0
+
+# After the owner fails to answer, score locally this long before trying it again
+OWNER_RETRY_SECONDS = 5.0
+
+RiskUpdate = namedtuple('RiskUpdate', ['risk_impact', 'live_risk', 'risk_delta', 'event_rate', 'cooldown_active'])
+
+class DriverRiskState:
+    """Live risk state of one driver"""
+
+    __slots__ = ('risk', 'event_rate', 'updated_at', 'counts', 'cooldowns')
+
+    def __init__(self, risk=0.0, event_rate=0.0, updated_at=0.0, counts=None, cooldowns=None):
+        self.risk = risk  # Exponentially decayed sum of event impacts
+        self.event_rate = event_rate  # Exponentially decayed event count over the rate window
+        self.updated_at = updated_at  # Epoch seconds of the last event
+        self.counts = counts or {}  # event_type -> lifetime count
+        self.cooldowns = cooldowns or {}  # event_type -> epoch seconds feedback is quiet until
+
+class RiskStream:
+    """Sharded in-memory store of per-driver streaming risk estimates
+
+    Each event decays the driver's estimate and event rate to the event time,
+    then adds the event's impact, amplified when events come in bursts. All
+    work is O(1) under one shard lock, so drivers on different shards never
+    contend. When a snapshot path is set, each process that observes events
+    snapshots its state to its own SQLite file next to that path,
+    periodically and on exit; restore_all() merges every file back, so a
+    restart keeps recent history.
+
+    With `socket_path` set, one process owns the state and serves it on that
+    Unix socket (serve()); every other process forwards its events there, so
+    each driver has one estimate however many workers take the requests.
+    """
+
+    def __init__(self, shards=64, half_life_seconds=3600.0, rate_window_seconds=600.0,
+                 burst_penalty=0.5, max_multiplier=3.0, cooldown_seconds=30.0):
+        self.half_life_seconds = half_life_seconds
+        self.rate_window_seconds = rate_window_seconds
+        self.burst_penalty = burst_penalty
+        self.max_multiplier = max_multiplier
+        self.cooldown_seconds = cooldown_seconds
+        self.events = 0
+        self.snapshot_path = None  # Base path; processes write {path}.worker-{pid}
+        self.snapshot_seconds = 60
+        self.socket_path = None  # Served by the owning process; others forward events to it
+        self.logger = None
+        self.forwarded = 0
+        self.forward_errors = 0
+        self._serving = False
+        self._owner_down_until = 0.0
+        self._local = threading.local()  # This thread's connection to the owner
+        self._snapshots_started = False
+        self._snapshot_lock = threading.Lock()
+        self._resize(shards)
+
+    def observe(self, policyholder_id, event_type, severity='medium', at=None):
+        """Fold one driving event into the driver's state; returns a RiskUpdate"""
+        at = time.time() if at is None else at
+        if self.socket_path and not self._serving and time.monotonic() >= self._owner_down_until:
+            update = self._forward(policyholder_id, event_type, severity, at)
+            if update is not None:
+                return update
+        if self.snapshot_path and not self._snapshots_started:
+            self._start_snapshots()
+        base = EVENT_IMPACTS.get(event_type, {}).get(severity, DEFAULT_IMPACT)
+        states, lock = self._shard(policyholder_id)
+
+        with lock:
+            state = states.get(policyholder_id)
+            if state is None:
+                state = states[policyholder_id] = DriverRiskState(updated_at=at)
+
+            elapsed = at - state.updated_at
+            if elapsed > 0:
+                state.risk *= math.exp(-elapsed * self._risk_decay)
+                state.event_rate *= math.exp(-elapsed * self._rate_decay)
+                state.updated_at = at
+            previous = state.risk
+
+            # Repeated events inside the rate window weigh more, up to a cap
+            impact = base * min(1.0 + state.event_rate * self.burst_penalty, self.max_multiplier)
+            state.risk += impact
+            state.event_rate += 1.0
+            state.counts[event_type] = state.counts.get(event_type, 0) + 1
+
+            quiet_until = state.cooldowns.get(event_type, 0.0)
+            cooldown_active = at < quiet_until
+            if not cooldown_active:
+                state.cooldowns[event_type] = at + self.cooldown_seconds
+
+            update = RiskUpdate(impact, state.risk, state.risk - previous, state.event_rate, cooldown_active)
+            self.events += 1  # Approximate across shards; stats only
+        return update
+
+    def live_risk(self, policyholder_id, at=None):
+        """Current decayed risk estimate for a driver (0.0 when unseen)"""
+        at = time.time() if at is None else at
+        states, lock = self._shard(policyholder_id)
+        with lock:
+            state = states.get(policyholder_id)
+            if state is None:
+                return 0.0
+            return state.risk * math.exp(-max(at - state.updated_at, 0.0) * self._risk_decay)
+
+    def stats(self):
+        return {
+            'drivers': sum(len(states) for states in self._states),
+            'shards': len(self._states),
+            'events': self.events,
+            'forwarded': self.forwarded,
+            'forward_errors': self.forward_errors
+        }
+
+    def serve(self):
+        """Restore the snapshots and own the state: answer the events other processes forward on `socket_path`
+
+        Returns the number of drivers restored.
+        """
+        restored = self.restore_all() if self.snapshot_path else 0
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            os.unlink(self.socket_path)  # Left behind by a previous owner
+        except FileNotFoundError:
+            pass
+        listener.bind(self.socket_path)
+        listener.listen(128)
+        self._serving = True
+        threading.Thread(target=self._accept, args=(listener,), name='risk-stream-owner', daemon=True).start()
+        return restored
+
+    def snapshot(self, path):
+        """Write every driver's state to a SQLite file, atomically replacing the old one"""
+        temp_path = f"{path}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.execute(
+                'CREATE TABLE driver_risk_state (policyholder_id TEXT PRIMARY KEY, risk REAL, event_rate REAL, '
+                'updated_at REAL, counts TEXT, cooldowns TEXT)'
+            )
+            rows = 0
+            now = time.time()
+            for states, lock in zip(self._states, self._locks):
+                # Copy one shard at a time so writers are blocked only briefly
+                with lock:
+                    shard_rows = [
+                        (policyholder_id, state.risk, state.event_rate, state.updated_at,
+                         json.dumps(state.counts),
+                         json.dumps({event_type: until for event_type, until in state.cooldowns.items() if until > now}))
+                        for policyholder_id, state in states.items()
+                    ]
+                connection.executemany('INSERT INTO driver_risk_state VALUES (?, ?, ?, ?, ?, ?)', shard_rows)
+                rows += len(shard_rows)
+            connection.commit()
+        finally:
+            connection.close()
+
+        os.replace(temp_path, path)
+        return rows
+
+    def worker_snapshot_path(self):
+        """This process's snapshot file"""
+        return f"{self.snapshot_path}.worker-{os.getpid()}"
+
+    def restore_all(self):
+        """Merge the base snapshot and every worker's into this process, then compact them into the base
+
+        Returns the number of drivers. Called once per server start, by the
+        process that will hold the state, before any worker observes events.
+        Files of processes that are still running are merged but kept.
+        """
+        worker_paths = [path for path in glob.glob(f"{glob.escape(self.snapshot_path)}.worker-*")
+                        if not path.endswith('.tmp')]
+        for path in [self.snapshot_path] + worker_paths:
+            self.restore(path)
+        if worker_paths:
+            self.snapshot(self.snapshot_path)
+            for path in worker_paths:
+                if _process_alive(path.rsplit('.worker-', 1)[1]):
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # Compacted by another server starting at the same time
+        return self.stats()['drivers']
+
+    def restore(self, path):
+        """Load a snapshot written by snapshot(); returns the number of drivers
+
+        A driver already held keeps whichever state saw the latest event.
+        """
+        if not os.path.exists(path):
+            return 0
+
+        connection = sqlite3.connect(path)
+        try:
+            rows = connection.execute(
+                'SELECT policyholder_id, risk, event_rate, updated_at, counts, cooldowns FROM driver_risk_state'
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return 0  # Removed while being opened
+        finally:
+            connection.close()
+
+        for policyholder_id, risk, event_rate, updated_at, counts, cooldowns in rows:
+            states, lock = self._shard(policyholder_id)
+            with lock:
+                existing = states.get(policyholder_id)
+                if existing is None or existing.updated_at < updated_at:
+                    states[policyholder_id] = DriverRiskState(
+                        risk, event_rate, updated_at, json.loads(counts), json.loads(cooldowns)
+                    )
+        return len(rows)
+
+    def clear(self):
+        for states, lock in zip(self._states, self._locks):
+            with lock:
+                states.clear()
+
+    # Helper methods
+    @property
+    def _risk_decay(self):
+        return math.log(2) / self.half_life_seconds
+
+    @property
+    def _rate_decay(self):
+        return 1.0 / self.rate_window_seconds
+
+    def _resize(self, shards):
+        # Power of two, so the shard is a mask of the id hash
+        count = 1 << max(0, int(shards) - 1).bit_length()
+        self._states = [{} for _ in range(count)]
+        self._locks = [threading.Lock() for _ in range(count)]
+        self._mask = count - 1
+
+    def _shard(self, policyholder_id):
+        index = hash(policyholder_id) & self._mask
+        return self._states[index], self._locks[index]
+
+    def _accept(self, listener):
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                if self.logger is not None:
+                    self.logger.exception('Accepting on the risk stream socket %s failed', self.socket_path)
+                time.sleep(OWNER_TIMEOUT_SECONDS)
+                continue
+            threading.Thread(target=self._answer, args=(connection,), name='risk-stream-peer', daemon=True).start()
+
+    def _answer(self, connection):
+        # One line-delimited JSON request and reply per forwarded event, until the peer hangs up
+        try:
+            with connection, connection.makefile('rwb') as stream:
+                for line in stream:
+                    try:
+                        policyholder_id, event_type, severity, at = json.loads(line)
+                        reply = list(self.observe(policyholder_id, event_type, severity, float(at)))
+                    except (ValueError, TypeError):
+                        reply = None
+                    stream.write(json.dumps(reply).encode() + b'\n')
+                    stream.flush()
+        except OSError:
+            pass  # The worker went away; it reconnects on its next event
+
+    def _forward(self, policyholder_id, event_type, severity, at):
+        # The owner's update, or None after the owner failed to answer
+        request = json.dumps([policyholder_id, event_type, severity, at]).encode() + b'\n'
+        for attempt in range(2):  # A connection the owner closed is reopened once
+            try:
+                stream = getattr(self._local, 'stream', None)
+                if stream is None:
+                    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    connection.settimeout(OWNER_TIMEOUT_SECONDS)
+                    connection.connect(self.socket_path)
+                    stream = self._local.stream = connection.makefile('rwb')
+                    connection.close()  # The file keeps the socket open
+                stream.write(request)
+                stream.flush()
+                reply = stream.readline()
+                if not reply:
+                    raise ConnectionResetError('risk stream owner closed the connection')
+                values = json.loads(reply)
+                if values is None:
+                    raise ValueError(f"risk stream owner rejected {request!r}")
+                self.forwarded += 1
+                return RiskUpdate(*values)
+            except (OSError, ValueError):
+                self._disconnect()
+                if attempt:
+                    self.forward_errors += 1
+                    self._owner_down_until = time.monotonic() + OWNER_RETRY_SECONDS
+                    if self.logger is not None:
+                        self.logger.exception('Risk stream owner on %s did not answer; scoring locally for %ss',
+                                              self.socket_path, OWNER_RETRY_SECONDS)
+        return None
+
+    def _disconnect(self):
+        stream = getattr(self._local, 'stream', None)
+        self._local.stream = None
+        if stream is not None:
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def _start_snapshots(self):
+        # Started by the first event a process sees rather than at app creation, so a
+        # preloading server's master doesn't own the thread and every worker gets one
+        with self._snapshot_lock:
+            if self._snapshots_started:
+                return
+            self._snapshots_started = True
+        atexit.register(self._final_snapshot, os.getpid())
+        threading.Thread(target=self._snapshot_loop, name='risk-stream-snapshot', daemon=True).start()
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_seconds)
+            if not self.snapshot_path:
+                continue
+            path = self.worker_snapshot_path()
+            try:
+                self.snapshot(path)
+            except Exception:
+                if self.logger is not None:
+                    self.logger.exception('Live risk snapshot to %s failed', path)
+
+    def _final_snapshot(self, pid):
+        # atexit handlers are inherited across fork; only the process that registered this one snapshots
+        if os.getpid() == pid and self.snapshot_path:
+            self.snapshot(self.worker_snapshot_path())
+
+    def _forked(self):
+        # Threads don't survive fork: the child starts its own loop on its first event,
+        # and opens its own connections to the owner
+        self._snapshots_started = False
+        self._snapshot_lock = threading.Lock()
+        self._local = threading.local()
+
+risk_stream = RiskStream()
+os.register_at_fork(after_in_child=risk_stream._forked)
+
+def configure_risk_stream(app):
+    """Apply RISK_STREAM_* settings; snapshotting starts with the first event
+
+    Nothing is restored here, so CLI commands and the stream server's app
+    don't touch the snapshots: the state's owner calls serve() or
+    restore_all() once when the server starts (see the gunicorn configs).
+    """
+    risk_stream.half_life_seconds = app.config.get('RISK_STREAM_HALF_LIFE_SECONDS', risk_stream.half_life_seconds)
+    risk_stream.rate_window_seconds = app.config.get('RISK_STREAM_RATE_WINDOW_SECONDS', risk_stream.rate_window_seconds)
+    risk_stream.cooldown_seconds = app.config.get('RISK_STREAM_COOLDOWN_SECONDS', risk_stream.cooldown_seconds)
+    if 'RISK_STREAM_SHARDS' in app.config:
+        risk_stream._resize(app.config['RISK_STREAM_SHARDS'])
+
+    risk_stream.snapshot_path = app.config.get('RISK_STREAM_SNAPSHOT_PATH')
+    risk_stream.snapshot_seconds = app.config.get('RISK_STREAM_SNAPSHOT_SECONDS', risk_stream.snapshot_seconds)
+    risk_stream.socket_path = app.config.get('RISK_STREAM_SOCKET_PATH')
+    risk_stream.logger = app.logger
+
+def epoch_seconds(timestamp):
+    """Epoch seconds of an event timestamp: offsets are honored, naive values are UTC as stored"""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+# Helper functions
+def _process_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True  # Running under another user
+    return True
@@ -0,0 +1,283 @@
+from src.lazy import lazy_import
+from datetime import datetime
+import csv
+import json
+import math
+import os
+
+np = lazy_import('numpy')
+
+KM_PER_DEGREE = 111.195
+
+# Text severities in incident files, on the numeric 1-10 scale
+SEVERITY_LEVELS = {'low': 2.0, 'minor': 2.0, 'medium': 5.0, 'moderate': 5.0, 'high': 8.0, 'severe': 8.0, 'fatal': 10.0}
+DEFAULT_SEVERITY = 5.0
+
+# Datasets the API serves from local indexes
+INCIDENT_DATASETS = ('crime', 'accidents')
+
+class GridIndex:
+    """Points bucketed into a lat/lon grid, stored packed in cell order
+
+    `keys` holds the sorted ids of non-empty cells (row * cols + col) and
+    `starts` the offset of each cell's first point, so every grid row inside
+    a query's bounding box is one contiguous slice of the point arrays.
+    """
+
+    def __init__(self, lat, lon, keys, starts, cell_degrees):
+        self.lat = lat
+        self.lon = lon
+        self.keys = keys
+        self.starts = starts
+        self.cell_degrees = cell_degrees
+        self.cols = int(round(360 / cell_degrees))
+
+    @classmethod
+    def order(cls, lat, lon, cell_degrees):
+        """Permutation that packs points in cell order, with the cell keys and starts"""
+        cells = cell_ids(lat, lon, cell_degrees)
+        order = np.argsort(cells, kind='stable')
+        keys, starts = np.unique(cells[order], return_index=True)
+        return order, keys, np.append(starts, len(cells)).astype(np.int64)
+
+    def within(self, lat, lon, radius_km):
+        """Indexes of points within radius_km, with their distances in km"""
+        d_lat = radius_km / KM_PER_DEGREE
+        d_lon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        first_col = max(int((lon - d_lon + 180) // self.cell_degrees), 0)
+        last_col = min(int((lon + d_lon + 180) // self.cell_degrees), self.cols - 1)
+        first_row = max(int((lat - d_lat + 90) // self.cell_degrees), 0)
+        last_row = int((lat + d_lat + 90) // self.cell_degrees)
+
+        rows = np.arange(first_row, last_row + 1, dtype=np.int64) * self.cols
+        low = np.searchsorted(self.keys, rows + first_col, side='left')
+        high = np.searchsorted(self.keys, rows + last_col, side='right')
+        spans = [(self.starts[a], self.starts[b]) for a, b in zip(low, high) if b > a]
+        if not spans:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates = np.concatenate([np.arange(start, end) for start, end in spans])
+        # Equirectangular distances; accurate to well under 1% at these radii
+        dy = (np.asarray(self.lat[candidates], dtype=np.float64) - lat) * KM_PER_DEGREE
+        dx = (np.asarray(self.lon[candidates], dtype=np.float64) - lon) * KM_PER_DEGREE * math.cos(math.radians(lat))
+        distances = np.sqrt(dx * dx + dy * dy)
+        inside = distances <= radius_km
+        return candidates[inside], distances[inside]
+
+class IncidentIndex:
+    """Packed spatial index over one incident dataset, with precomputed hotspots
+
+    Incidents are stored in grid-cell order as flat NumPy arrays, saved as
+    .npy files and memory-mapped when loaded, so startup is instant and the
+    OS pages in only the cells that are queried. Hotspots are fine-grained
+    cells with at least `hotspot_min_count` incidents, indexed the same way.
+    """
+
+    def __init__(self, points, severity, kinds, kind_names, hotspots, hotspot_count, hotspot_severity, meta):
+        self.points = points
+        self.severity = severity
+        self.kinds = kinds
+        self.kind_names = kind_names
+        self.hotspots = hotspots
+        self.hotspot_count = hotspot_count
+        self.hotspot_severity = hotspot_severity
+        self.meta = meta
+        self._area_scale = None
+
+    @classmethod
+    def build(cls, lat, lon, severity, kinds, kind_names, cell_degrees=0.01, hotspot_degrees=0.002, hotspot_min_count=3):
+        """Index incident arrays; kinds are codes into kind_names"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        severity = np.asarray(severity, dtype=np.float32)
+        kinds = np.asarray(kinds, dtype=np.uint8)
+
+        order, keys, starts = GridIndex.order(lat, lon, cell_degrees)
+        points = GridIndex(lat[order].astype(np.float32), lon[order].astype(np.float32), keys, starts, cell_degrees)
+
+        # Hotspots: fine cells dense enough to call out, placed at their incidents' centroid
+        fine, inverse = np.unique(cell_ids(lat, lon, hotspot_degrees), return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(fine))
+        dense = counts >= hotspot_min_count
+        centroid_lat = (np.bincount(inverse, weights=lat) / counts)[dense]
+        centroid_lon = (np.bincount(inverse, weights=lon) / counts)[dense]
+        mean_severity = (np.bincount(inverse, weights=severity) / counts)[dense]
+        hotspot_order, hotspot_keys, hotspot_starts = GridIndex.order(centroid_lat, centroid_lon, cell_degrees)
+        hotspots = GridIndex(
+            centroid_lat[hotspot_order].astype(np.float32), centroid_lon[hotspot_order].astype(np.float32),
+            hotspot_keys, hotspot_starts, cell_degrees
+        )
+
+        # Density scale for risk: incidents per km2 in the busiest 1% of occupied cells
+        cell_rows = keys // points.cols
+        cell_lat = (cell_rows + 0.5) * cell_degrees - 90
+        cell_area = (cell_degrees * KM_PER_DEGREE) ** 2 * np.maximum(np.cos(np.radians(cell_lat)), 1e-6)
+        density = np.diff(starts) / cell_area
+
+        meta = {
+            'cell_degrees': cell_degrees,
+            'hotspot_degrees': hotspot_degrees,
+            'incidents': int(len(lat)),
+            'hotspots': int(dense.sum()),
+            'density_p99': float(np.percentile(density, 99)) if len(density) else 0.0,
+            'built_at': datetime.utcnow().isoformat()
+        }
+        return cls(points, severity[order], kinds[order], list(kind_names), hotspots,
+                   counts[dense][hotspot_order].astype(np.int32), mean_severity[hotspot_order].astype(np.float32), meta)
+
+    def save(self, directory):
+        """Write the index as .npy arrays plus meta.json"""
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            'lat': self.points.lat, 'lon': self.points.lon, 'keys': self.points.keys, 'starts': self.points.starts,
+            'severity': self.severity, 'kinds': self.kinds,
+            'hotspot_lat': self.hotspots.lat, 'hotspot_lon': self.hotspots.lon,
+            'hotspot_keys': self.hotspots.keys, 'hotspot_starts': self.hotspots.starts,
+            'hotspot_count': self.hotspot_count, 'hotspot_severity': self.hotspot_severity
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(directory, 'meta.json'), 'w') as meta_file:
+            json.dump(dict(self.meta, kind_names=self.kind_names), meta_file)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open an index written by save(), memory-mapped unless mmap is False"""
+        with open(os.path.join(directory, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+        mode = 'r' if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode, allow_pickle=False)
+
+        cell_degrees = meta['cell_degrees']
+        # The small lookup arrays are read into memory; point arrays stay mapped
+        points = GridIndex(array('lat'), array('lon'), np.array(array('keys')), np.array(array('starts')), cell_degrees)
+        hotspots = GridIndex(array('hotspot_lat'), array('hotspot_lon'), np.array(array('hotspot_keys')),
+                             np.array(array('hotspot_starts')), cell_degrees)
+        return cls(points, array('severity'), array('kinds'), meta.pop('kind_names'), hotspots,
+                   array('hotspot_count'), array('hotspot_severity'), meta)
+
+    def query(self, lat, lon, radius_km, hotspots=3):
+        """Incident count, severity aggregates, counts by type and nearest hotspots within a radius"""
+        _check_radius(radius_km)
+        found, _ = self.points.within(lat, lon, radius_km)
+        severity = np.asarray(self.severity[found], dtype=np.float64)
+        by_kind = np.bincount(np.asarray(self.kinds[found]), minlength=len(self.kind_names))
+
+        nearby, distances = self.hotspots.within(lat, lon, radius_km)
+        nearest = np.argsort(distances, kind='stable')[:hotspots]
+        return {
+            'count': int(len(found)),
+            'severity_avg': round(float(severity.mean()), 2) if len(found) else None,
+            'severity_max': float(severity.max()) if len(found) else None,
+            'by_type': {name: int(count) for name, count in zip(self.kind_names, by_kind) if count},
+            'density_per_km2': round(len(found) / (math.pi * radius_km ** 2), 3),
+            'hotspots': [{
+                'lat': round(float(self.hotspots.lat[i]), 5),
+                'lon': round(float(self.hotspots.lon[i]), 5),
+                'incident_count': int(self.hotspot_count[i]),
+                'severity_avg': round(float(self.hotspot_severity[i]), 2),
+                'distance_km': round(float(distance), 3)
+            } for i, distance in zip(nearby[nearest], distances[nearest])]
+        }
+
+    def density_risk(self, lat, lon, radius_km=1.0):
+        """Incident density around a point scaled to 0-1 against the dataset's busiest cells"""
+        _check_radius(radius_km)
+        found, _ = self.points.within(lat, lon, radius_km)
+        scale = self.meta['density_p99']
+        if not scale:
+            return 0.0
+        return min(len(found) / (math.pi * radius_km ** 2) / scale, 1.0)
+
+    def area_risk(self, lat, lon):
+        """Incident density in the 3x3 grid cells around each point, 0-1 against the busiest areas
+
+        Vectorized over arrays of points; the scale is the 99th percentile of
+        the same density over every occupied cell, computed on first use.
+        """
+        if self._area_scale is None:
+            occupied = self._area_density(self.points.keys)
+            self._area_scale = float(np.percentile(occupied, 99)) if len(occupied) else 0.0
+        # Traces revisit the same few cells, so look each one up once
+        cells, inverse = np.unique(cell_ids(np.atleast_1d(lat), np.atleast_1d(lon), self.points.cell_degrees),
+                                   return_inverse=True)
+        if not self._area_scale:
+            return np.zeros(len(inverse))
+        return np.minimum(self._area_density(cells) / self._area_scale, 1.0)[inverse.ravel()]
+
+    # Helper methods
+    def _area_density(self, cells):
+        keys, cols, cell_degrees = self.points.keys, self.points.cols, self.points.cell_degrees
+        counts = np.diff(self.points.starts)
+        total = np.zeros(len(cells))
+        for row_offset in (-cols, 0, cols):
+            for col_offset in (-1, 0, 1):
+                neighbors = cells + row_offset + col_offset
+                positions = np.minimum(np.searchsorted(keys, neighbors), len(keys) - 1)
+                total += np.where(keys[positions] == neighbors, counts[positions], 0)
+        cell_lat = (cells // cols + 0.5) * cell_degrees - 90
+        area = 9 * (cell_degrees * KM_PER_DEGREE) ** 2 * np.maximum(np.cos(np.radians(cell_lat)), 1e-6)
+        return total / area
+
+# dataset -> loaded IncidentIndex
+incident_indexes = {}
+
+def configure_incident_indexes(app):
+    """Memory-map the incident indexes under INCIDENT_INDEX_DIR, if any were built"""
+    directory = app.config.get('INCIDENT_INDEX_DIR')
+    if not directory:
+        return
+    for dataset in INCIDENT_DATASETS:
+        path = os.path.join(directory, dataset)
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            incident_indexes[dataset] = IncidentIndex.load(path)
+            app.logger.info('Loaded %s index with %d incidents from %s',
+                            dataset, incident_indexes[dataset].meta['incidents'], path)
+
+def read_incidents(path):
+    """Read an incident CSV with latitude, longitude and optional type and severity columns
+
+    Returns (lat, lon, severity, kinds, kind_names). Severities may be
+    numeric (1-10) or words such as low/medium/high/fatal; rows without
+    coordinates are skipped.
+    """
+    lat, lon, severity, kinds = [], [], [], []
+    kind_codes = {}
+    with open(path, newline='') as incident_file:
+        for row in csv.DictReader(incident_file):
+            try:
+                point = float(row['latitude']), float(row['longitude'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            lat.append(point[0])
+            lon.append(point[1])
+            severity.append(_severity(row.get('severity')))
+            kind = (row.get('type') or 'unknown').strip().lower()
+            kinds.append(kind_codes.setdefault(kind, len(kind_codes)))
+
+    if len(kind_codes) > 255:
+        raise ValueError(f"{path} has {len(kind_codes)} incident types; at most 255 are supported")
+    return (np.array(lat), np.array(lon), np.array(severity, dtype=np.float32),
+            np.array(kinds, dtype=np.uint8), list(kind_codes))
+
+def cell_ids(lat, lon, cell_degrees):
+    """Grid cell id (row * cols + col) of each point"""
+    cols = int(round(360 / cell_degrees))
+    rows = np.floor((np.asarray(lat) + 90) / cell_degrees).astype(np.int64)
+    columns = np.clip(np.floor((np.asarray(lon) + 180) / cell_degrees).astype(np.int64), 0, cols - 1)
+    return rows * cols + columns
+
+# Helper functions
+def _check_radius(radius_km):
+    if not radius_km > 0:
+        raise ValueError(f"radius_km must be positive, got {radius_km}")
+
+def _severity(value):
+    if value is None or not value.strip():
+        return DEFAULT_SEVERITY
+    try:
+        return float(value)
+    except ValueError:
+        return SEVERITY_LEVELS.get(value.strip().lower(), DEFAULT_SEVERITY)
@@ -0,0 +1,181 @@
+from src.models.telematics import HistoricalWeather, db
+from src.services.contextual_risk import WEATHER_CONDITIONS, WEATHER_RISK
+from src.services.spatial_index import cell_ids
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import csv
+import threading
+import time
+
+# Weather is recorded per cell of this grid (about 28 km) and UTC hour
+WEATHER_CELL_DEGREES = 0.25
+
+class WeatherHistory:
+    """Cached reads of the historical weather store, by grid cell and hour
+
+    Lookups are cached by cell and UTC day. A trip's cache misses, every cell
+    and day it touches, are read in one query and every hour of those days is
+    cached, hours without records included, so trips in one city over a week
+    cost a handful of store reads however many there are. Entries expire
+    after `ttl_seconds`, which bounds how long a running server takes to see
+    a new import.
+    """
+
+    def __init__(self, max_days=4096, ttl_seconds=3600):
+        self.max_days = max_days
+        self.ttl_seconds = ttl_seconds
+        self.reads = 0
+        self.hits = 0
+        self._days = OrderedDict()  # (cell, day) -> ({hour: weather_conditions}, expires_at)
+        self._lock = threading.Lock()
+
+    def trip_conditions(self, points):
+        """Worst recorded weather over a trip's (lat, lon, timestamp) points, or None"""
+        hours = self._cell_hours(points)
+        days = self._load({(cell, hour.replace(hour=0)) for cell, hour in hours})
+        recorded = {days[(cell, hour.replace(hour=0))].get(hour) for cell, hour in hours}
+        recorded.discard(None)
+        return max(recorded, key=WEATHER_RISK.get) if recorded else None
+
+    def prefetch(self, points):
+        """Cache the weather for many trips' (lat, lon, timestamp) points with one store read"""
+        self._load({(cell, hour.replace(hour=0)) for cell, hour in self._cell_hours(points)})
+
+    def conditions_at(self, cell, hour):
+        """Recorded weather in a cell for a UTC hour, or None"""
+        key = (cell, hour.replace(hour=0))
+        return self._load({key})[key].get(hour)
+
+    def stats(self):
+        with self._lock:
+            return {'cached_days': len(self._days), 'max_days': self.max_days, 'reads': self.reads, 'hits': self.hits}
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+
+    # Helper methods
+    def _cell_hours(self, points):
+        if not points:
+            return set()
+        lat, lon, timestamps = zip(*points)
+        cells = cell_ids(lat, lon, WEATHER_CELL_DEGREES).tolist()
+        return set(zip(cells, map(utc_hour, timestamps)))
+
+    def _load(self, keys):
+        # {(cell, day): {hour: conditions}}; all cache misses are read in one query
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                cached = self._days.get(key)
+                if cached is not None and cached[1] >= now:
+                    self._days.move_to_end(key)
+                    self.hits += 1
+                    found[key] = cached[0]
+                else:
+                    missing.append(key)
+        if not missing:
+            return found
+
+        # Every missing cell over the missing days' span: a superset, filtered below
+        loaded = {key: {} for key in missing}
+        first = min(day for _, day in missing)
+        last = max(day for _, day in missing)
+        rows = db.session.execute(
+            db.select(HistoricalWeather.cell, HistoricalWeather.hour, HistoricalWeather.weather_conditions)
+            .where(HistoricalWeather.cell.in_(sorted({cell for cell, _ in missing})),
+                   HistoricalWeather.hour >= first, HistoricalWeather.hour < last + timedelta(days=1))
+        )
+        for cell, hour, conditions in rows:
+            hours = loaded.get((cell, hour.replace(hour=0)))
+            if hours is not None:
+                hours[hour] = conditions
+
+        with self._lock:
+            self.reads += 1
+            expires_at = time.monotonic() + self.ttl_seconds
+            for key, hours in loaded.items():
+                self._days[key] = (hours, expires_at)
+                self._days.move_to_end(key)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        found.update(loaded)
+        return found
+
+weather_history = WeatherHistory()
+
+def configure_weather_history(app):
+    """Apply HISTORICAL_WEATHER_CACHE_* settings from the app config"""
+    weather_history.max_days = app.config.get('HISTORICAL_WEATHER_CACHE_DAYS', weather_history.max_days)
+    weather_history.ttl_seconds = app.config.get('HISTORICAL_WEATHER_CACHE_TTL_SECONDS', weather_history.ttl_seconds)
+
+def import_weather(path, chunk_size=5000):
+    """Load an hourly weather CSV into the store, replacing existing (cell, hour) records
+
+    Columns: latitude, longitude, timestamp, conditions (a WEATHER_RISK
+    condition or a provider weather_main such as Rain or Snow), and optional
+    temperature_c and precipitation_mm. Readings in the same cell and hour
+    are merged, keeping the worst conditions. Returns (records, skipped rows).
+    """
+    readings, skipped = [], 0
+    with open(path, newline='') as weather_file:
+        for row in csv.DictReader(weather_file):
+            try:
+                point = float(row['latitude']), float(row['longitude'])
+                hour = utc_hour(datetime.fromisoformat(row['timestamp'].replace('Z', '+00:00')))
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            conditions = _conditions(row.get('conditions'))
+            if conditions is None:
+                skipped += 1
+                continue
+            readings.append((point, hour, conditions,
+                             _number(row.get('temperature_c')), _number(row.get('precipitation_mm'))))
+
+    cells = cell_ids([reading[0][0] for reading in readings], [reading[0][1] for reading in readings],
+                     WEATHER_CELL_DEGREES).tolist()
+    records = {}
+    for cell, (_, hour, conditions, temperature_c, precipitation_mm) in zip(cells, readings):
+        current = records.get((cell, hour))
+        if current is None or WEATHER_RISK[conditions] > WEATHER_RISK[current['weather_conditions']]:
+            records[(cell, hour)] = {
+                'cell': cell,
+                'hour': hour,
+                'weather_conditions': conditions,
+                'temperature_c': temperature_c,
+                'precipitation_mm': precipitation_mm
+            }
+
+    keys = list(records)
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        db.session.execute(db.delete(HistoricalWeather).where(
+            db.tuple_(HistoricalWeather.cell, HistoricalWeather.hour).in_(chunk)
+        ))
+        db.session.execute(db.insert(HistoricalWeather), [records[key] for key in chunk])
+        db.session.commit()
+    weather_history.clear()
+    return len(records), skipped
+
+def utc_hour(timestamp):
+    """Naive UTC datetime truncated to the hour; naive timestamps are taken as UTC"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+# Helper functions
+def _conditions(value):
+    value = (value or '').strip()
+    if value.lower() in WEATHER_RISK:
+        return value.lower()
+    if value == 'Rain':
+        return 'light_rain'
+    return WEATHER_CONDITIONS.get(value)
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,8 @@
+"""WSGI entry point for production servers: gunicorn -c gunicorn.conf.py src.wsgi:app"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import create_app
+
+app = create_app(os.environ.get('APP_ENV', 'production'))
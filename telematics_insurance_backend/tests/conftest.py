@@ -0,0 +1,76 @@
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from src.main import create_app
+from src.models.telematics import (
+    Policyholder, PolicyholderAchievement, RawTelematicsData, RiskScoreHistory, Trip, db
+)
+from src.services.points import post_points
+from src.services.query_budget import count_queries
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: starts fresh interpreters; deselect with -m "not slow"')
+
+@pytest.fixture
+def app():
+    """Testing app on a fresh in-memory database"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def queries():
+    """count_queries, for counting the SQL a block runs: `with queries() as log: ...`"""
+    return count_queries
+
+@pytest.fixture
+def seed_book(app):
+    """Seed `policyholders` drivers with `trips` trips each, plus raw samples, risk history, awards and points"""
+    def seed(policyholders, trips):
+        now = datetime.utcnow()
+        book = {'policyholder_ids': [], 'trip_ids': []}
+        for i in range(policyholders):
+            policyholder = Policyholder(
+                first_name=f"Driver{i}", last_name='Test', date_of_birth=date(1980 + i % 20, 1, 15),
+                address=f"{i} Main St, Springfield, IL 62701", vehicle_make=('Toyota', 'Honda')[i % 2],
+                vehicle_model='Camry', vehicle_year=2015 + i % 8, risk_score_current=round(0.2 + i % 7 * 0.1, 2)
+            )
+            db.session.add(policyholder)
+            db.session.flush()
+            book['policyholder_ids'].append(policyholder.id)
+
+            for j in range(trips):
+                start = now - timedelta(hours=2 * j + 1)
+                trip = Trip(
+                    policyholder_id=policyholder.id, start_timestamp=start, end_timestamp=start + timedelta(minutes=30),
+                    duration_seconds=1800, distance_km=12.0 + j, avg_speed_kph=42.0, max_speed_kph=90,
+                    harsh_braking_count=j % 3, night_driving_minutes=j % 5, peak_hour_driving_minutes=10,
+                    route_geometry='{"type": "LineString", "coordinates": [[-89.65, 39.78], [-89.6, 39.8]]}'
+                )
+                db.session.add(trip)
+                db.session.add_all(RawTelematicsData(
+                    device_id=f"device-{i}", policyholder_id=policyholder.id, timestamp=start + timedelta(minutes=k),
+                    latitude=39.78 + k * 0.001, longitude=-89.65 + k * 0.001, speed_kph=40 + k, acceleration_x=0.1
+                ) for k in range(4))
+                db.session.flush()
+                book['trip_ids'].append(trip.id)
+
+            db.session.add(RiskScoreHistory(policyholder_id=policyholder.id, score_date=date.today(),
+                                            risk_score=policyholder.risk_score_current, premium_adjustment=0.0))
+            db.session.add(PolicyholderAchievement(policyholder_id=policyholder.id, achievement_id='smooth_operator'))
+            post_points([{'policyholder_id': policyholder.id, 'entry_type': 'achievement',
+                          'reference': f"smooth_operator:{policyholder.id}", 'points': 50}])
+        db.session.commit()
+        return book
+    return seed
@@ -0,0 +1,29 @@
+from src.models.telematics import PointsLedgerEntry, db
+from src.services.achievements import ACHIEVEMENT_RULES, award_achievements
+from src.services.premium_simulation import snapshot_book
+
+def earned_ids(client, policyholder_id):
+    return {award['id'] for award in client.get(f"/api/achievements/{policyholder_id}").get_json()}
+
+def test_score_update_awards_achievements_without_the_batch(client, seed_book):
+    policyholder_id = seed_book(1, 1)['policyholder_ids'][0]
+    assert 'safe_driver' not in earned_ids(client, policyholder_id)
+
+    response = client.put(f"/api/policyholders/{policyholder_id}", json={'risk_score_current': 0.1})
+    assert response.status_code == 200
+
+    assert 'safe_driver' in earned_ids(client, policyholder_id)
+    references = db.session.execute(db.select(PointsLedgerEntry.reference).where(
+        PointsLedgerEntry.policyholder_id == policyholder_id, PointsLedgerEntry.entry_type == 'achievement')).scalars()
+    assert 'safe_driver' in set(references)
+
+def test_award_is_made_once_across_updates_and_the_batch(client, seed_book):
+    policyholder_id = seed_book(1, 1)['policyholder_ids'][0]
+    client.put(f"/api/policyholders/{policyholder_id}", json={'risk_score_current': 0.1})
+    client.put(f"/api/policyholders/{policyholder_id}", json={'risk_score_current': 0.15})
+
+    counts = award_achievements(ACHIEVEMENT_RULES, snapshot_book())
+
+    assert counts['safe_driver'] == 0
+    awards = client.get(f"/api/achievements/{policyholder_id}").get_json()
+    assert [award['id'] for award in awards].count('safe_driver') == 1
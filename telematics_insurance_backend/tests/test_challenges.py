@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from src.models.telematics import ChallengeProgress, db
+from src.services.challenges import CHALLENGES, ChallengeTracker, rebuild_progress
+
+START = datetime(2025, 3, 3, 8, 0)
+
+def trip(day, harsh=0):
+    return SimpleNamespace(policyholder_id='PH-1', start_timestamp=START + timedelta(days=day), duration_seconds=1800,
+                           distance_km=20.0, harsh_braking_count=harsh, rapid_acceleration_count=0,
+                           harsh_cornering_count=0, night_driving_minutes=0)
+
+def drive(days, harsh_days=()):
+    """Record one trip a day; returns {day: [(challenge_id, window_start), ...]} for the completions"""
+    tracker = ChallengeTracker({'week_without_harsh_events': CHALLENGES['week_without_harsh_events']})
+    states, completions = {}, {}
+    for day in days:
+        completed = tracker.record_trip(trip(day, harsh=int(day in harsh_days)), None, states)
+        if completed:
+            completions[day] = [(challenge_id, window_start.date()) for challenge_id, window_start, _ in completed]
+    return completions
+
+def test_rolling_challenge_completes_again_a_full_week_after_completion():
+    completions = drive(range(21))
+
+    assert completions == {
+        6: [('week_without_harsh_events', START.date())],
+        13: [('week_without_harsh_events', (START + timedelta(days=6)).date())],
+        20: [('week_without_harsh_events', (START + timedelta(days=13)).date())]
+    }
+
+def test_harsh_event_after_completion_delays_the_next_one():
+    completions = drive(range(21), harsh_days={10})
+
+    # Re-armed on day 13, but the trailing week is only clean again from day 11 to day 17
+    assert sorted(completions) == [6, 17]
+
+def test_harsh_event_days_are_kept_for_the_whole_trailing_period():
+    tracker = ChallengeTracker({'fortnight': dict(CHALLENGES['week_without_harsh_events'], duration_days=14)})
+    states = {}
+    for day in range(13):
+        tracker.record_trip(trip(day, harsh=int(day in (2, 10))), None, states)
+
+    # Both event days fall in the trailing fortnight on day 12
+    progress = tracker.progress('fortnight', states['fortnight'], None, START + timedelta(days=12))
+    assert progress['current'] == 11
+
+def test_rebuild_reads_risk_scores_once_and_applies_the_risk_limit(app, seed_book, queries):
+    book = seed_book(3, 3)
+
+    with queries() as log:
+        assert rebuild_progress(ChallengeTracker(CHALLENGES)) == 9
+    assert len([statement for statement in log.statements if 'FROM policyholders' in statement]) == 1
+
+    distances = dict(db.session.execute(
+        db.select(ChallengeProgress.policyholder_id, ChallengeProgress.distance_km)
+        .where(ChallengeProgress.challenge_id == 'mileage_master')
+    ).all())
+    # Risk scores are 0.2, 0.3 and 0.4; only drivers within mileage_master's 0.3 limit count distance
+    assert [distances[policyholder_id] for policyholder_id in book['policyholder_ids']] == [39.0, 39.0, 0.0]
@@ -0,0 +1,62 @@
+from datetime import date
+from types import SimpleNamespace
+
+from src.models.telematics import Policyholder, db
+from src.services.cohorts import CohortLeaderboards, region
+
+def add_drivers(drivers):
+    """drivers: {name: (risk score, address)}"""
+    added = {}
+    for name, (score, address) in drivers.items():
+        added[name] = Policyholder(first_name=name, last_name='Driver', date_of_birth=date(1985, 1, 1), address=address,
+                                   vehicle_make='Toyota', vehicle_model='Camry', risk_score_current=score)
+        db.session.add(added[name])
+    db.session.commit()
+    return added
+
+def names(rows):
+    return [row['name'][0] for row in rows]
+
+def test_region_is_the_state_before_the_zip_code():
+    assert region(SimpleNamespace(address='1 Main St, Springfield, IL 62701'), None) == 'IL'
+    assert region(SimpleNamespace(address='9 Elm St, Peoria, il 61602-1234'), None) == 'IL'
+    assert region(SimpleNamespace(address='1 Illinois Ave, Springfield'), None) is None
+
+def test_short_region_board_refills_from_the_database(app):
+    drivers = add_drivers({
+        'A': (0.1, '1 Main St, Springfield, IL 62701'),
+        'B': (0.2, '2 Main St, Springfield, IL 62701'),
+        'C': (0.3, '3 Main St, Peoria, IL 61602'),
+        'D': (0.4, '4 Main St, Peoria, IL 61602'),
+        'E': (0.5, '5 Main St, Chicago, IL 60601')
+    })
+    boards = CohortLeaderboards(k=2, slack=0)
+    assert names(boards.board('region', 'IL')) == ['A', 'B']
+
+    for name in 'AB':
+        drivers[name].risk_score_current = 0.9
+    db.session.commit()
+    for name in 'AB':
+        boards.apply_change(drivers[name].id)
+
+    # Both fell past the tail of the partial board, so it refills from a query
+    assert names(boards.board('region', 'IL')) == ['C', 'D']
+
+def test_refill_keeps_only_addresses_whose_region_matches(app):
+    drivers = add_drivers({
+        'A': (0.1, '1 Main St, Springfield, IL 62701'),
+        'B': (0.2, '2 Main St, Springfield, IL 62701'),
+        'C': (0.3, '3 Main St, Peoria, IL 61602'),
+        # LIKE '%IL%' matches these, but they are in other regions
+        'M': (0.05, '1 Illinois Ave, Springfield, MO 65801'),
+        'N': (0.06, '8 Hill Rd, Nashville, TN 37201')
+    })
+    boards = CohortLeaderboards(k=2, slack=0)
+    boards.board('region', 'IL')
+
+    drivers['A'].risk_score_current = 0.9
+    db.session.commit()
+    boards.apply_change(drivers['A'].id)
+
+    assert names(boards.board('region', 'IL')) == ['B', 'C']
+    assert names(boards.board('region', 'MO')) == ['M']
@@ -0,0 +1,189 @@
+import socket
+import threading
+import time
+from unittest import mock
+
+import pytest
+import requests
+from benchmarks.fake_context_server import start_fake_server
+from src.services.context_clients import (
+    BudgetExhaustedError, CircuitBreaker, CircuitOpenError, FanOut, ProviderClient, ProviderError, SingleFlight,
+    latency_budget, remaining_budget
+)
+from src.services.external_context import configure_context_cache, context_cache
+
+@pytest.fixture
+def fake_server():
+    """The benchmarks' fake provider gateway, answering weather after 0.3s"""
+    server, url = start_fake_server({'weather': 0.3})
+    yield url
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def dead_url():
+    """A local URL nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(2)
+        return {'temperature': 21}
+
+    results = []
+    callers = [threading.Thread(target=lambda: results.append(flight.do('weather:9zmv', call))) for _ in range(4)]
+    for caller in callers:
+        caller.start()
+    wait_for(lambda: flight.coalesced == 3)
+    release.set()
+    for caller in callers:
+        caller.join(2)
+
+    assert len(calls) == 1
+    assert results == [{'temperature': 21}] * 4
+    # The key is free again once the call returns
+    assert flight.do('weather:9zmv', lambda: 'fresh') == 'fresh'
+
+def test_single_flight_shares_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(2)
+        raise ConnectionError('provider down')
+
+    errors = []
+    def caller():
+        try:
+            flight.do('traffic', failing)
+        except ConnectionError as error:
+            errors.append(error)
+
+    callers = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in callers:
+        thread.start()
+    wait_for(lambda: flight.coalesced == 2)
+    release.set()
+    for thread in callers:
+        thread.join(2)
+
+    assert len(errors) == 3 and len({id(error) for error in errors}) == 1
+
+def test_fan_out_runs_lookups_with_the_callers_budget():
+    fanout = FanOut(max_workers=4, timeout_seconds=5.0)
+    assert fanout.run({'weather': remaining_budget})[0]['weather'] is None
+
+    with latency_budget(0.2):
+        started = time.monotonic()
+        results, errors = fanout.run({
+            'weather': remaining_budget,
+            'traffic': lambda: time.sleep(1.0)
+        })
+        elapsed = time.monotonic() - started
+
+    # Lookups see what is left of the caller's budget, and the fan-out stops waiting when it runs out
+    assert 0 < results['weather'] <= 0.2
+    assert isinstance(errors['traffic'], TimeoutError)
+    assert elapsed < 0.5
+
+def test_fan_out_reports_failed_lookups_separately():
+    fanout = FanOut(max_workers=2, timeout_seconds=1.0)
+
+    def failing():
+        raise ValueError('bad payload')
+
+    results, errors = fanout.run({'crime': lambda: {'incidents': 3}, 'accidents': failing})
+
+    assert results == {'crime': {'incidents': 3}}
+    with pytest.raises(ValueError):
+        raise errors['accidents']
+
+def test_slow_provider_times_out(fake_server):
+    client = ProviderClient('weather', fake_server, timeout=0.05)
+    with pytest.raises(ProviderError, match='timeout'):
+        client.get_json('weather', lat=39.78, lon=-89.65)
+    assert client.stats()['errors'] == {'timeout': 1}
+    assert client.get_json('traffic', origin_lat=39.78, origin_lon=-89.65, dest_lat=39.8, dest_lon=-89.6)['traffic_conditions']
+
+def test_breaker_opens_after_repeated_failures(dead_url):
+    client = ProviderClient('traffic', dead_url, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    for _ in range(2):
+        with pytest.raises(ProviderError, match='connection'):
+            client.get_json('traffic')
+    with pytest.raises(CircuitOpenError):
+        client.get_json('traffic')
+
+    stats = client.stats()
+    assert (stats['calls'], stats['circuit'], stats['circuit_opened']) == (2, 'open', 1)
+    assert stats['errors'] == {'connection': 2, 'circuit_open': 1}
+
+def test_failed_half_open_trial_reopens_the_breaker(fake_server):
+    client = ProviderClient('crime', fake_server, breaker=CircuitBreaker(failure_threshold=1, reset_seconds=0.05))
+    with mock.patch.object(client.session, 'get', side_effect=requests.TooManyRedirects('redirect loop')):
+        with pytest.raises(ProviderError, match='request'):
+            client.get_json('crime', lat=39.78, lon=-89.65)
+        time.sleep(0.06)
+        # The trial fails the same way; the breaker must open again rather than wait on the trial forever
+        with pytest.raises(ProviderError, match='request'):
+            client.get_json('crime', lat=39.78, lon=-89.65)
+        assert client.breaker.state == 'open'
+        with pytest.raises(CircuitOpenError):
+            client.get_json('crime', lat=39.78, lon=-89.65)
+
+    time.sleep(0.06)
+    assert client.get_json('crime', lat=39.78, lon=-89.65)['crime_statistics']
+    assert client.breaker.state == 'closed'
+    assert client.stats()['errors'] == {'request': 2, 'circuit_open': 1}
+
+def test_calls_stop_when_the_latency_budget_is_spent(fake_server):
+    client = ProviderClient('weather', fake_server, timeout=2.0)
+    with latency_budget(0):
+        with pytest.raises(BudgetExhaustedError):
+            client.get_json('weather', lat=39.78, lon=-89.65)
+    assert client.calls == 0
+
+    # A call in flight is cut to what is left of the budget rather than the client timeout
+    started = time.monotonic()
+    with latency_budget(0.1):
+        with pytest.raises(ProviderError, match='timeout'):
+            client.get_json('weather', lat=39.78, lon=-89.65)
+    assert time.monotonic() - started < 0.3
+    assert client.stats()['errors'] == {'budget': 1, 'timeout': 1}
+
+@pytest.fixture
+def http_context(app):
+    """Fetch weather and traffic over HTTP from the given URL, restoring the stub provider afterwards"""
+    def configure(url):
+        app.config['EXTERNAL_CONTEXT_URLS'] = {'weather': url, 'traffic': url}
+        configure_context_cache(app)
+        context_cache.clear()
+    yield configure
+    app.config.pop('EXTERNAL_CONTEXT_URLS')
+    configure_context_cache(app)
+    context_cache.clear()
+
+def test_contextual_risk_falls_back_to_default_factors(client, http_context, dead_url):
+    http_context(dead_url)
+    response = client.post('/api/contextual-risk', json={
+        'lat': 39.78, 'lon': -89.65, 'time_of_day': '12:00', 'day_of_week': 'Wednesday'
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['fallbacks'] == ['traffic', 'weather']
+    # Neutral weather risk and time-of-day traffic
+    assert (body['risk_factors']['weather_risk'], body['risk_factors']['traffic_risk']) == (0.3, 0.3)
@@ -0,0 +1,30 @@
+import pytest
+
+POINTS = [
+    {'lat': 41.8781, 'lon': -87.6298, 'timestamp': '2025-09-12T22:05:00Z'},
+    {'lat': 41.8802, 'lon': -87.6251, 'timestamp': '2025-09-12T22:05:04Z'}
+]
+
+def score(client, **body):
+    return client.post('/api/contextual-risk/batch', json=dict({'points': POINTS, 'weather_conditions': 'light_rain'}, **body))
+
+def test_batch_scores_every_point_in_local_time(client):
+    utc = score(client).get_json()
+    local = score(client, utc_offset_minutes=-300).get_json()
+
+    # 22:05 UTC on a Friday is night; 17:05 in UTC-5 is the evening rush hour
+    assert utc['points']['time_risk'] == [0.9, 0.9] and utc['points']['traffic_risk'] == [0.2, 0.2]
+    assert local['points']['time_risk'] == [0.7, 0.7] and local['points']['traffic_risk'] == [0.6, 0.6]
+    assert local['points']['timestamp'] == ['2025-09-12T22:05:00', '2025-09-12T22:05:04']
+    assert local['summary']['points'] == 2 and local['summary']['duration_seconds'] == 4.0
+
+@pytest.mark.parametrize('offset', ['UTC-5', None, [60], 841, -900])
+def test_batch_rejects_bad_utc_offsets(client, offset):
+    response = score(client, utc_offset_minutes=offset)
+    assert response.status_code == 400
+    assert 'utc_offset_minutes' in response.get_json()['error']
+
+def test_batch_rejects_malformed_points(client):
+    response = client.post('/api/contextual-risk/batch', json={'points': [{'lat': 41.8}]})
+    assert response.status_code == 400
+    assert client.post('/api/contextual-risk/batch', json={}).status_code == 400
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from src.models.telematics import Trip, db
+from src.services.dashboard import dashboard_cache
+
+def test_unchanged_dashboard_revalidates_with_one_query(client, seed_book, queries):
+    policyholder_id = seed_book(1, 3)['policyholder_ids'][0]
+    first = client.get(f"/api/dashboard/{policyholder_id}")
+    assert first.status_code == 200
+    assert all('route_geometry' not in trip for trip in first.get_json()['recent_trips'])
+
+    with queries() as log:
+        again = client.get(f"/api/dashboard/{policyholder_id}", headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert log.count == 1
+
+def test_trip_written_by_another_worker_changes_the_etag(client, seed_book):
+    policyholder_id = seed_book(1, 3)['policyholder_ids'][0]
+    first = client.get(f"/api/dashboard/{policyholder_id}")
+    stale = dashboard_cache.get(policyholder_id)
+
+    start = datetime.utcnow()
+    db.session.add(Trip(policyholder_id=policyholder_id, start_timestamp=start, end_timestamp=start + timedelta(minutes=10),
+                        duration_seconds=600, distance_km=5.0, avg_speed_kph=30.0, max_speed_kph=60))
+    db.session.commit()
+    # Another process never saw the invalidation: its cache still holds the old entry
+    dashboard_cache.put(policyholder_id, stale.body, stale.last_modified, stale.version)
+
+    second = client.get(f"/api/dashboard/{policyholder_id}", headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.get_json()['summary']['total_trips'] == 4
+
+def test_unknown_policyholder_is_not_found(client):
+    assert client.get('/api/dashboard/PH-missing').status_code == 404
@@ -0,0 +1,13 @@
+import pytest
+
+@pytest.mark.parametrize('chunk_size', [0, -5])
+def test_export_rejects_chunk_size_below_one(client, chunk_size):
+    response = client.get(f"/api/export/trips?format=ndjson&chunk_size={chunk_size}")
+    assert response.status_code == 400
+    assert 'chunk_size' in response.get_json()['error']
+
+def test_export_streams_with_chunk_size_one(client, seed_book):
+    seed_book(1, 3)
+    response = client.get('/api/export/trips?format=ndjson&chunk_size=1')
+    assert response.status_code == 200
+    assert len(response.get_data(as_text=True).splitlines()) == 3
@@ -0,0 +1,88 @@
+import time
+from unittest import mock
+
+from src.models.serializers import dumps
+from src.services.external_context import ContextCache, ContextSource, geohash_decode, geohash_encode
+
+SPRINGFIELD = (39.7817, -89.6501)
+
+class FakeProvider:
+    """Counts fetches; each answer carries the current `version`"""
+
+    def __init__(self):
+        self.calls = 0
+        self.version = 1
+
+    def weather(self, lat, lon, **params):
+        self.calls += 1
+        return {'lat': round(lat, 4), 'version': self.version, 'padding': 'x' * 100}
+
+def make_cache(**options):
+    source = ContextSource('weather', 'weather', precision=5, bucket_seconds=100, ttl_seconds=10, stale_seconds=5)
+    return ContextCache(provider=FakeProvider(), sources={'weather': source}, **options)
+
+def at(seconds):
+    return mock.patch('src.services.external_context.time.time', return_value=seconds)
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+def test_nearby_points_share_one_cell_entry():
+    cache = make_cache()
+    nearby = (SPRINGFIELD[0] + 0.001, SPRINGFIELD[1] + 0.001)
+    assert geohash_encode(*nearby, 5) == geohash_encode(*SPRINGFIELD, 5)
+
+    with at(1000.0):
+        first = cache.lookup('weather', [SPRINGFIELD])
+        second = cache.lookup('weather', [nearby])
+        cache.lookup('weather', [(SPRINGFIELD[0] + 1, SPRINGFIELD[1])])
+
+    # The provider is asked about the cell's center, once per cell
+    assert first == second and first['lat'] == round(geohash_decode(geohash_encode(*SPRINGFIELD, 5))[0], 4)
+    assert cache.provider.calls == 2
+    counts = cache.stats()['sources']['weather']
+    assert (counts['hits'], counts['misses']) == (1, 2)
+
+def test_expired_entry_is_served_while_one_refresh_replaces_it():
+    cache = make_cache()
+    with at(1000.0):
+        cache.lookup('weather', [SPRINGFIELD])
+    cache.provider.version = 2
+
+    # Past the TTL but inside the stale window: the old value, with a background refresh
+    with at(1012.0):
+        assert cache.lookup('weather', [SPRINGFIELD])['version'] == 1
+        wait_for(lambda: cache.stats()['sources']['weather']['refreshes'] == 1)
+        assert cache.lookup('weather', [SPRINGFIELD])['version'] == 2
+    assert cache.provider.calls == 2
+
+    # Past the stale window too: fetched inline
+    cache.provider.version = 3
+    with at(1030.0):
+        assert cache.lookup('weather', [SPRINGFIELD])['version'] == 3
+    counts = cache.stats()['sources']['weather']
+    assert (counts['hits'], counts['stale_hits'], counts['misses']) == (1, 1, 2)
+
+def test_least_recently_used_entries_are_evicted_past_the_byte_bound():
+    entry_size = len(dumps(FakeProvider().weather(*SPRINGFIELD)))
+    cache = make_cache(max_bytes=entry_size * 5 // 2)
+    cells = [(SPRINGFIELD[0] + offset, SPRINGFIELD[1]) for offset in (0, 1, 2)]
+
+    with at(1000.0):
+        cache.lookup('weather', [cells[0]])
+        cache.lookup('weather', [cells[1]])
+        cache.lookup('weather', [cells[0]])  # Now the most recently used
+        cache.lookup('weather', [cells[2]])
+
+        stats = cache.stats()
+        assert stats['entries'] == 2 and stats['bytes'] <= stats['max_bytes']
+        assert stats['sources']['weather']['evictions'] == 1
+
+        calls = cache.provider.calls
+        cache.lookup('weather', [cells[0]])
+        assert cache.provider.calls == calls
+        cache.lookup('weather', [cells[1]])
+        assert cache.provider.calls == calls + 1
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from src.services.spatial_index import IncidentIndex, incident_indexes
+
+@pytest.fixture
+def crime_index():
+    rng = np.random.default_rng(7)
+    index = IncidentIndex.build(39.78 + rng.normal(0, 0.01, 500), -89.65 + rng.normal(0, 0.01, 500),
+                                rng.uniform(1, 5, 500), rng.integers(0, 2, 500), ['theft', 'assault'])
+    incident_indexes['crime'] = index
+    yield index
+    del incident_indexes['crime']
+
+@pytest.mark.parametrize('radius_km', ['0', '-1', '1000', 'nan'])
+def test_area_lookups_reject_radius_out_of_range(client, crime_index, radius_km):
+    for path in ('/api/crime-data', '/api/accident-data', '/api/road-conditions'):
+        response = client.get(f"{path}?lat=39.78&lon=-89.65&radius_km={radius_km}")
+        assert response.status_code == 400, path
+        assert 'radius_km' in response.get_json()['error']
+
+def test_crime_lookup_answers_from_the_index(client, crime_index):
+    response = client.get('/api/crime-data?lat=39.78&lon=-89.65&radius_km=1')
+    assert response.status_code == 200
+    assert response.get_json()['crime_statistics']['total_incidents'] > 0
+
+def test_index_refuses_non_positive_radius(crime_index):
+    with pytest.raises(ValueError):
+        crime_index.query(39.78, -89.65, 0)
+    with pytest.raises(ValueError):
+        crime_index.density_risk(39.78, -89.65, -1)
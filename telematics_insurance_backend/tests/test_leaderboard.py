@@ -0,0 +1,52 @@
+from datetime import date
+
+from src.models.telematics import Policyholder, db
+from src.services.leaderboard import MaterializedLeaderboard
+
+def add_drivers(scores):
+    drivers = {}
+    for name, score in scores.items():
+        drivers[name] = Policyholder(first_name=name, last_name='Driver', date_of_birth=date(1985, 1, 1),
+                                     address='1 Main St, Springfield, IL 62701', vehicle_make='Toyota',
+                                     vehicle_model='Camry', risk_score_current=score)
+        db.session.add(drivers[name])
+    db.session.commit()
+    return drivers
+
+def names(rows):
+    return [row['name'][0] for row in rows]
+
+def test_driver_falling_out_of_a_partial_window_is_not_kept_at_its_tail(app):
+    drivers = add_drivers({'A': 0.1, 'B': 0.2, 'C': 0.3, 'D': 0.4, 'E': 0.5})
+    board = MaterializedLeaderboard(depth=3)
+    assert names(board.page(3)) == ['A', 'B', 'C']
+
+    drivers['C'].risk_score_current = 0.9
+    db.session.commit()
+    board.apply_change(drivers['C'].id)
+
+    assert names(board.page(3)) == ['A', 'B', 'D']
+    assert names(board.page(5)) == ['A', 'B', 'D', 'E', 'C']
+
+def test_driver_moving_within_a_partial_window_is_patched_in_place(app):
+    drivers = add_drivers({'A': 0.1, 'B': 0.2, 'C': 0.3, 'D': 0.4, 'E': 0.5})
+    board = MaterializedLeaderboard(depth=3)
+    board.page(3)
+
+    drivers['C'].risk_score_current = 0.05
+    db.session.commit()
+    board.apply_change(drivers['C'].id)
+
+    assert names(board.page(3)) == ['C', 'A', 'B']
+    assert not board._needs_refill
+
+def test_complete_book_keeps_every_driver(app):
+    drivers = add_drivers({'A': 0.1, 'B': 0.2, 'C': 0.3})
+    board = MaterializedLeaderboard(depth=5)
+    board.page(5)
+
+    drivers['A'].risk_score_current = 0.9
+    db.session.commit()
+    board.apply_change(drivers['A'].id)
+
+    assert names(board.page(5)) == ['B', 'C', 'A']
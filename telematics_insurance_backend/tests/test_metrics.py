@@ -0,0 +1,31 @@
+import os
+
+from src.services.metrics import RouteMetrics, render_prometheus
+
+def record(metrics, endpoint, status=200):
+    metrics.start_request()
+    metrics.finish_request(endpoint, 'GET', status, 0, 100)
+
+def test_collect_sums_every_worker_and_keeps_exited_ones(tmp_path):
+    metrics = RouteMetrics()
+    metrics.directory = str(tmp_path)
+    metrics.flush_seconds = 3600
+    record(metrics, 'gamification.get_leaderboard')
+
+    pid = os.fork()
+    if pid == 0:  # A worker that serves two requests and is recycled
+        metrics._forked()
+        record(metrics, 'gamification.get_leaderboard')
+        record(metrics, 'gamification.get_leaderboard', 404)
+        metrics.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    for _ in range(2):  # Still counted once its file has been retired
+        routes, _ = metrics.collect()
+        assert routes[('gamification.get_leaderboard', 'GET')].statuses == {200: 2, 404: 1}
+    assert sorted(os.listdir(tmp_path)) == ['.lock', 'retired.json', f"worker-{os.getpid()}.json"]
+
+    text = render_prometheus(routes)
+    assert 'http_requests_total{endpoint="gamification.get_leaderboard",method="GET",status="200"} 2' in text
+    metrics.directory = None  # No final flush into the removed tmp_path at exit
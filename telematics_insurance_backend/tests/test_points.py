@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src.models.telematics import PointsBalance, PointsLedgerEntry, db
+from src.services.points import award_behavior_bonus, points_balance, post_points, replay_balances
+
+def entry(policyholder_id, reference, points, entry_type='adjustment'):
+    return {'policyholder_id': policyholder_id, 'entry_type': entry_type, 'reference': reference, 'points': points}
+
+def ledger_total(policyholder_id):
+    return db.session.execute(
+        db.select(db.func.sum(PointsLedgerEntry.points)).where(PointsLedgerEntry.policyholder_id == policyholder_id)
+    ).scalar()
+
+def test_balance_equals_the_ledger_sum(seed_book):
+    first, second = seed_book(2, 0)['policyholder_ids']
+    post_points([entry(first, 'a', 30), entry(first, 'b', -5), entry(second, 'a', 12)])
+    db.session.commit()
+    post_points([entry(first, 'c', 7)])
+    db.session.commit()
+
+    # seed_book already posted 50 points to each driver
+    assert points_balance(first) == ledger_total(first) == 82
+    assert points_balance(second) == ledger_total(second) == 62
+    assert db.session.get(PointsBalance, first).entry_count == 4
+
+def test_a_reference_pays_out_once(seed_book):
+    policyholder_id = seed_book(1, 0)['policyholder_ids'][0]
+    post_points([entry(policyholder_id, 'goodwill', 25)])
+    db.session.commit()
+
+    with pytest.raises(IntegrityError):
+        post_points([entry(policyholder_id, 'goodwill', 25)])
+    db.session.rollback()
+
+    assert points_balance(policyholder_id) == ledger_total(policyholder_id) == 75
+
+def test_behavior_bonus_is_posted_once_per_period(seed_book):
+    policyholder_id = seed_book(1, 0)['policyholder_ids'][0]
+
+    assert award_behavior_bonus('2025-09') == 1
+    assert award_behavior_bonus('2025-09') == 0
+    assert award_behavior_bonus('2025-10') == 1
+
+    # Risk score 0.2 earns 80% of the bonus
+    assert points_balance(policyholder_id) == 50 + 400 + 400
+
+def test_replay_rebuilds_balances_from_the_ledger(seed_book):
+    first, second = seed_book(2, 0)['policyholder_ids']
+    post_points([entry(first, 'a', 30), entry(second, 'a', 10)])
+    db.session.commit()
+    for policyholder_id in (first, second):
+        db.session.get(PointsBalance, policyholder_id).balance = 0
+    db.session.commit()
+
+    assert replay_balances(first) == 1
+    assert (points_balance(first), points_balance(second)) == (80, 0)
+
+    assert replay_balances() == 2
+    assert (points_balance(first), points_balance(second)) == (80, 60)
+    assert db.session.get(PointsBalance, second).entry_count == 2
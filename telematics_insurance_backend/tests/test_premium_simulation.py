@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from src.models.telematics import Policyholder, db
+from src.services.pricing import calculate_premium_adjustment
+from src.services.premium_simulation import linear_scorer, run_simulation, snapshot_book
+
+def test_baseline_matches_the_production_premium_adjustment(seed_book):
+    policyholder_ids = seed_book(9, 0)['policyholder_ids']
+    db.session.get(Policyholder, policyholder_ids[0]).risk_score_current = None
+    db.session.commit()
+
+    snapshot = snapshot_book(chunk_size=4)
+    assert list(snapshot['ids']) == sorted(policyholder_ids)
+    assert all(column.dtype == np.float64 for column in snapshot['features'].values())
+
+    risk = snapshot['features']['risk_score_current']
+    expected = [calculate_premium_adjustment(0.5 if policyholder.risk_score_current is None else policyholder.risk_score_current)
+                for policyholder in db.session.execute(db.select(Policyholder).order_by(Policyholder.id)).scalars()]
+    report = run_simulation(snapshot, base_premium=1000.0)
+    assert report['policies'] == 9
+    assert report['revenue_impact']['delta'] == 0
+    assert report['revenue_impact']['baseline_total'] == pytest.approx(sum(1000.0 * (1 + adjustment / 100) for adjustment in expected))
+    assert report['premium_adjustment']['baseline']['max'] == pytest.approx(round(max(expected), 4))
+    assert risk[list(snapshot['ids']).index(policyholder_ids[0])] == 0.5
+
+def test_candidate_scorer_changes_the_book(seed_book):
+    seed_book(3, 0)
+    report = run_simulation(snapshot_book(), score_fn=linear_scorer({'vehicle_year': 0.0}, intercept=1.0))
+    assert report['risk_distribution']['candidate']['min'] == 1.0
+    assert report['revenue_impact']['policies_increased'] == 3
@@ -0,0 +1,45 @@
+from unittest import mock
+
+from src.services.profiles import profile_cache
+from src.services.ranking import rank_index
+from src.services.ttl_cache import TTLCache
+
+def test_driver_score_runs_one_query_cold_and_none_warm(client, seed_book, queries):
+    policyholder_id = seed_book(3, 1)['policyholder_ids'][0]
+    rank_index.refresh()
+    profile_cache.clear()
+
+    with queries() as cold:
+        first = client.get(f"/api/driver-score/{policyholder_id}")
+    with queries() as warm:
+        second = client.get(f"/api/driver-score/{policyholder_id}")
+
+    assert (cold.count, warm.count) == (1, 0)
+    assert first.get_json() == second.get_json()
+
+def test_policyholder_update_invalidates_the_cached_profile(client, seed_book, queries):
+    policyholder_ids = seed_book(3, 1)['policyholder_ids']
+    rank_index.refresh()
+    last = policyholder_ids[-1]
+    before = client.get(f"/api/driver-score/{last}").get_json()
+    assert before['rank'] == 3
+
+    assert client.put(f"/api/policyholders/{last}", json={'risk_score_current': 0.1}).status_code == 200
+
+    with queries() as log:
+        after = client.get(f"/api/driver-score/{last}").get_json()
+    assert log.count == 1
+    assert after['rank'] == 1
+    assert after['safety_score'] > before['safety_score']
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl_seconds=10)
+    with mock.patch('src.services.ttl_cache.time.monotonic', return_value=100.0):
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        cache.put('c', 3)
+        assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    with mock.patch('src.services.ttl_cache.time.monotonic', return_value=111.0):
+        assert cache.get('a') is None
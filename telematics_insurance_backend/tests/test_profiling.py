@@ -0,0 +1,74 @@
+import pstats
+import time
+
+import pytest
+from flask import jsonify
+from src.main import create_app
+from src.models.telematics import db
+from src.services.profiling import request_profiler
+
+TOKEN = 'profile-secret'
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    """Testing app with profiling on, storing profiles under tmp_path"""
+    app = create_app('testing', PROFILE_TOKEN=TOKEN, PROFILE_DIR=str(tmp_path), PROFILE_PATHS=['/api/leaderboard/segments'],
+                     PROFILE_SAMPLE_INTERVAL_SECONDS=0.001)
+
+    @app.route('/api/slow-report')
+    def slow_report():
+        time.sleep(0.05)
+        return jsonify({'ok': True})
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    request_profiler.token, request_profiler.paths = None, ()
+
+@pytest.mark.parametrize('mode', ['sampling', 'cprofile'])
+def test_token_request_is_profiled_and_downloadable(profiled_app, mode):
+    client = profiled_app.test_client()
+    headers = {'X-Profile-Token': TOKEN, 'X-Profile-Mode': mode, 'X-Request-ID': f"slow-report-{mode}"}
+    response = client.get('/api/slow-report', headers=headers)
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+
+    listed = client.get('/api/profiles', headers={'X-Profile-Token': TOKEN}).get_json()['profiles']
+    assert [(meta['id'], meta['request_id'], meta['endpoint'], meta['mode'], meta['status']) for meta in listed] == [
+        (profile_id, f"slow-report-{mode}", 'slow_report', mode, 200)]
+
+    stats = pstats.Stats(request_profiler.path(profile_id, 'pstats'))
+    assert any(function == 'slow_report' for _, _, function in stats.stats)
+    collapsed = client.get(f"/api/profiles/{profile_id}/collapsed", headers={'X-Profile-Token': TOKEN})
+    assert collapsed.status_code == 200
+    stacks = dict(line.rsplit(' ', 1) for line in collapsed.get_data(as_text=True).splitlines())
+    assert any(stack.endswith('test_profiling:slow_report') for stack in stacks)
+    assert all(int(samples) > 0 for samples in stacks.values())
+
+def test_clients_without_the_token_choose_neither_id_nor_mode(profiled_app):
+    client = profiled_app.test_client()
+    headers = {'X-Profile-Mode': 'cprofile', 'X-Request-ID': 'victim'}
+    ids = {client.get('/api/leaderboard/segments', headers=headers).headers['X-Profile-Id'] for _ in range(2)}
+    assert len(ids) == 2 and 'victim' not in ids
+
+    listed = client.get('/api/profiles', headers={'X-Profile-Token': TOKEN}).get_json()['profiles']
+    assert {meta['id'] for meta in listed} == ids
+    assert {(meta['mode'], meta['request_id']) for meta in listed} == {('sampling', 'victim')}
+
+def test_allowlisted_path_is_profiled_without_token(profiled_app):
+    client = profiled_app.test_client()
+    assert 'X-Profile-Id' in client.get('/api/leaderboard/segments').headers
+    assert 'X-Profile-Id' not in client.get('/api/leaderboard').headers
+    assert 'X-Profile-Id' not in client.get('/api/leaderboard', headers={'X-Profile-Token': 'wrong'}).headers
+
+def test_profile_endpoints_need_the_token(profiled_app):
+    client = profiled_app.test_client()
+    assert client.get('/api/profiles').status_code == 404
+    assert client.get('/api/profiles', headers={'X-Profile-Token': 'wrong'}).status_code == 404
+    assert client.get('/api/profiles/../x/pstats', headers={'X-Profile-Token': TOKEN}).status_code == 404
+
+def test_profiling_is_off_by_default(app):
+    assert not request_profiler.enabled
+    assert 'X-Profile-Id' not in app.test_client().get('/api/leaderboard', headers={'X-Profile-Token': ''}).headers
@@ -0,0 +1,93 @@
+import os
+
+from src.services.pubsub import Broker
+
+def test_events_published_in_another_worker_reach_the_listening_process(tmp_path):
+    path = str(tmp_path / 'bus.sock')
+    listener = Broker()
+    listener.bus_path = path
+    listener.listen()
+    subscription = listener.subscribe('PH-1')
+
+    publisher = Broker()
+    publisher.bus_path = path
+    pid = os.fork()
+    if pid == 0:  # A preforked worker with no subscribers of its own
+        os._exit(0 if publisher.publish('PH-1', 'feedback', {'event_type': 'harsh_braking'}) == 0 else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+
+    events = subscription.wait(5)
+    assert [(event_type, data) for _, event_type, data in events] == [('feedback', {'event_type': 'harsh_braking'})]
+    assert listener.stats()['relayed'] == 0  # The listener delivers its own events locally only
+
+def test_relay_drops_events_while_no_listener_is_up(tmp_path):
+    publisher = Broker()
+    publisher.bus_path = str(tmp_path / 'bus.sock')
+    subscription = publisher.subscribe('PH-1')
+
+    assert publisher.publish('PH-1', 'feedback', {}) == 1
+    assert publisher.stats()['relay_dropped'] == 1
+    assert len(subscription.wait(0)) == 1
+
+def test_listener_reopens_the_bus_after_a_socket_error(tmp_path, monkeypatch):
+    import socket
+    from src.services import pubsub
+
+    class FlakyBroker(Broker):
+        binds = 0
+
+        def _bind(self):
+            bus = super()._bind()
+            self.binds += 1
+            if self.binds == 1:
+                bus.shutdown(socket.SHUT_RDWR)  # The first socket fails on its first read
+            return bus
+
+    monkeypatch.setattr(pubsub, 'RELAY_RETRY_SECONDS', 0.01)
+    path = str(tmp_path / 'bus.sock')
+    listener = FlakyBroker()
+    listener.bus_path = path
+    listener.listen()
+    subscription = listener.subscribe('PH-1')
+
+    publisher = Broker()
+    publisher.bus_path = path
+    events = []
+    for _ in range(100):  # Published before the reopened socket is bound, an event is dropped
+        publisher.publish('PH-1', 'feedback', {'n': 1})
+        events = subscription.wait(0.05)
+        if events:
+            break
+    assert listener.binds == 2
+    assert events[0][1:] == ('feedback', {'n': 1})
+
+def test_slow_subscriber_keeps_the_newest_events():
+    broker = Broker(max_queue=3)
+    subscription = broker.subscribe('PH-1')
+    other = broker.subscribe('PH-2')
+    for n in range(5):
+        broker.publish('PH-1', 'feedback', {'n': n})
+
+    assert [data['n'] for _, _, data in subscription.wait(0)] == [2, 3, 4]
+    assert subscription.dropped == 2
+    assert other.wait(0) == []
+
+    broker.unsubscribe(subscription)
+    broker.unsubscribe(other)
+    assert broker.publish('PH-1', 'feedback', {}) == 0
+    assert broker.stats()['channels'] == 0
+
+def test_posted_feedback_reaches_the_stream(app, client, seed_book):
+    policyholder_id = seed_book(1, 0)['policyholder_ids'][0]
+    app.config['FEEDBACK_STREAM_HEARTBEAT_SECONDS'] = 0.01
+    response = client.get(f"/api/feedback/stream/{policyholder_id}", buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = response.response
+    assert next(chunks) == b'retry: 3000\n\n'
+
+    posted = client.post('/api/real-time-feedback', json={
+        'policyholder_id': policyholder_id, 'event_type': 'harsh_braking', 'severity': 'high'})
+    assert posted.status_code == 200
+    chunk = next(chunk for chunk in chunks if not chunk.startswith(b':'))
+    assert chunk.startswith(b'id: ') and b'event: feedback' in chunk and b'"event_type":"harsh_braking"' in chunk
+    response.close()
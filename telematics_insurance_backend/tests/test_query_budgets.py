@@ -0,0 +1,144 @@
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from flask import jsonify
+from src.models.telematics import HistoricalWeather, Policyholder, db
+from src.services.query_budget import configure_query_checks, count_queries, query_budget, statement_shape
+from src.services.ranking import rank_index
+from src.services.spatial_index import cell_ids
+from src.services.weather_history import WEATHER_CELL_DEGREES, weather_history
+
+# Routes held to their @query_budget
+BUDGETED_BLUEPRINTS = ('telematics', 'gamification', 'data_processing')
+
+# (policyholders, trips each): every route must stay within budget at both sizes
+BOOK_SIZES = [(2, 2), (20, 15)]
+
+def raw_points(count, start=None):
+    start = start or datetime.utcnow() - timedelta(hours=1)
+    return [{'timestamp': (start + timedelta(seconds=30 * i)).isoformat(), 'latitude': 39.78 + i * 0.001,
+             'longitude': -89.65 + i * 0.001, 'speed_kph': 40 + i % 20, 'acceleration_x': (-0.5, 0.1)[i % 2],
+             'acceleration_y': 0.1} for i in range(count)]
+
+def trip_payload(policyholder_id):
+    start = datetime.utcnow() - timedelta(days=1)
+    return {'policyholder_id': policyholder_id, 'start_timestamp': start.isoformat(),
+            'end_timestamp': (start + timedelta(minutes=20)).isoformat(), 'duration_seconds': 1200,
+            'distance_km': 15.0, 'avg_speed_kph': 45.0, 'max_speed_kph': 80, 'harsh_braking_count': 1}
+
+def raw_records(policyholder_id, count):
+    """Ingestion batch the size of the book, with every other sample a driving event"""
+    return [{'device_id': 'device-0', 'policyholder_id': policyholder_id, 'timestamp': point['timestamp'],
+             'latitude': point['latitude'], 'longitude': point['longitude'], 'speed_kph': point['speed_kph'],
+             'event_type': ('normal', 'harsh_braking')[i % 2], 'raw_data_payload': {'severity': 'high'}}
+            for i, point in enumerate(raw_points(count))]
+
+# endpoint -> request for it against a seeded book: (method, url, json body)
+ROUTE_REQUESTS = {
+    'telematics.get_policyholders': lambda ph, trip, n: ('GET', '/api/policyholders', None),
+    'telematics.create_policyholder': lambda ph, trip, n: ('POST', '/api/policyholders', {
+        'first_name': 'New', 'last_name': 'Driver', 'date_of_birth': '1990-05-01', 'address': '9 Elm St, Peoria, IL 61602'}),
+    'telematics.get_policyholder': lambda ph, trip, n: ('GET', f"/api/policyholders/{ph}", None),
+    'telematics.update_policyholder': lambda ph, trip, n: ('PUT', f"/api/policyholders/{ph}", {
+        'vehicle_make': 'Ford', 'risk_score_current': 0.42}),
+    'telematics.get_trips': lambda ph, trip, n: ('GET', f"/api/trips?policyholder_id={ph}", None),
+    'telematics.create_trip': lambda ph, trip, n: ('POST', '/api/trips', trip_payload(ph)),
+    'telematics.get_trip': lambda ph, trip, n: ('GET', f"/api/trips/{trip}", None),
+    'telematics.ingest_raw_data': lambda ph, trip, n: ('POST', '/api/raw-data', raw_records(ph, n)),
+    'telematics.get_raw_data': lambda ph, trip, n: ('GET', f"/api/raw-data?policyholder_id={ph}", None),
+    'telematics.calculate_risk_score': lambda ph, trip, n: ('POST', f"/api/risk-score/{ph}", None),
+    'telematics.get_risk_history': lambda ph, trip, n: ('GET', f"/api/risk-history/{ph}", None),
+    'telematics.get_dashboard_data': lambda ph, trip, n: ('GET', f"/api/dashboard/{ph}", None),
+    'gamification.get_achievements': lambda ph, trip, n: ('GET', f"/api/achievements/{ph}", None),
+    'gamification.get_challenges': lambda ph, trip, n: ('GET', f"/api/challenges/{ph}", None),
+    'gamification.get_leaderboard': lambda ph, trip, n: ('GET', '/api/leaderboard?limit=100', None),
+    'gamification.get_leaderboard_segments': lambda ph, trip, n: ('GET', '/api/leaderboard/segments', None),
+    'gamification.get_cohort_leaderboard': lambda ph, trip, n: ('GET', '/api/leaderboard/region/IL', None),
+    'gamification.get_points_balance': lambda ph, trip, n: ('GET', f"/api/points/{ph}", None),
+    'gamification.get_points_history': lambda ph, trip, n: ('GET', f"/api/points/{ph}/history", None),
+    'gamification.get_driver_score': lambda ph, trip, n: ('GET', f"/api/driver-score/{ph}", None),
+    'gamification.real_time_feedback': lambda ph, trip, n: ('POST', '/api/real-time-feedback', {
+        'policyholder_id': ph, 'event_type': 'harsh_braking', 'severity': 'high'}),
+    'gamification.stream_feedback': lambda ph, trip, n: ('GET', f"/api/feedback/stream/{ph}", None),
+    'gamification.get_driving_tips': lambda ph, trip, n: ('GET', f"/api/driving-tips/{ph}", None),
+    'data_processing.process_trip': lambda ph, trip, n: ('POST', '/api/process-trip', {
+        'policyholder_id': ph, 'raw_points': raw_points(n)}),
+    'data_processing.batch_process': lambda ph, trip, n: ('POST', '/api/batch-process', {'policyholder_id': ph}),
+    'data_processing.update_aggregates': lambda ph, trip, n: ('POST', f"/api/update-aggregates/{ph}", None)
+}
+
+def budgeted_endpoints(app):
+    return sorted(endpoint for endpoint in app.view_functions if endpoint.split('.')[0] in BUDGETED_BLUEPRINTS)
+
+def test_every_route_has_a_query_budget(app):
+    for endpoint in budgeted_endpoints(app):
+        assert getattr(app.view_functions[endpoint], 'query_budget', None) is not None, f"{endpoint} has no @query_budget"
+        assert endpoint in ROUTE_REQUESTS, f"{endpoint} has no request in ROUTE_REQUESTS"
+
+@pytest.mark.parametrize('policyholders,trips', BOOK_SIZES)
+@pytest.mark.parametrize('endpoint', sorted(ROUTE_REQUESTS))
+def test_route_stays_within_query_budget(app, client, queries, seed_book, endpoint, policyholders, trips):
+    book = seed_book(policyholders, trips)
+    method, url, body = ROUTE_REQUESTS[endpoint](book['policyholder_ids'][-1], book['trip_ids'][-1], policyholders * trips)
+    budget = app.view_functions[endpoint].query_budget
+    # Loaded when a server worker starts, outside any request
+    rank_index.refresh()
+
+    with queries() as log:
+        response = client.open(url, method=method, json=body, buffered=False)
+        response.close()  # Streams are left unread
+
+    assert response.status_code < 400, response.get_data(as_text=True)
+    repeated = log.repeated(5)
+    assert log.count <= budget, (f"{endpoint} ran {log.count} statements, over its budget of {budget}"
+                                 + (f"; repeated: {repeated}" if repeated else ''))
+
+def test_long_route_reads_recorded_weather_once(app, client, queries, seed_book):
+    """A ~330 km trip over a dozen weather cells and two UTC days stays within budget on a cold cache"""
+    policyholder_id = seed_book(1, 1)['policyholder_ids'][0]
+    start = datetime(2025, 6, 1, 23, 30)
+    points = [{'timestamp': (start + timedelta(minutes=i)).isoformat(), 'latitude': 37.5 + i * 0.02,
+               'longitude': -89.65, 'speed_kph': 130} for i in range(150)]
+    last_cell = cell_ids([points[-1]['latitude']], [points[-1]['longitude']], WEATHER_CELL_DEGREES).tolist()[0]
+    db.session.add(HistoricalWeather(cell=last_cell, hour=datetime(2025, 6, 2, 1), weather_conditions='snow'))
+    db.session.commit()
+    weather_history.clear()
+    budget = app.view_functions['data_processing.process_trip'].query_budget
+
+    with queries() as log:
+        response = client.post('/api/process-trip', json={'policyholder_id': policyholder_id, 'raw_points': points})
+
+    assert response.status_code == 201
+    assert response.get_json()['trip_data']['weather_conditions'] == 'snow'
+    weather_reads = [statement for statement in log.statements if 'historical_weather' in statement]
+    assert len(weather_reads) == 1 and log.count <= budget, log.statements
+
+def test_count_queries_nests_and_groups_in_lists(app):
+    with count_queries() as outer:
+        db.session.execute(db.select(Policyholder).where(Policyholder.id.in_(['a', 'b']))).all()
+        with count_queries() as inner:
+            db.session.execute(db.select(Policyholder).where(Policyholder.id.in_(['a', 'b', 'c']))).all()
+
+    assert (outer.count, inner.count) == (2, 1)
+    assert statement_shape(outer.statements[0]) == statement_shape(outer.statements[1])
+    assert outer.repeated(2) and not outer.repeated(3)
+
+def test_debug_server_logs_probable_n_plus_one(caplog):
+    from src.main import create_app
+
+    app = create_app('testing', QUERY_CHECKS=True)
+
+    @app.route('/n-plus-one')
+    @query_budget(2)
+    def n_plus_one():
+        return jsonify([db.session.get(Policyholder, f"PH-{i}") is None for i in range(6)])
+
+    with app.app_context():
+        db.create_all()
+        with caplog.at_level(logging.WARNING, logger=app.logger.name):
+            assert app.test_client().get('/n-plus-one').status_code == 200
+        db.drop_all()
+
+    assert 'over its budget of 2' in caplog.text
+    assert 'Probable N+1 in n_plus_one: the same statement ran 6 times' in caplog.text
@@ -0,0 +1,60 @@
+from datetime import date
+from types import SimpleNamespace
+
+from src.models.telematics import Policyholder, db
+from src.services.ranking import RankIndex, rank_index
+
+def add_drivers(scores):
+    drivers = {}
+    for name, score in scores.items():
+        drivers[name] = Policyholder(first_name=name, last_name='Driver', date_of_birth=date(1985, 1, 1),
+                                     address='1 Main St, Springfield, IL 62701', vehicle_make='Toyota',
+                                     vehicle_model='Camry', risk_score_current=score)
+        db.session.add(drivers[name])
+    db.session.commit()
+    return drivers
+
+def test_standing_follows_committed_score_changes(app):
+    drivers = add_drivers({'A': 0.1, 'B': 0.2, 'C': 0.3, 'D': None})
+    rank_index.invalidate()
+    assert rank_index.standing(0.3) == {'rank': 3, 'total_drivers': 4, 'percentile': 25.0}
+
+    drivers['C'].risk_score_current = 0.05
+    db.session.commit()
+    assert rank_index.standing(0.05) == {'rank': 1, 'total_drivers': 4, 'percentile': 75.0}
+    assert rank_index.standing(0.2)['rank'] == 3
+
+    db.session.delete(drivers['A'])
+    db.session.commit()
+    assert rank_index.standing(0.2) == {'rank': 2, 'total_drivers': 3, 'percentile': 33.3}
+    # Unscored drivers never rank ahead of anyone
+    assert rank_index.standing(None)['rank'] == 1
+
+def test_reload_replays_updates_committed_while_it_ran(app, monkeypatch):
+    drivers = add_drivers({'A': 0.1, 'B': 0.2, 'C': 0.3})
+    index = RankIndex()
+    index.refresh()
+
+    execute = db.session.execute
+    def execute_during_concurrent_write(statement, *args, **kwargs):
+        rows = execute(statement, *args, **kwargs).all()  # Snapshot taken before the write lands
+        index.update(drivers['C'].id, 0.05)
+        index.update(drivers['A'].id, None, deleted=True)
+        return SimpleNamespace(all=lambda: rows)
+
+    monkeypatch.setattr(db.session, 'execute', execute_during_concurrent_write)
+    index.refresh()
+    monkeypatch.undo()
+
+    assert index.standing(0.05)['rank'] == 1
+    assert index.standing(0.2) == {'rank': 2, 'total_drivers': 2, 'percentile': 0.0}
+
+def test_stale_index_reloads_writes_from_other_processes(app):
+    drivers = add_drivers({'A': 0.1, 'B': 0.2})
+    index = RankIndex(max_staleness=0)
+    assert index.standing(0.15)['rank'] == 2
+
+    # Written without signals reaching this index, as by another worker
+    db.session.execute(db.update(Policyholder).where(Policyholder.id == drivers['B'].id).values(risk_score_current=0.01))
+    db.session.commit()
+    assert index.standing(0.15)['rank'] == 3
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.main import create_app
+from src.services.risk_stream import RiskStream, risk_stream
+
+# Never a running process: kill(pid, 0) fails with ESRCH
+DEAD_PIDS = (99999991, 99999992)
+
+def stored_drivers(path):
+    connection = sqlite3.connect(path)
+    try:
+        return dict(connection.execute('SELECT policyholder_id, updated_at FROM driver_risk_state').fetchall())
+    finally:
+        connection.close()
+
+def test_ingested_offset_timestamps_are_scored_at_their_utc_instant(client, seed_book):
+    policyholder_id = seed_book(1, 1)['policyholder_ids'][0]
+    stamped = datetime.now(timezone(timedelta(hours=2)))
+    response = client.post('/api/raw-data', json={
+        'device_id': 'device-0', 'policyholder_id': policyholder_id, 'timestamp': stamped.isoformat(),
+        'latitude': 39.78, 'longitude': -89.65, 'speed_kph': 50, 'event_type': 'harsh_braking',
+        'raw_data_payload': {'severity': 'high'}})
+    assert response.status_code == 201
+
+    states, _ = risk_stream._shard(policyholder_id)
+    assert abs(states[policyholder_id].updated_at - stamped.timestamp()) < 1
+
+def test_restore_merges_worker_snapshots_and_compacts_them(tmp_path):
+    base = str(tmp_path / 'risk.db')
+    first, second = RiskStream(), RiskStream()
+    first.observe('PH-1', 'harsh_braking', at=1000.0)
+    first.observe('PH-2', 'speeding', at=3000.0)
+    second.observe('PH-2', 'speeding', at=2000.0)
+    second.observe('PH-3', 'harsh_cornering', at=4000.0)
+    first.snapshot(f"{base}.worker-{DEAD_PIDS[0]}")
+    second.snapshot(f"{base}.worker-{DEAD_PIDS[1]}")
+
+    restored = RiskStream()
+    restored.snapshot_path = base
+    assert restored.restore_all() == 3
+
+    # The state that saw the latest event wins; the worker files are folded into the base
+    assert stored_drivers(base) == {'PH-1': 1000.0, 'PH-2': 3000.0, 'PH-3': 4000.0}
+    assert sorted(os.listdir(tmp_path)) == ['risk.db']
+
+def test_restore_keeps_files_of_running_workers_and_app_creation_restores_nothing(tmp_path):
+    base = str(tmp_path / 'risk.db')
+    running, stopped = RiskStream(), RiskStream()
+    running.observe('PH-1', 'speeding', at=1000.0)
+    stopped.observe('PH-2', 'speeding', at=2000.0)
+    running.snapshot(f"{base}.worker-{os.getpid()}")
+    stopped.snapshot(f"{base}.worker-{DEAD_PIDS[0]}")
+
+    create_app('testing', RISK_STREAM_SNAPSHOT_PATH=base)
+    assert len(os.listdir(tmp_path)) == 2
+
+    restored = RiskStream()
+    restored.snapshot_path = base
+    assert restored.restore_all() == 2
+    assert sorted(os.listdir(tmp_path)) == ['risk.db', f"risk.db.worker-{os.getpid()}"]
+
+def test_workers_forward_events_to_the_one_owner(tmp_path):
+    owner = RiskStream()
+    owner.socket_path = str(tmp_path / 'risk.sock')
+    owner.serve()
+    workers = [RiskStream(), RiskStream()]
+    for worker in workers:
+        worker.socket_path = owner.socket_path
+
+    first = workers[0].observe('PH-1', 'harsh_braking', 'high', at=1000.0)
+    second = workers[1].observe('PH-1', 'harsh_braking', 'high', at=1000.0)
+
+    # The second worker's event builds on the first's, as one process would score them
+    assert (first.event_rate, second.event_rate) == (1.0, 2.0)
+    assert second.live_risk == owner.live_risk('PH-1', at=1000.0)
+    assert second.cooldown_active
+    assert [worker.stats()['drivers'] for worker in workers] == [0, 0]
+    assert [worker.stats()['forwarded'] for worker in workers] == [1, 1]
+
+def test_events_are_scored_locally_while_the_owner_is_down(tmp_path):
+    worker = RiskStream()
+    worker.socket_path = str(tmp_path / 'missing.sock')
+
+    assert worker.observe('PH-1', 'speeding', at=1000.0).event_rate == 1.0
+    assert worker.observe('PH-1', 'speeding', at=1000.0).event_rate == 2.0
+    # One failed attempt, then the owner is left alone for a while
+    assert worker.stats()['forward_errors'] == 1
+    assert worker.stats()['drivers'] == 1
+
+def test_real_time_feedback_is_scored_at_the_posted_timestamp(client):
+    stamped = datetime.now(timezone(timedelta(hours=-5))) - timedelta(hours=2)
+    response = client.post('/api/real-time-feedback', json={
+        'policyholder_id': 'PH-feedback-time', 'event_type': 'speeding', 'severity': 'high',
+        'timestamp': stamped.isoformat()})
+    assert response.status_code == 200
+
+    states, _ = risk_stream._shard('PH-feedback-time')
+    assert abs(states['PH-feedback-time'].updated_at - stamped.timestamp()) < 1
+
+    response = client.post('/api/real-time-feedback', json={
+        'policyholder_id': 'PH-feedback-time', 'event_type': 'speeding', 'timestamp': 'yesterday'})
+    assert response.status_code == 400
+
+def test_each_forked_worker_snapshots_its_own_state(tmp_path):
+    base = str(tmp_path / 'risk.db')
+    saved = risk_stream.snapshot_path, risk_stream.snapshot_seconds
+    risk_stream.snapshot_path, risk_stream.snapshot_seconds = base, 0.05
+    try:
+        # The parent, like a preloading server's master, has already started its own loop
+        risk_stream.observe('PH-parent', 'speeding')
+        children = []
+        for i in range(2):
+            pid = os.fork()
+            if pid == 0:
+                risk_stream.observe(f"PH-child-{i}", 'harsh_braking')
+                time.sleep(0.3)
+                os._exit(0)
+            children.append(pid)
+        for pid in children:
+            assert os.waitpid(pid, 0)[1] == 0
+
+        for i, pid in enumerate(children):
+            assert f"PH-child-{i}" in stored_drivers(f"{base}.worker-{pid}")
+            assert f"PH-child-{1 - i}" not in stored_drivers(f"{base}.worker-{pid}")
+    finally:
+        risk_stream.snapshot_path, risk_stream.snapshot_seconds = saved
@@ -0,0 +1,30 @@
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from src.models.serializers import trip_serializer
+from src.models.telematics import Trip, db
+
+def test_parse_fields_dedupes_and_defaults_to_every_field(app):
+    assert trip_serializer.parse_fields('distance_km, id,distance_km,,') == ('distance_km', 'id')
+    assert trip_serializer.parse_fields(None) == trip_serializer.field_names
+    assert trip_serializer.parse_fields('') == trip_serializer.field_names
+    assert trip_serializer.parse_fields(' , ') == trip_serializer.field_names
+
+def test_parse_fields_rejects_unknown_fields(app):
+    with pytest.raises(BadRequest) as error:
+        trip_serializer.parse_fields('id,password,secret')
+    assert error.value.description == 'Unknown fields: password, secret'
+
+def test_serialize_rows_keeps_only_the_requested_columns(seed_book):
+    trip_id = seed_book(1, 1)['trip_ids'][0]
+    fields = trip_serializer.parse_fields('distance_km,id')
+    rows = db.session.execute(db.select(*trip_serializer.columns(fields)).where(Trip.id == trip_id)).all()
+    assert trip_serializer.serialize_rows(rows, fields) == [{'distance_km': 12.0, 'id': trip_id}]
+    assert trip_serializer.serialize_rows([], fields) == []
+
+def test_fields_query_parameter(client, seed_book):
+    seed_book(1, 2)
+    response = client.get('/api/trips?fields=id,start_timestamp')
+    assert response.status_code == 200
+    assert all(set(trip) == {'id', 'start_timestamp'} for trip in response.get_json())
+    assert client.get('/api/trips?fields=id,nope').status_code == 400
@@ -0,0 +1,16 @@
+import pytest
+from benchmarks.check_import_time import BUDGET_MS, BUILD_APP, FRAMEWORKS, cold_start, deferred_loaded, import_times
+
+pytestmark = pytest.mark.slow
+
+def test_create_app_stays_within_the_cold_start_budget():
+    # The fastest fresh interpreter is checked, as in benchmarks/check_import_time.py; stop at the first in budget
+    samples = []
+    while len(samples) < 10 and min(samples, default=float('inf')) > BUDGET_MS:
+        samples.append(cold_start()[1])
+    assert min(samples) <= BUDGET_MS, f"create_app() took {min(samples):.1f}ms at best (budget {BUDGET_MS:.0f}ms)"
+
+def test_create_app_does_not_import_deferred_dependencies():
+    times = import_times(FRAMEWORKS + '; ' + BUILD_APP)
+    assert 'src.main' in times
+    assert deferred_loaded(times) == []